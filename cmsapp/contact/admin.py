@@ -1,9 +1,21 @@
 from django.contrib import admin
+from django.contrib.admin.utils import unquote
+from django.core.exceptions import PermissionDenied
+from django.http import Http404
+from django.template.response import TemplateResponse
 from django.utils.html import format_html
-from django.urls import reverse
+from django.urls import path, reverse
 from django.db.models import Q
 from django.utils import timezone
-from .models import ContactInquiry, ContactConfiguration, InquiryType
+from datetime import timedelta
+from cmsapp.domains.utils import filter_queryset_by_domain, get_user_domains
+from .models import ContactInquiry, ContactConfiguration, DailyInquiryStats, InquiryType, OutboxMessage, SpamClassifier
+from .exports import CONTENT_TYPES, export_response
+from .outbox import retry_messages
+from .rollups import summarize
+
+
+DASHBOARD_PERIODS = [7, 30, 90, 365]
 
 
 @admin.register(ContactInquiry)
@@ -18,6 +30,8 @@ class ContactInquiryAdmin(admin.ModelAdmin):
     ]
     list_filter = ['domain', 'status', 'inquiry_type', 'created_at']
     search_fields = ['name', 'email', 'message']
+    # Skip the unfiltered COUNT(*) over every monthly partition
+    show_full_result_count = False
     readonly_fields = [
         'created_at',
         'updated_at',
@@ -40,7 +54,7 @@ class ContactInquiryAdmin(admin.ModelAdmin):
             'classes': ('collapse',)
         }),
     )
-    actions = ['mark_as_read', 'mark_as_responded', 'mark_as_closed']
+    actions = ['mark_as_read', 'mark_as_responded', 'mark_as_closed', 'mark_as_spam', 'export_csv', 'export_jsonl']
     
     def inquiry_type_badge(self, obj):
         # Handle None inquiry_type
@@ -73,6 +87,7 @@ class ContactInquiryAdmin(admin.ModelAdmin):
             'read': '#f39c12',
             'responded': '#2ecc71',
             'closed': '#95a5a6',
+            'spam': '#34495e',
         }
         color = colors.get(obj.status, '#95a5a6')
         return format_html(
@@ -92,30 +107,90 @@ class ContactInquiryAdmin(admin.ModelAdmin):
     formatted_message.short_description = 'Message'
     
     def mark_as_read(self, request, queryset):
-        updated = 0
-        for inquiry in queryset:
-            inquiry.mark_as_read()
-            updated += 1
+        updated = ContactInquiry.set_status(queryset, 'read')
         self.message_user(request, f'{updated} inquiries marked as read.')
     mark_as_read.short_description = 'Mark selected as Read'
     
     def mark_as_responded(self, request, queryset):
-        updated = queryset.update(status='responded', responded_at=timezone.now())
+        updated = ContactInquiry.set_status(queryset, 'responded')
         self.message_user(request, f'{updated} inquiries marked as Responded.')
     mark_as_responded.short_description = 'Mark selected as Responded'
     
     def mark_as_closed(self, request, queryset):
-        updated = queryset.update(status='closed')
+        updated = ContactInquiry.set_status(queryset, 'closed')
         self.message_user(request, f'{updated} inquiries marked as Closed.')
     mark_as_closed.short_description = 'Mark selected as Closed'
     
-    def get_queryset(self, request):
-        qs = super().get_queryset(request)
-        # Mark new inquiries as read when viewing
-        new_inquiries = qs.filter(status='new')
-        for inquiry in new_inquiries:
-            inquiry.mark_as_read()
-        return qs
+    def mark_as_spam(self, request, queryset):
+        # One UPDATE; the spam filter picks the new examples up the next time
+        # it is retrained (train_spam_filter, or the spam filter's Retrain action)
+        updated = ContactInquiry.set_status(queryset, 'spam')
+        self.message_user(request, f'{updated} inquiries marked as Spam.')
+    mark_as_spam.short_description = 'Mark selected as Spam'
+    
+    @admin.action(description='Export selected as CSV')
+    def export_csv(self, request, queryset):
+        return export_response(queryset, 'csv')
+    
+    @admin.action(description='Export selected as JSON lines')
+    def export_jsonl(self, request, queryset):
+        return export_response(queryset, 'jsonl')
+    
+    def get_urls(self):
+        return [
+            path(
+                'export/<str:fmt>/',
+                self.admin_site.admin_view(self.export_view),
+                name='contact_contactinquiry_export',
+            ),
+            path(
+                'dashboard/',
+                self.admin_site.admin_view(self.dashboard_view),
+                name='contact_contactinquiry_dashboard',
+            ),
+        ] + super().get_urls()
+    
+    def export_view(self, request, fmt):
+        """Stream every inquiry matching the changelist's current filters and search."""
+        if fmt not in CONTENT_TYPES:
+            raise Http404
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        changelist = self.get_changelist_instance(request)
+        return export_response(changelist.get_queryset(request), fmt)
+    
+    def dashboard_view(self, request):
+        """Inquiry statistics, read from the daily rollups only."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        days = request.GET.get('days', '')
+        days = int(days) if days.isdigit() and int(days) in DASHBOARD_PERIODS else 30
+        stats = filter_queryset_by_domain(
+            DailyInquiryStats.objects.filter(day__gt=timezone.localdate() - timedelta(days=days)),
+            request.user,
+        )
+        domain_id = request.GET.get('domain', '')
+        if domain_id.isdigit():
+            stats = stats.filter(domain_id=domain_id)
+        context = {
+            **self.admin_site.each_context(request),
+            'title': 'Inquiry statistics',
+            'opts': self.model._meta,
+            'periods': DASHBOARD_PERIODS,
+            'days': days,
+            'domains': get_user_domains(request.user).order_by('name'),
+            'selected_domain': domain_id,
+            **summarize(stats),
+        }
+        return TemplateResponse(request, 'admin/contact/contactinquiry/dashboard.html', context)
+    
+    def change_view(self, request, object_id, form_url='', extra_context=None):
+        # Opening a new inquiry marks it as read; listing or exporting does not
+        if request.method == 'GET':
+            inquiry = self.get_object(request, unquote(object_id))
+            if inquiry is not None and inquiry.status == 'new' and self.has_view_or_change_permission(request, inquiry):
+                ContactInquiry.set_status(ContactInquiry.objects.filter(pk=inquiry.pk), 'read')
+        return super().change_view(request, object_id, form_url, extra_context)
 
 
 @admin.register(ContactConfiguration)
@@ -177,3 +252,65 @@ class InquiryTypeAdmin(admin.ModelAdmin):
         if hasattr(request, 'domain'):
             qs = qs.filter(domain=request.domain)
         return qs
+
+
+@admin.register(OutboxMessage)
+class OutboxMessageAdmin(admin.ModelAdmin):
+    list_display = ['kind', 'recipient', 'inquiry', 'status_badge', 'attempts', 'run_after', 'error_preview']
+    list_filter = ['status', 'kind', 'created_at']
+    search_fields = ['recipient', 'inquiry__name', 'inquiry__email']
+    list_select_related = ['inquiry__inquiry_type', 'inquiry__domain']
+    readonly_fields = [
+        'inquiry', 'kind', 'recipient', 'status', 'attempts', 'run_after',
+        'locked_at', 'locked_by', 'last_error', 'created_at', 'updated_at',
+    ]
+    actions = ['retry']
+    
+    def has_add_permission(self, request):
+        # Messages are only ever written by the contact form
+        return False
+    
+    def status_badge(self, obj):
+        colors = {
+            'queued': '#3498db',
+            'sending': '#f39c12',
+            'failed': '#e74c3c',
+        }
+        color = colors.get(obj.status, '#95a5a6')
+        return format_html(
+            '<span style="background-color: {}; color: white; padding: 3px 8px; border-radius: 3px;">{}</span>',
+            color,
+            obj.get_status_display()
+        )
+    status_badge.short_description = 'Status'
+    
+    def error_preview(self, obj):
+        content = obj.last_error or ''
+        return (content[:60] + '...') if len(content) > 60 else content
+    error_preview.short_description = 'Last error'
+    
+    @admin.action(description='Retry selected failed messages')
+    def retry(self, request, queryset):
+        updated = retry_messages(queryset)
+        self.message_user(request, f'{updated} messages queued for delivery.')
+
+
+@admin.register(SpamClassifier)
+class SpamClassifierAdmin(admin.ModelAdmin):
+    list_display = ['__str__', 'vocabulary_size', 'trained_at']
+    readonly_fields = ['spam_documents', 'ham_documents', 'vocabulary_size', 'trained_at']
+    exclude = ['spam_tokens', 'ham_tokens']
+    actions = ['retrain']
+    
+    def has_add_permission(self, request):
+        # The single row is written by training
+        return False
+    
+    def vocabulary_size(self, obj):
+        return len(set(obj.spam_tokens) | set(obj.ham_tokens))
+    vocabulary_size.short_description = 'Words'
+    
+    @admin.action(description='Retrain from reviewed inquiries')
+    def retrain(self, request, queryset):
+        model = SpamClassifier.train()
+        self.message_user(request, f'Trained on {model.spam_documents} spam and {model.ham_documents} legitimate inquiries.')
@@ -5,3 +5,7 @@ class ContactConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cmsapp.contact'
     verbose_name = 'Contact Forms'
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        import cmsapp.contact.signals
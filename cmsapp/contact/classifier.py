@@ -0,0 +1,65 @@
+"""
+Naive Bayes spam classifier for contact inquiries.
+
+Trained from the inquiries staff have reviewed: those marked as spam against
+those read, responded to or closed. Word counts for both classes are stored
+on the single ``SpamClassifier`` row, which every process keeps in memory,
+so scoring a submission is pure arithmetic.
+"""
+import math
+import re
+from collections import Counter
+
+from django.conf import settings
+
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9'_-]{1,29}")
+URL_RE = re.compile(r'https?://|www\.', re.I)
+
+
+def tokenize(name, email, message):
+    """Words of an inquiry, plus markers for the sender's mail domain and links."""
+    tokens = TOKEN_RE.findall(f"{name} {message}".lower())
+    if '@' in (email or ''):
+        tokens.append('@' + email.rsplit('@', 1)[1].lower())
+    tokens.extend('__url__' for _ in URL_RE.finditer(message or ''))
+    return tokens
+
+
+def train(spam_documents, ham_documents, max_vocabulary=None):
+    """
+    Word counts for a classifier from lists of token lists.
+
+    Only words seen at least twice are kept, at most ``max_vocabulary`` of
+    the most frequent, which keeps the stored model small.
+    """
+    max_vocabulary = max_vocabulary or settings.CONTACT_SPAM_MAX_VOCABULARY
+    spam = Counter(token for tokens in spam_documents for token in tokens)
+    ham = Counter(token for tokens in ham_documents for token in tokens)
+    vocabulary = [
+        token for token, count in (spam + ham).most_common(max_vocabulary)
+        if count >= 2
+    ]
+    return {
+        'spam_documents': len(spam_documents),
+        'ham_documents': len(ham_documents),
+        'spam_tokens': {token: spam[token] for token in vocabulary if spam[token]},
+        'ham_tokens': {token: ham[token] for token in vocabulary if ham[token]},
+    }
+
+
+def spam_probability(model, tokens):
+    """P(spam | tokens) under a multinomial model with add-one smoothing."""
+    vocabulary_size = len(set(model.spam_tokens) | set(model.ham_tokens)) or 1
+    spam_total = sum(model.spam_tokens.values()) + vocabulary_size
+    ham_total = sum(model.ham_tokens.values()) + vocabulary_size
+    documents = model.spam_documents + model.ham_documents
+    log_odds = math.log(model.spam_documents / documents) - math.log(model.ham_documents / documents)
+    for token in tokens:
+        if token not in model.spam_tokens and token not in model.ham_tokens:
+            continue
+        log_odds += math.log((model.spam_tokens.get(token, 0) + 1) / spam_total)
+        log_odds -= math.log((model.ham_tokens.get(token, 0) + 1) / ham_total)
+    if log_odds > 50:
+        return 1.0
+    return 1 - 1 / (1 + math.exp(log_odds))
@@ -5,6 +5,15 @@ from .models import ContactInquiry, InquiryType
 class ContactForm(forms.ModelForm):
     """Form for contact inquiries."""
     
+    # Abuse checks (see spam.py): a field people never see or fill in, and
+    # the signed time the visitor started on the form, set by contact-form.js
+    website = forms.CharField(
+        required=False,
+        label='Leave this field empty',
+        widget=forms.TextInput(attrs={'autocomplete': 'off', 'tabindex': '-1'}),
+    )
+    started = forms.CharField(required=False, widget=forms.HiddenInput)
+    
     class Meta:
         model = ContactInquiry
         fields = ['name', 'email', 'phone', 'inquiry_type', 'message']
@@ -37,15 +46,19 @@ class ContactForm(forms.ModelForm):
     
     def __init__(self, *args, domain=None, **kwargs):
         super().__init__(*args, **kwargs)
+        field = self.fields['inquiry_type']
         if domain:
             # Filter inquiry types by domain and active status
-            self.fields['inquiry_type'].queryset = InquiryType.objects.filter(
+            field.queryset = InquiryType.objects.filter(
                 domain=domain,
                 is_active=True
             ).order_by('order', 'label')
         else:
             # If no domain provided, show all active inquiry types
-            self.fields['inquiry_type'].queryset = InquiryType.objects.filter(
+            field.queryset = InquiryType.objects.filter(
                 is_active=True
             ).order_by('domain__name', 'order', 'label')
+        # Render the options from the cached list; the queryset is only
+        # queried to validate a submitted value.
+        field.choices = [('', field.empty_label)] + InquiryType.choices_for_domain(domain)
 
@@ -0,0 +1,124 @@
+"""
+Persistent SMTP delivery for the contact worker.
+
+``send_mail`` opens and tears down a connection per message. The worker
+instead keeps one ``PooledMailer`` for its lifetime: the connection is
+opened once, checked with NOOP when it has been idle, and every claimed
+batch goes out over it with a single ``send_messages`` call. A dropped
+connection is reopened transparently.
+"""
+import logging
+import smtplib
+import time
+
+from django.conf import settings
+from django.core.mail import get_connection
+
+
+logger = logging.getLogger(__name__)
+
+# Errors that mean the connection itself is gone, rather than the message
+# being refused; the message is worth one more try on a fresh connection.
+CONNECTION_ERRORS = (smtplib.SMTPServerDisconnected, ConnectionError, TimeoutError)
+
+
+class PooledMailer:
+    """One long-lived mail connection, reopened when it stops answering."""
+
+    def __init__(self, backend=None, healthcheck_interval=None):
+        self.backend = backend
+        if healthcheck_interval is None:
+            healthcheck_interval = settings.CONTACT_SMTP_HEALTHCHECK_INTERVAL
+        self.healthcheck_interval = healthcheck_interval
+        self.connection = None
+        self.last_used = 0
+        self.connections_opened = 0
+
+    def open(self):
+        self.close()
+        connection = get_connection(self.backend, fail_silently=False)
+        connection.open()
+        self.connection = connection
+        self.connections_opened += 1
+        self.last_used = time.monotonic()
+
+    def close(self):
+        if self.connection is None:
+            return
+        try:
+            self.connection.close()
+        except Exception:
+            # The server may already have hung up; nothing left to release
+            pass
+        self.connection = None
+
+    def is_healthy(self):
+        """True if the connection is open and, when idle for a while, answers NOOP."""
+        if self.connection is None:
+            return False
+        if not hasattr(self.connection, 'connection'):
+            # Non-SMTP backends (console, locmem) have no socket to check
+            return True
+        smtp = self.connection.connection
+        if smtp is None:
+            return False
+        if time.monotonic() - self.last_used < self.healthcheck_interval:
+            return True
+        try:
+            return smtp.noop()[0] == 250
+        except (smtplib.SMTPException, OSError):
+            return False
+
+    def ensure_open(self):
+        if not self.is_healthy():
+            self.open()
+
+    def send_batch(self, messages):
+        """
+        Send EmailMessages over the pooled connection.
+
+        Returns a list with None for each delivered message and the
+        exception for each one that failed. If the batch send fails part
+        way, the messages are retried one at a time to find out which ones
+        went wrong; messages sent before the failure may then go out twice,
+        which the outbox accepts in exchange for never losing one.
+        """
+        if not messages:
+            return []
+        try:
+            self.ensure_open()
+            self.connection.send_messages(messages)
+            self.last_used = time.monotonic()
+            return [None] * len(messages)
+        except Exception as exc:
+            logger.warning('Batch of %s emails failed, sending one at a time: %s', len(messages), exc)
+            # Force a NOOP before the connection is trusted again
+            self.last_used = 0
+
+        results = []
+        for message in messages:
+            try:
+                self.ensure_open()
+            except Exception as exc:
+                # Server unreachable: fail the rest instead of reconnecting for each
+                results.extend([exc] * (len(messages) - len(results)))
+                break
+            results.append(self.send_one(message))
+        return results
+
+    def send_one(self, message):
+        """Send a single message, reconnecting once if the connection drops."""
+        for attempt in (1, 2):
+            try:
+                self.connection.send_messages([message])
+                self.last_used = time.monotonic()
+                return None
+            except CONNECTION_ERRORS as exc:
+                if attempt == 2:
+                    return exc
+                try:
+                    self.open()
+                except Exception as open_error:
+                    return open_error
+            except Exception as exc:
+                return exc
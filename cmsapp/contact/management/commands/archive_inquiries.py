@@ -0,0 +1,110 @@
+"""
+Management command to archive old contact inquiries.
+Usage: python manage.py archive_inquiries [--months 24] [--output-dir DIR] [--allow-root-filesystem] [--dry-run]
+
+Creates the monthly partitions of the inquiry table for the coming months,
+then handles each month older than the retention period: its inquiries are
+written to ``contact-inquiries-YYYY-MM.jsonl.gz`` and the partition is
+dropped. A month that still has open inquiries (anything not closed or
+marked as spam) is kept and reported. Run it once a month.
+
+The exports are the only copy of the dropped inquiries, so nothing is
+dropped unless the output directory already exists on persistent storage:
+a separate mount such as a volume. On a host whose root filesystem is
+itself persistent, pass ``--allow-root-filesystem``.
+"""
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from cmsapp.contact.models import ContactInquiry, OutboxMessage
+from cmsapp.contact.partitions import (
+    ARCHIVABLE_STATUSES, add_months, drop_partition, ensure_partitions, export_inquiries,
+    is_partitioned, lock_partition, month_start, monthly_partitions, on_persistent_storage,
+)
+
+
+class Command(BaseCommand):
+    help = 'Export and drop monthly partitions of contact inquiries past the retention period'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--months',
+            type=int,
+            default=settings.CONTACT_RETENTION_MONTHS,
+            help='Keep this many months of inquiries (default: CONTACT_RETENTION_MONTHS)',
+        )
+        parser.add_argument(
+            '--output-dir',
+            default=settings.CONTACT_ARCHIVE_DIR,
+            help='Directory for the exported files (default: CONTACT_ARCHIVE_DIR)',
+        )
+        parser.add_argument(
+            '--allow-root-filesystem',
+            action='store_true',
+            help='Accept an output directory on the root filesystem (hosts where it is persistent)',
+        )
+        parser.add_argument(
+            '--dry-run',
+            action='store_true',
+            help='Report what would be archived without changing anything',
+        )
+
+    def check_output_dir(self, output_dir, allow_root_filesystem):
+        if not output_dir:
+            raise CommandError('Set CONTACT_ARCHIVE_DIR (or --output-dir) to a directory on persistent storage')
+        if not os.path.isdir(output_dir):
+            raise CommandError(f'{output_dir} does not exist; is the archive volume mounted?')
+        if not allow_root_filesystem and not on_persistent_storage(output_dir):
+            raise CommandError(
+                f'{output_dir} is on the root filesystem, which may not outlive the container; '
+                'mount a volume there or pass --allow-root-filesystem'
+            )
+
+    def handle(self, *args, **options):
+        if not is_partitioned():
+            raise CommandError('Contact inquiries are not partitioned; this command needs PostgreSQL')
+        if options['months'] < 1:
+            raise CommandError('--months must be at least 1')
+
+        now = timezone.now()
+        if not options['dry_run']:
+            with transaction.atomic():
+                for name in ensure_partitions(now, settings.CONTACT_PARTITIONS_AHEAD):
+                    self.stdout.write(self.style.SUCCESS(f'✓ Created partition {name}'))
+
+        cutoff = add_months(month_start(now), -options['months'])
+        output_dir = options['output_dir']
+        checked = False
+        archived = []
+        for month in monthly_partitions():
+            if month >= cutoff:
+                break
+            label = f'{month:%Y-%m}'
+            with transaction.atomic():
+                lock_partition(month)
+                inquiries = ContactInquiry.objects.filter(created_at__gte=month, created_at__lt=add_months(month, 1))
+                still_open = inquiries.exclude(status__in=ARCHIVABLE_STATUSES).count()
+                if still_open:
+                    self.stdout.write(self.style.WARNING(
+                        f'  Kept {label}: {still_open} inquiries are still open'
+                    ))
+                    continue
+                if options['dry_run']:
+                    self.stdout.write(f'  Would archive {inquiries.count()} inquiries from {label}')
+                    continue
+
+                if not checked:
+                    self.check_output_dir(output_dir, options['allow_root_filesystem'])
+                    checked = True
+                path = os.path.join(output_dir, f'contact-inquiries-{label}.jsonl.gz')
+                count = export_inquiries(inquiries, path)
+                OutboxMessage.objects.filter(inquiry_id__in=inquiries.values('id')).delete()
+                drop_partition(month)
+            archived.append(label)
+            self.stdout.write(self.style.SUCCESS(f'✓ Archived {count} inquiries from {label} to {path}'))
+
+        if not archived and not options['dry_run']:
+            self.stdout.write('No months to archive')
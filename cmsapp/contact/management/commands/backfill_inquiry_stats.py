@@ -0,0 +1,95 @@
+"""
+Management command to rebuild daily inquiry statistics from the inquiries.
+Usage: python manage.py backfill_inquiry_stats [--since 2026-01-01] [--domain example.com]
+
+Replaces the stats of every day from --since (default: the day of the
+oldest inquiry on record) with counts recomputed from the inquiry table.
+Earlier days, whose inquiries may since have been archived, are left as
+they are. Run it once to fill in history, or to correct the stats after
+inquiries were changed outside the admin. Inquiries saved while it runs
+may be counted twice or not at all; run it when the site is quiet.
+"""
+from datetime import date
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Count, DurationField, ExpressionWrapper, F, Min, Sum
+from django.db.models.functions import TruncDate
+from django.utils import timezone
+from cmsapp.contact.models import ContactInquiry, DailyInquiryStats
+from cmsapp.domains.models import Domain
+
+
+def _total_seconds(field):
+    return Sum(ExpressionWrapper(F(field) - F('created_at'), output_field=DurationField()))
+
+
+class Command(BaseCommand):
+    help = 'Recompute daily inquiry statistics from the inquiry table'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--since',
+            type=date.fromisoformat,
+            help='First day to rebuild (YYYY-MM-DD)',
+        )
+        parser.add_argument(
+            '--domain',
+            type=str,
+            help='Only rebuild the stats of this domain',
+        )
+
+    def handle(self, *args, **options):
+        inquiries = ContactInquiry.objects.all()
+        stats = DailyInquiryStats.objects.all()
+        if options['domain']:
+            try:
+                domain = Domain.objects.get(name=options['domain'])
+            except Domain.DoesNotExist:
+                raise CommandError(f'Domain "{options["domain"]}" does not exist')
+            inquiries = inquiries.filter(domain=domain)
+            stats = stats.filter(domain=domain)
+
+        since = options['since']
+        if since is None:
+            oldest = inquiries.aggregate(oldest=Min('created_at'))['oldest']
+            if oldest is None:
+                self.stdout.write('No inquiries to count')
+                return
+            since = timezone.localdate(oldest)
+
+        rows = (
+            inquiries.annotate(day=TruncDate('created_at'))
+            .filter(day__gte=since)
+            .values('day', 'domain_id', 'inquiry_type_id')
+            .annotate(
+                received_count=Count('id'),
+                read_count=Count('read_at'),
+                read_time=_total_seconds('read_at'),
+                responded_count=Count('responded_at'),
+                responded_time=_total_seconds('responded_at'),
+            )
+            .order_by()
+        )
+        with transaction.atomic():
+            stats.filter(day__gte=since).delete()
+            created = DailyInquiryStats.objects.bulk_create(
+                [
+                    DailyInquiryStats(
+                        day=row['day'],
+                        domain_id=row['domain_id'],
+                        inquiry_type_id=row['inquiry_type_id'],
+                        received=row['received_count'],
+                        read=row['read_count'],
+                        read_seconds=max(0, int(row['read_time'].total_seconds())) if row['read_time'] else 0,
+                        responded=row['responded_count'],
+                        responded_seconds=(
+                            max(0, int(row['responded_time'].total_seconds())) if row['responded_time'] else 0
+                        ),
+                    )
+                    for row in rows.iterator(chunk_size=2000)
+                ],
+                batch_size=500,
+            )
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Rebuilt {len(created)} daily stats rows from {since}'))
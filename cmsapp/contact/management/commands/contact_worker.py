@@ -0,0 +1,74 @@
+"""
+Management command to deliver queued contact notifications.
+Usage: python manage.py contact_worker [--batch-size 50] [--once]
+
+Polls the OutboxMessage table and claims batches with SELECT ... FOR
+UPDATE SKIP LOCKED, so several workers can run side by side. Each worker
+keeps one SMTP connection open for its lifetime. SIGTERM lets the current
+batch finish before exiting.
+"""
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+from cmsapp.contact.mailer import PooledMailer
+from cmsapp.contact.outbox import claim_messages, deliver_messages, release_stale_messages
+
+
+class Command(BaseCommand):
+    help = 'Deliver queued contact confirmation and alert notifications'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.CONTACT_WORKER_POLL_INTERVAL,
+            help='Seconds to wait when the outbox is empty',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=settings.CONTACT_OUTBOX_BATCH_SIZE,
+            help='Messages to claim and send per batch',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Deliver every due message and exit instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        self.stopping = False
+        if not options['once']:
+            signal.signal(signal.SIGTERM, self.stop)
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        mailer = PooledMailer()
+        sent = failed = 0
+        try:
+            while not self.stopping:
+                if not options['once']:
+                    # Between polls of a long-running worker only: a --once
+                    # pass may run inside a caller's transaction
+                    close_old_connections()
+                messages = claim_messages(worker_id, options['batch_size'])
+                if not messages:
+                    if options['once']:
+                        break
+                    release_stale_messages()
+                    time.sleep(options['poll_interval'])
+                    continue
+                delivered, errors = deliver_messages(messages, mailer)
+                sent += delivered
+                failed += errors
+        finally:
+            mailer.close()
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Delivered {sent} notifications ({failed} failed)"))
+
+    def stop(self, *args):
+        self.stopping = True
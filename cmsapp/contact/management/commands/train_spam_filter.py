@@ -0,0 +1,29 @@
+"""
+Management command to rebuild the contact spam filter.
+Usage: python manage.py train_spam_filter
+
+Marking inquiries as spam in the admin does not retrain the filter, so
+triage stays a single UPDATE. Run this from cron, or use the Retrain action
+on the spam filter in the admin, to pick up newly marked spam and newly
+handled inquiries as legitimate examples.
+"""
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from cmsapp.contact.models import SpamClassifier
+
+
+class Command(BaseCommand):
+    help = 'Train the contact spam filter from reviewed inquiries'
+
+    def handle(self, *args, **options):
+        model = SpamClassifier.train()
+        self.stdout.write(
+            self.style.SUCCESS(
+                f'✓ Trained spam filter on {model.spam_documents} spam and '
+                f'{model.ham_documents} legitimate inquiries'
+            )
+        )
+        if SpamClassifier.current() is None:
+            self.stdout.write(self.style.WARNING(
+                f'  Not used until there are {settings.CONTACT_SPAM_MIN_TRAINING} examples of each'
+            ))
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:17
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0008_remove_inquiry_type_old'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OutboxMessage',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('confirmation', 'Confirmation email'), ('alert_email', 'Alert email'), ('alert_sms', 'Alert SMS')], max_length=20)),
+                ('recipient', models.CharField(max_length=254)),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('sending', 'Sending'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.PositiveSmallIntegerField(default=0)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('last_error', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('inquiry', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='outbox_messages', to='contact.contactinquiry')),
+            ],
+            options={
+                'verbose_name': 'Outbox Message',
+                'ordering': ['run_after', 'pk'],
+                'indexes': [models.Index(condition=models.Q(('status', 'queued')), fields=['run_after'], name='contact_outbox_queued_idx'), models.Index(fields=['status', 'locked_at'], name='contact_outbox_status_idx')],
+            },
+        ),
+    ]
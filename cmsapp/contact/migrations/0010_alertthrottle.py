@@ -0,0 +1,27 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:21
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0009_outboxmessage'),
+        ('domains', '0006_domainsetting_alert_delivery'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AlertThrottle',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('confirmation', 'Confirmation email'), ('alert_email', 'Alert email'), ('alert_sms', 'Alert SMS')], max_length=20)),
+                ('last_sent_at', models.DateTimeField(blank=True, null=True)),
+                ('domain', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='alert_throttles', to='domains.domain')),
+            ],
+            options={
+                'unique_together': {('domain', 'kind')},
+            },
+        ),
+    ]
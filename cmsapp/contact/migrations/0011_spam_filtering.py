@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:28
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0010_alertthrottle'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SpamClassifier',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('spam_documents', models.PositiveIntegerField(default=0)),
+                ('ham_documents', models.PositiveIntegerField(default=0)),
+                ('spam_tokens', models.JSONField(default=dict)),
+                ('ham_tokens', models.JSONField(default=dict)),
+                ('trained_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'verbose_name': 'Spam Classifier',
+            },
+        ),
+        migrations.AlterField(
+            model_name='contactinquiry',
+            name='status',
+            field=models.CharField(choices=[('new', 'New'), ('read', 'Read'), ('responded', 'Responded'), ('closed', 'Closed'), ('spam', 'Spam')], default='new', max_length=20),
+        ),
+    ]
@@ -0,0 +1,91 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:31
+
+from datetime import datetime, timezone as dt_timezone
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils import timezone
+
+
+TABLE = 'contact_contactinquiry'
+REBUILT = 'contact_contactinquiry_rebuilt'
+MONTHS_AHEAD = 3
+
+
+def months_between(first, last, extra=0):
+    """Start of each UTC month from ``first`` through ``extra`` months after ``last``."""
+    index = first.year * 12 + first.month - 1
+    end = last.year * 12 + last.month - 1 + extra
+    while index <= end:
+        yield datetime(index // 12, index % 12 + 1, 1, tzinfo=dt_timezone.utc)
+        index += 1
+
+
+def finish_table(apps, schema_editor, primary_key):
+    """Rename the rebuilt table into place and restore its keys and indexes."""
+    ContactInquiry = apps.get_model('contact', 'ContactInquiry')
+    Domain = apps.get_model('domains', 'Domain')
+    InquiryType = apps.get_model('contact', 'InquiryType')
+    execute = schema_editor.execute
+
+    # Dropping the old table also drops its id sequence
+    execute(f'DROP TABLE {TABLE}')
+    execute(f'ALTER TABLE {REBUILT} RENAME TO {TABLE}')
+    execute(f'CREATE SEQUENCE {TABLE}_id_seq OWNED BY {TABLE}.id')
+    execute(f"SELECT setval('{TABLE}_id_seq', COALESCE((SELECT MAX(id) FROM {TABLE}), 0) + 1, false)")
+    execute(f"ALTER TABLE {TABLE} ALTER COLUMN id SET DEFAULT nextval('{TABLE}_id_seq')")
+    execute(f'ALTER TABLE {TABLE} ADD PRIMARY KEY ({primary_key})')
+
+    for column, target in (('domain_id', Domain), ('inquiry_type_id', InquiryType)):
+        execute(
+            f'ALTER TABLE {TABLE} ADD CONSTRAINT {TABLE}_{column}_fk FOREIGN KEY ({column}) '
+            f'REFERENCES {target._meta.db_table} (id) DEFERRABLE INITIALLY DEFERRED'
+        )
+        execute(f'CREATE INDEX {TABLE}_{column}_idx ON {TABLE} ({column})')
+    for index in ContactInquiry._meta.indexes:
+        schema_editor.add_index(ContactInquiry, index)
+
+
+def partition_inquiries(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    execute = schema_editor.execute
+
+    execute(f'CREATE TABLE {REBUILT} (LIKE {TABLE}) PARTITION BY RANGE (created_at)')
+    execute(f'CREATE TABLE {TABLE}_default PARTITION OF {REBUILT} DEFAULT')
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute(f'SELECT MIN(created_at) FROM {TABLE}')
+        first = cursor.fetchone()[0] or timezone.now()
+    months = list(months_between(first.astimezone(dt_timezone.utc), timezone.now(), MONTHS_AHEAD + 1))
+    for month, following in zip(months, months[1:]):
+        execute(
+            f'CREATE TABLE {TABLE}_y{month.year:04d}m{month.month:02d} PARTITION OF {REBUILT} '
+            'FOR VALUES FROM (%s) TO (%s)',
+            [month, following],
+        )
+    execute(f'INSERT INTO {REBUILT} SELECT * FROM {TABLE}')
+    finish_table(apps, schema_editor, 'id, created_at')
+
+
+def unpartition_inquiries(apps, schema_editor):
+    if schema_editor.connection.vendor != 'postgresql':
+        return
+    schema_editor.execute(f'CREATE TABLE {REBUILT} (LIKE {TABLE})')
+    schema_editor.execute(f'INSERT INTO {REBUILT} SELECT * FROM {TABLE}')
+    finish_table(apps, schema_editor, 'id')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0011_spam_filtering'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='outboxmessage',
+            name='inquiry',
+            field=models.ForeignKey(db_constraint=False, on_delete=django.db.models.deletion.CASCADE, related_name='outbox_messages', to='contact.contactinquiry'),
+        ),
+        migrations.RunPython(partition_inquiries, unpartition_inquiries),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:35
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0012_partition_inquiries_by_month'),
+        ('domains', '0007_provision_domain_settings'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyInquiryStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.DateField()),
+                ('received', models.PositiveIntegerField(default=0)),
+                ('read', models.PositiveIntegerField(default=0)),
+                ('read_seconds', models.PositiveBigIntegerField(default=0, help_text='Total time from received to read')),
+                ('responded', models.PositiveIntegerField(default=0)),
+                ('responded_seconds', models.PositiveBigIntegerField(default=0, help_text='Total time from received to responded')),
+                ('domain', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='inquiry_stats', to='domains.domain')),
+                ('inquiry_type', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='daily_stats', to='contact.inquirytype')),
+            ],
+            options={
+                'verbose_name': 'Daily Inquiry Stats',
+                'verbose_name_plural': 'Daily Inquiry Stats',
+                'constraints': [models.UniqueConstraint(fields=('day', 'domain', 'inquiry_type'), name='contact_daily_stats_unique', nulls_distinct=False)],
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.9 on 2026-10-19 19:20
+
+from django.db import migrations
+
+
+TABLE = 'contact_contactinquiry'
+
+
+def drop_stale_column(apps, schema_editor):
+    """
+    Databases created from scratch still have the original ``inquiry_type``
+    text column (NOT NULL, no default): 0005 added the foreign key beside it
+    and nothing removed it, so no inquiry could be saved. Databases whose
+    column was renamed to ``inquiry_type_old`` lost it in 0008.
+    """
+    connection = schema_editor.connection
+    with connection.cursor() as cursor:
+        columns = {column.name for column in connection.introspection.get_table_description(cursor, TABLE)}
+    if 'inquiry_type' in columns:
+        schema_editor.execute(f'ALTER TABLE {TABLE} DROP COLUMN inquiry_type')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contact', '0013_daily_inquiry_stats'),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_stale_column, migrations.RunPython.noop),
+    ]
@@ -1,8 +1,12 @@
-from django.db import models
-from django.core.mail import send_mail
+from django.db import models, transaction
+from django.db.models import Value
+from django.db.models.functions import Coalesce
+from django.core.mail import EmailMessage
 from django.conf import settings
 from django.utils import timezone
+from cmsapp.domains.cache import VersionedCache
 from cmsapp.domains.models import Domain
+from .rollups import apply_deltas, collect_transitions
 
 
 class InquiryType(models.Model):
@@ -43,16 +47,40 @@ class InquiryType(models.Model):
     
     def __str__(self):
         return self.label
+    
+    @classmethod
+    def choices_for_domain(cls, domain):
+        """Cached ``(pk, label)`` pairs of a domain's active inquiry types."""
+        return inquiry_type_cache.get(getattr(domain, 'pk', domain))
+
+
+def _load_inquiry_type_choices(domain_id):
+    types = InquiryType.objects.filter(is_active=True)
+    if domain_id is None:
+        # No domain: every active type, as the form has always offered
+        types = types.order_by('domain__name', 'order', 'label')
+    else:
+        types = types.filter(domain_id=domain_id).order_by('order', 'label')
+    return list(types.values_list('pk', 'label'))
+
+
+inquiry_type_cache = VersionedCache('inquiry-types', _load_inquiry_type_choices)
 
 
 class ContactInquiry(models.Model):
-    """Model to store contact form submissions."""
+    """
+    Model to store contact form submissions.
+
+    On PostgreSQL the table is partitioned by month of ``created_at``
+    (see ``partitions``); ``archive_inquiries`` exports and drops old months.
+    """
     
     STATUS_CHOICES = [
         ('new', 'New'),
         ('read', 'Read'),
         ('responded', 'Responded'),
         ('closed', 'Closed'),
+        ('spam', 'Spam'),
     ]
     
     # Contact information
@@ -102,6 +130,13 @@ class ContactInquiry(models.Model):
             models.Index(fields=['status']),
         ]
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Compared on save to find read/responded transitions (see rollups)
+        instance._loaded_values = dict(zip(field_names, values))
+        return instance
+    
     def __str__(self):
         inquiry_type_label = self.inquiry_type.label if self.inquiry_type else "Unknown Type"
         domain_name = self.domain.name if self.domain else "Unknown Domain"
@@ -111,66 +146,123 @@ class ContactInquiry(models.Model):
         """Mark inquiry as read."""
         if self.status == 'new':
             self.status = 'read'
-            self.read_at = timezone.now()
-            self.save()
-    
-    def send_confirmation_email(self):
-        """Send confirmation email to the inquirer."""
-        try:
-            subject = f"We received your {self.inquiry_type.label.lower()} inquiry"
-            message = f"""
+            self.read_at = self.read_at or timezone.now()
+            self.save(update_fields=['status', 'read_at', 'updated_at'])
+    
+    @classmethod
+    def set_status(cls, queryset, status):
+        """
+        Move the inquiries in ``queryset`` to ``status`` with a single UPDATE.
+
+        Only new inquiries can be marked as read. ``read_at`` (when read or
+        responded) and ``responded_at`` (when responded) are set only where
+        still empty. The affected rows are locked first, and their daily
+        stats updated in the same transaction. Returns the number changed.
+        """
+        now = timezone.now()
+        changes = {'status': status, 'updated_at': now}
+        if status == 'read':
+            eligible = queryset.filter(status='new')
+        else:
+            eligible = queryset.exclude(status=status)
+        if status in ('read', 'responded'):
+            changes['read_at'] = Coalesce('read_at', Value(now))
+        if status == 'responded':
+            changes['responded_at'] = Coalesce('responded_at', Value(now))
+        
+        with transaction.atomic():
+            rows = list(
+                cls.objects.filter(pk__in=eligible.values('pk'))
+                .select_for_update()
+                .order_by('pk')
+                .values_list('pk', 'created_at', 'domain_id', 'inquiry_type_id', 'read_at', 'responded_at')
+            )
+            if not rows:
+                return 0
+            cls.objects.filter(pk__in=[row[0] for row in rows]).update(**changes)
+            for index, field in ((4, 'read_at'), (5, 'responded_at')):
+                if field in changes:
+                    apply_deltas(collect_transitions(
+                        (row[1:4] for row in rows if row[index] is None), field, now,
+                    ))
+        return len(rows)
+    
+    def queue_notifications(self, config, domain_settings=None):
+        """
+        Write outbox rows for the notifications this inquiry should trigger.
+
+        Call inside the transaction that saves the inquiry: the rows commit
+        or roll back with it, and ``contact_worker`` delivers them later.
+        Alerts for domains on digest delivery wait until the next digest is
+        due, when the worker sends all pending ones as a single message.
+        """
+        messages = []
+        if config.send_confirmation_email:
+            messages.append(OutboxMessage(inquiry=self, kind='confirmation', recipient=self.email))
+        alert_after = domain_settings.next_alert_time() if domain_settings is not None else timezone.now()
+        alert_email = self.alert_email_recipient(config, domain_settings)
+        if alert_email:
+            messages.append(OutboxMessage(inquiry=self, kind='alert_email', recipient=alert_email, run_after=alert_after))
+        alert_phone = self.alert_sms_recipient(config, domain_settings)
+        if alert_phone:
+            messages.append(OutboxMessage(inquiry=self, kind='alert_sms', recipient=alert_phone, run_after=alert_after))
+        return OutboxMessage.objects.bulk_create(messages)
+
+    def alert_email_recipient(self, config, domain_settings=None):
+        """Address that should receive alert emails, or None."""
+        # Domain-level toggle and email take precedence when available
+        if domain_settings is not None:
+            if not domain_settings.enable_alert_email or not self.domain or not self.domain.contact_email:
+                return None
+            return self.domain.contact_email
+        return config.admin_email or None
+
+    def alert_sms_recipient(self, config, domain_settings=None):
+        """Phone number that should receive SMS alerts, or None."""
+        if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN or not settings.TWILIO_PHONE_NUMBER:
+            return None
+        # Domain-level toggle and phone take precedence when available
+        if domain_settings is not None:
+            if not domain_settings.enable_alert_sms or not self.domain or not self.domain.contact_phone:
+                return None
+            return self.domain.contact_phone
+        if not config.enable_sms_notifications or not config.sms_phone_number:
+            return None
+        return config.sms_phone_number
+
+    @property
+    def inquiry_type_label(self):
+        return self.inquiry_type.label if self.inquiry_type else 'General'
+
+    def confirmation_email(self):
+        """The confirmation email sent to the inquirer."""
+        subject = f"We received your {self.inquiry_type_label.lower()} inquiry"
+        message = f"""
 Dear {self.name},
 
 Thank you for contacting us! We have received your inquiry and will get back to you as soon as possible.
 
 Inquiry Details:
-- Type: {self.inquiry_type.label}
+- Type: {self.inquiry_type_label}
 - Date: {self.created_at.strftime('%B %d, %Y at %I:%M %p')}
 
 We appreciate your interest and look forward to assisting you.
 
 Best regards,
 The {settings.SITE_NAME if hasattr(settings, 'SITE_NAME') else 'CMS'} Team
-            """
-            
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [self.email],
-                fail_silently=True,
-            )
-        except Exception as e:
-            print(f"Error sending confirmation email: {e}")
-
-    def send_alert_email(self, config, domain=None, domain_settings=None):
-        """Send email alert to admin about new inquiry."""
-        print('Sending alert email...')
+        """
+        return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [self.email])
 
-        # Domain-level toggle and email take precedence when available
-        domain_email_enabled = domain_settings.enable_alert_email if domain_settings else False
-        domain_email = self.domain.contact_email if self.domain else None
-
-        if domain_settings is not None:
-            if not domain_email_enabled or not domain_email:
-                print('Domain email alerts disabled or email not set; skipping')
-                return False
-            recipient_email = domain_email
-        else:
-            if not config.admin_email:
-                print('Admin email not configured')
-                return False
-            recipient_email = config.admin_email
-
-        try:
-            subject = f"New {self.inquiry_type.label} Inquiry from {self.name}"
-            message = f"""
+    def alert_email(self, recipient):
+        """The alert email telling ``recipient`` about this inquiry."""
+        subject = f"New {self.inquiry_type_label} Inquiry from {self.name}"
+        message = f"""
 A new inquiry has been submitted:
 
 From: {self.name}
 Email: {self.email}
 Phone: {self.phone or 'Not provided'}
-Type: {self.inquiry_type.label}
+Type: {self.inquiry_type_label}
 Date: {self.created_at.strftime('%B %d, %Y at %I:%M %p')}
 
 Message:
@@ -178,71 +270,209 @@ Message:
 
 ---
 You can review this inquiry in the admin panel.
-            """
-
-            send_mail(
-                subject,
-                message,
-                settings.DEFAULT_FROM_EMAIL,
-                [recipient_email],
-                fail_silently=True,
-            )
-            print(f"Alert email sent to {recipient_email}")
-            return True
-        except Exception as e:
-            print(f"Error sending alert email: {e}")
-            return False
+        """
+        return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
 
-    def send_sms_notification(self, config, domain=None, domain_settings=None):
-        """Send SMS alert to admin about new inquiry using Twilio."""
-        print('Sending SMS notification...')
+    def sms_body(self):
+        """Text of the SMS alert about this inquiry."""
+        return (
+            f"New {self.inquiry_type_label} from {self.name}\n"
+            f"Email: {self.email}\n"
+            f"Check admin panel for details."
+        )
 
-        # Domain-level toggle and phone take precedence when available
-        domain_sms_enabled = domain_settings.enable_alert_sms if domain_settings else False
-        domain_phone = self.domain.contact_phone if self.domain else None
+    @staticmethod
+    def digest_email(inquiries, recipient):
+        """One alert email covering several inquiries."""
+        domain_name = inquiries[0].domain.name if inquiries[0].domain else 'your site'
+        subject = f"{len(inquiries)} new inquiries for {domain_name}"
+        entries = [
+            f"""
+From: {inquiry.name}
+Email: {inquiry.email}
+Phone: {inquiry.phone or 'Not provided'}
+Type: {inquiry.inquiry_type_label}
+Date: {inquiry.created_at.strftime('%B %d, %Y at %I:%M %p')}
 
-        if domain_settings is not None:
-            if not domain_sms_enabled or not domain_phone:
-                print('Domain SMS alerts disabled or phone not set; skipping')
-                return False
-            target_number = domain_phone
-        else:
-            if not config.enable_sms_notifications or not config.sms_phone_number:
-                print('SMS notifications not enabled or phone number not configured')
-                return False
-            target_number = config.sms_phone_number
+Message:
+{inquiry.message}
+"""
+            for inquiry in inquiries
+        ]
+        message = (
+            f"{len(inquiries)} inquiries have been submitted:\n"
+            + "\n---\n".join(entries)
+            + "\n---\nYou can review these inquiries in the admin panel.\n"
+        )
+        return EmailMessage(subject, message, settings.DEFAULT_FROM_EMAIL, [recipient])
 
-        # Check Twilio credentials
-        if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN or not settings.TWILIO_PHONE_NUMBER:
-            print('Twilio credentials not configured in settings')
-            return False
+    @staticmethod
+    def digest_sms_body(inquiries):
+        """Text of one SMS alert covering several inquiries."""
+        names = ', '.join(inquiry.name for inquiry in inquiries[:3])
+        if len(inquiries) > 3:
+            names += f" and {len(inquiries) - 3} more"
+        return (
+            f"{len(inquiries)} new inquiries from {names}\n"
+            f"Check admin panel for details."
+        )
 
-        try:
-            from twilio.rest import Client
 
-            client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+class OutboxMessage(models.Model):
+    """
+    A notification waiting to be delivered for a contact inquiry.
 
-            sms_body = (
-                f"New {self.inquiry_type.label} from {self.name}\n"
-                f"Email: {self.email}\n"
-                f"Check admin panel for details."
-            )
+    Rows are written in the same transaction as the inquiry, so a
+    notification is never sent for an inquiry that rolled back and never
+    lost for one that committed. ``contact_worker`` claims them with
+    ``SELECT ... FOR UPDATE SKIP LOCKED`` and retries failures with
+    exponential backoff; delivered rows are deleted and rows that run out
+    of attempts stay behind as failed (the dead letters).
+    """
+    
+    KIND_CHOICES = [
+        ('confirmation', 'Confirmation email'),
+        ('alert_email', 'Alert email'),
+        ('alert_sms', 'Alert SMS'),
+    ]
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('sending', 'Sending'),
+        ('failed', 'Failed'),
+    ]
+    
+    # No database constraint: the partitioned inquiry table has no unique
+    # key on id alone for one to reference (see partitions.py)
+    inquiry = models.ForeignKey(
+        ContactInquiry, on_delete=models.CASCADE, related_name='outbox_messages', db_constraint=False,
+    )
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    recipient = models.CharField(max_length=254)
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_after', 'pk']
+        verbose_name = 'Outbox Message'
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status='queued'), name='contact_outbox_queued_idx'),
+            models.Index(fields=['status', 'locked_at'], name='contact_outbox_status_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} to {self.recipient} ({self.status})"
 
-            message = client.messages.create(
-                body=sms_body,
-                from_=settings.TWILIO_PHONE_NUMBER,
-                to=target_number
-            )
 
-            print(f"SMS sent successfully. SID: {message.sid}")
-            return True
+class AlertThrottle(models.Model):
+    """
+    When a domain was last sent an alert on each channel.
+
+    ``contact_worker`` claims the next alert slot with a conditional UPDATE
+    against this row, so ``DomainSetting.alert_min_interval`` holds even
+    with several workers running.
+    """
+    
+    domain = models.ForeignKey(Domain, on_delete=models.CASCADE, related_name='alert_throttles')
+    kind = models.CharField(max_length=20, choices=OutboxMessage.KIND_CHOICES)
+    last_sent_at = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        unique_together = ('domain', 'kind')
+    
+    def __str__(self):
+        return f"{self.get_kind_display()} for {self.domain.name}"
 
-        except ImportError:
-            print("Twilio package not installed. Run: pip install twilio")
-            return False
-        except Exception as e:
-            print(f"Error sending SMS notification: {e}")
-            return False
+
+class DailyInquiryStats(models.Model):
+    """
+    Inquiries received on a day for a domain and inquiry type, and how
+    quickly they were read and responded to.
+
+    Maintained incrementally as inquiries are saved (see ``rollups``), and
+    kept after the inquiries themselves are archived.
+    """
+    
+    day = models.DateField()
+    domain = models.ForeignKey(
+        Domain, on_delete=models.CASCADE, related_name='inquiry_stats', null=True, blank=True,
+    )
+    inquiry_type = models.ForeignKey(
+        InquiryType, on_delete=models.CASCADE, related_name='daily_stats', null=True, blank=True,
+    )
+    received = models.PositiveIntegerField(default=0)
+    read = models.PositiveIntegerField(default=0)
+    read_seconds = models.PositiveBigIntegerField(default=0, help_text="Total time from received to read")
+    responded = models.PositiveIntegerField(default=0)
+    responded_seconds = models.PositiveBigIntegerField(default=0, help_text="Total time from received to responded")
+    
+    class Meta:
+        verbose_name = 'Daily Inquiry Stats'
+        verbose_name_plural = 'Daily Inquiry Stats'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['day', 'domain', 'inquiry_type'],
+                name='contact_daily_stats_unique',
+                nulls_distinct=False,
+            ),
+        ]
+    
+    def __str__(self):
+        return f"{self.day}: {self.received} inquiries"
+
+
+class SpamClassifier(models.Model):
+    """
+    Word counts of the naive Bayes spam filter (see ``classifier``).
+
+    There is a single row, rebuilt by ``train()`` from inquiries staff have
+    marked as spam and those they have handled normally.
+    """
+    
+    spam_documents = models.PositiveIntegerField(default=0)
+    ham_documents = models.PositiveIntegerField(default=0)
+    spam_tokens = models.JSONField(default=dict)
+    ham_tokens = models.JSONField(default=dict)
+    trained_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        verbose_name = 'Spam Classifier'
+    
+    def __str__(self):
+        return f"Spam classifier ({self.spam_documents} spam, {self.ham_documents} legitimate)"
+    
+    @classmethod
+    def current(cls):
+        """The trained classifier, or None until there are enough examples of both kinds."""
+        model = spam_classifier_cache.get(1)
+        minimum = settings.CONTACT_SPAM_MIN_TRAINING
+        if model is None or model.spam_documents < minimum or model.ham_documents < minimum:
+            return None
+        return model
+    
+    @classmethod
+    def train(cls):
+        """Rebuild the classifier from the most recent reviewed inquiries."""
+        from .classifier import tokenize, train
+        
+        limit = settings.CONTACT_SPAM_TRAINING_LIMIT
+        reviewed = ContactInquiry.objects.order_by('-created_at').values_list('name', 'email', 'message')
+        spam = [tokenize(*row) for row in reviewed.filter(status='spam')[:limit]]
+        ham = [tokenize(*row) for row in reviewed.filter(status__in=['read', 'responded', 'closed'])[:limit]]
+        model, _ = cls.objects.update_or_create(pk=1, defaults=train(spam, ham))
+        return model
+
+
+spam_classifier_cache = VersionedCache(
+    'spam-classifier',
+    lambda pk: SpamClassifier.objects.filter(pk=pk).first(),
+)
 
 
 class ContactConfiguration(models.Model):
@@ -315,8 +545,25 @@ class ContactConfiguration(models.Model):
             f" | Updated: {self.updated_at.strftime('%B %d, %Y')}"
         )
     
+    def save(self, *args, **kwargs):
+        # A singleton: get_config and init_contact_config look it up as pk=1,
+        # so a row created any other way must not take the next sequence value
+        self.pk = 1
+        super().save(*args, **kwargs)
+    
     @classmethod
     def get_config(cls):
-        """Get or create contact configuration."""
-        config, _ = cls.objects.get_or_create(pk=1)
-        return config
+        """
+        The contact configuration, served from the process-local cache.
+
+        The row is created by ``manage.py init_contact_config`` when the site
+        is provisioned; until then an unsaved instance with the defaults is
+        returned rather than writing from a request.
+        """
+        return contact_config_cache.get(1) or cls(pk=1)
+
+
+contact_config_cache = VersionedCache(
+    'contact-configuration',
+    lambda pk: ContactConfiguration.objects.filter(pk=pk).first(),
+)
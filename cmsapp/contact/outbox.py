@@ -0,0 +1,253 @@
+"""
+Delivery of queued contact notifications.
+
+Submitting the contact form only writes the inquiry and its OutboxMessage
+rows in one transaction. The ``contact_worker`` command claims due rows
+in batches with ``SELECT ... FOR UPDATE SKIP LOCKED`` and sends the
+emails over one persistent SMTP connection (see ``mailer``). Alerts due
+for the same domain and recipient are merged into a single digest, which
+is how hourly and daily digest delivery and per-domain rate limits work:
+those alerts simply wait in the outbox until their slot comes. Failures are
+retried with exponential backoff until ``CONTACT_OUTBOX_MAX_ATTEMPTS`` is
+reached, after which the row is kept as failed for an admin to retry.
+"""
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubled for every further attempt
+RETRY_BASE_DELAY = 60
+
+
+def claim_messages(worker_id, limit):
+    """
+    Lock up to ``limit`` due outbox messages, mark them sending and return them.
+
+    Rows locked by another worker are skipped rather than waited on, so
+    concurrent workers never block each other or send a message twice.
+    Every due alert for the same domain, channel and recipient as a claimed
+    alert is claimed with it, so a digest is never split across batches.
+    """
+    from .models import OutboxMessage
+
+    now = timezone.now()
+    with transaction.atomic():
+        due = (
+            OutboxMessage.objects.select_for_update(skip_locked=True, of=('self',))
+            .select_related('inquiry__inquiry_type', 'inquiry__domain')
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'pk')
+        )
+        messages = list(due[:limit])
+        if not messages:
+            return []
+        groups = {alert_group(message) for message in messages if message.kind != 'confirmation'}
+        if groups:
+            claimed = {message.pk for message in messages}
+            messages += [
+                message for message in due.filter(
+                    kind__in={group[1] for group in groups},
+                    recipient__in={group[2] for group in groups},
+                ).exclude(pk__in=claimed)
+                if alert_group(message) in groups
+            ]
+        OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+            status='sending', attempts=F('attempts') + 1, locked_at=now, locked_by=worker_id, updated_at=now,
+        )
+    for message in messages:
+        message.status = 'sending'
+        message.attempts += 1
+        message.locked_at = now
+        message.locked_by = worker_id
+    return messages
+
+
+def alert_group(message):
+    """Alerts sharing this key are delivered as one message."""
+    return (message.inquiry.domain_id, message.kind, message.recipient)
+
+
+def group_messages(messages):
+    """Split claimed messages into units of delivery: one per confirmation, one per alert group."""
+    groups = {}
+    for message in messages:
+        key = ('confirmation', message.pk) if message.kind == 'confirmation' else alert_group(message)
+        groups.setdefault(key, []).append(message)
+    for rows in groups.values():
+        rows.sort(key=lambda message: (message.inquiry.created_at, message.pk))
+    return list(groups.values())
+
+
+def release_stale_messages():
+    """Requeue messages whose worker died while sending them."""
+    from .models import OutboxMessage
+
+    cutoff = timezone.now() - timedelta(seconds=settings.CONTACT_OUTBOX_TIMEOUT)
+    return OutboxMessage.objects.filter(status='sending', locked_at__lt=cutoff).update(
+        status='queued', locked_at=None, locked_by='', updated_at=timezone.now(),
+    )
+
+
+def deliver_messages(messages, mailer):
+    """
+    Send claimed messages; returns (delivered, failed) counts.
+
+    Alerts in the same group are merged into one digest email or SMS.
+    Emails go out together over the worker's pooled SMTP connection, SMS
+    alerts one by one through Twilio. Delivered rows are deleted; alerts
+    held back by the domain's rate limit are requeued, not counted. An
+    alert that fails gives its rate-limit slot back, so the retry is not
+    held back by a send that never happened.
+    """
+    from .models import OutboxMessage
+
+    delivered = []
+    failed = 0
+    emails = []
+    for rows in group_messages(messages):
+        first = rows[0]
+        try:
+            if first.kind != 'confirmation':
+                next_slot = claim_alert_slot(first)
+                if next_slot is not None:
+                    defer_messages(rows, next_slot)
+                    continue
+            if first.kind == 'alert_sms':
+                send_sms(first.recipient, build_sms_body(rows))
+                delivered.extend(rows)
+            else:
+                emails.append((rows, build_email(rows)))
+        except Exception as exc:
+            release_alert_slot(first)
+            for message in rows:
+                record_failure(message, exc)
+            failed += len(rows)
+
+    results = mailer.send_batch([email for _, email in emails])
+    for (rows, _), error in zip(emails, results):
+        if error is None:
+            delivered.extend(rows)
+        else:
+            release_alert_slot(rows[0])
+            for message in rows:
+                record_failure(message, error)
+            failed += len(rows)
+
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in delivered]).delete()
+    return len(delivered), failed
+
+
+def claim_alert_slot(message):
+    """
+    Take the domain's next alert slot for this channel.
+
+    Returns None when the alert may go out now, or the time the next slot
+    opens when ``alert_min_interval`` has not yet passed since the last one.
+    A won slot is remembered on ``message`` for ``release_alert_slot``.
+    """
+    from cmsapp.domains.models import DomainSetting
+    from .models import AlertThrottle
+
+    domain_id = message.inquiry.domain_id
+    if domain_id is None:
+        return None
+    domain_settings = DomainSetting.for_domain(domain_id)
+    if not domain_settings.alert_min_interval:
+        return None
+
+    interval = timedelta(minutes=domain_settings.alert_min_interval)
+    now = timezone.now()
+    throttle, _ = AlertThrottle.objects.get_or_create(domain_id=domain_id, kind=message.kind)
+    # Conditional UPDATE: only one worker can win a slot
+    won = AlertThrottle.objects.filter(
+        Q(last_sent_at__isnull=True) | Q(last_sent_at__lte=now - interval), pk=throttle.pk,
+    ).update(last_sent_at=now)
+    if won:
+        message._alert_slot = (throttle.pk, throttle.last_sent_at, now)
+        return None
+    throttle.refresh_from_db(fields=['last_sent_at'])
+    return throttle.last_sent_at + interval
+
+
+def release_alert_slot(message):
+    """Hand back a slot taken by ``claim_alert_slot`` for an alert that was not sent."""
+    from .models import AlertThrottle
+
+    slot = getattr(message, '_alert_slot', None)
+    if slot is None:
+        return
+    throttle_id, previous, claimed_at = slot
+    # Unless another alert has taken a newer slot since
+    AlertThrottle.objects.filter(pk=throttle_id, last_sent_at=claimed_at).update(last_sent_at=previous)
+    message._alert_slot = None
+
+
+def defer_messages(messages, run_after):
+    """Requeue rate-limited messages for later without using up an attempt."""
+    from .models import OutboxMessage
+
+    OutboxMessage.objects.filter(pk__in=[message.pk for message in messages]).update(
+        status='queued', attempts=F('attempts') - 1, run_after=run_after,
+        locked_at=None, locked_by='', updated_at=timezone.now(),
+    )
+
+
+def record_failure(message, exc):
+    """Schedule a retry with backoff, or dead-letter the message once out of attempts."""
+    logger.warning('Outbox message %s failed (attempt %s): %s', message.pk, message.attempts, exc)
+    message.last_error = f"{type(exc).__name__}: {exc}"
+    message.locked_at = None
+    message.locked_by = ''
+    if message.attempts >= settings.CONTACT_OUTBOX_MAX_ATTEMPTS:
+        message.status = 'failed'
+    else:
+        message.status = 'queued'
+        message.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (message.attempts - 1))
+    message.save(update_fields=['status', 'run_after', 'locked_at', 'locked_by', 'last_error', 'updated_at'])
+
+
+def build_email(messages):
+    """The EmailMessage a group of outbox rows stands for."""
+    from .models import ContactInquiry
+
+    first = messages[0]
+    if first.kind == 'confirmation':
+        return first.inquiry.confirmation_email()
+    if first.kind == 'alert_email':
+        if len(messages) == 1:
+            return first.inquiry.alert_email(first.recipient)
+        return ContactInquiry.digest_email([message.inquiry for message in messages], first.recipient)
+    raise ValueError(f"Unknown outbox message kind {first.kind!r}")
+
+
+def build_sms_body(messages):
+    from .models import ContactInquiry
+
+    if len(messages) == 1:
+        return messages[0].inquiry.sms_body()
+    return ContactInquiry.digest_sms_body([message.inquiry for message in messages])
+
+
+def send_sms(to, body):
+    """Send an SMS through Twilio."""
+    if not settings.TWILIO_ACCOUNT_SID or not settings.TWILIO_AUTH_TOKEN or not settings.TWILIO_PHONE_NUMBER:
+        raise ImproperlyConfigured('Twilio credentials not configured in settings')
+    from twilio.rest import Client
+
+    client = Client(settings.TWILIO_ACCOUNT_SID, settings.TWILIO_AUTH_TOKEN)
+    return client.messages.create(body=body, from_=settings.TWILIO_PHONE_NUMBER, to=to)
+
+
+def retry_messages(messages):
+    """Put failed messages back in the queue with a fresh set of attempts."""
+    return messages.filter(status='failed').update(
+        status='queued', attempts=0, run_after=timezone.now(), last_error='', updated_at=timezone.now(),
+    )
@@ -0,0 +1,62 @@
+"""
+Shared cache of the rendered contact and thank-you pages.
+
+Anonymous visitors without pending flash messages all see the same HTML for
+a domain, so it is rendered once and kept in the shared cache. The pages
+carry no CSRF token (``contact-form.js`` fetches one when the visitor starts
+on the form). A version token in the cache key is replaced whenever the
+configuration, domain settings or inquiry types change; navigation links
+from pages pick up changes within ``CONTACT_PAGE_CACHE_TIMEOUT``.
+"""
+import uuid
+
+from django.conf import settings
+from django.contrib.messages.storage.cookie import CookieStorage
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.utils.cache import patch_cache_control
+
+
+VERSION_KEY = 'contact-pages-version'
+
+
+def is_cacheable(request):
+    """
+    True for GETs that would render the same page for every visitor.
+
+    Looks at cookies only: touching the session or user would add
+    ``Vary: Cookie`` and make the response uncacheable downstream.
+    """
+    return (
+        request.method == 'GET'
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and CookieStorage.cookie_name not in request.COOKIES
+    )
+
+
+def page_cache_key(request, name):
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        cache.add(VERSION_KEY, uuid.uuid4().hex, None)
+        version = cache.get(VERSION_KEY)
+    domain = getattr(request, 'domain', None)
+    return f"contact-page:{version}:{domain.pk if domain else 0}:{name}"
+
+
+def cached_page(request, name, render_page):
+    """Serve page ``name`` from the cache, rendering it with ``render_page()`` on a miss."""
+    key = page_cache_key(request, name)
+    content = cache.get(key)
+    if content is None:
+        response = render_page()
+        if response.status_code != 200:
+            return response
+        content = response.content
+        cache.set(key, content, settings.CONTACT_PAGE_CACHE_TIMEOUT)
+    response = HttpResponse(content)
+    patch_cache_control(response, public=True, max_age=settings.CONTACT_PAGE_CACHE_TIMEOUT)
+    return response
+
+
+def invalidate_pages():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
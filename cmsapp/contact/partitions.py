@@ -0,0 +1,142 @@
+"""
+Monthly range partitions of the contact inquiry table (PostgreSQL only).
+
+``contact_contactinquiry`` is partitioned on ``created_at``, one partition
+per calendar month (``contact_contactinquiry_y2026m10``) plus a default
+partition that catches rows no monthly partition covers. Old months are
+removed by dropping their partition, which is instant and leaves no dead
+rows behind, instead of a long DELETE.
+
+Postgres requires the partition key in every unique constraint, so the
+table's primary key is ``(id, created_at)``; ids still come from a single
+sequence and are unique. Other tables keep plain integer references to
+inquiries without a database-level foreign key.
+"""
+import gzip
+import os
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+
+from .exports import jsonl_lines
+
+
+TABLE = 'contact_contactinquiry'
+DEFAULT_PARTITION = f'{TABLE}_default'
+
+# Statuses whose inquiries may be archived and dropped with their month
+ARCHIVABLE_STATUSES = ('closed', 'spam')
+
+
+def month_start(value):
+    """First instant of the UTC month containing ``value``."""
+    value = value.astimezone(dt_timezone.utc)
+    return datetime(value.year, value.month, 1, tzinfo=dt_timezone.utc)
+
+
+def add_months(month, count):
+    index = month.year * 12 + month.month - 1 + count
+    return month.replace(year=index // 12, month=index % 12 + 1)
+
+
+def partition_name(month):
+    return f'{TABLE}_y{month.year:04d}m{month.month:02d}'
+
+
+def is_partitioned():
+    if connection.vendor != 'postgresql':
+        return False
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT 1 FROM pg_partitioned_table WHERE partrelid = %s::regclass',
+            [TABLE],
+        )
+        return cursor.fetchone() is not None
+
+
+def monthly_partitions():
+    """Months that have a partition, oldest first."""
+    with connection.cursor() as cursor:
+        cursor.execute(
+            'SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid '
+            'WHERE i.inhparent = %s::regclass',
+            [TABLE],
+        )
+        names = [row[0] for row in cursor.fetchall()]
+    prefix = f'{TABLE}_y'
+    return sorted(
+        datetime(int(name[len(prefix):len(prefix) + 4]), int(name[-2:]), 1, tzinfo=dt_timezone.utc)
+        for name in names if name.startswith(prefix)
+    )
+
+
+def create_partition(month):
+    """
+    Add the partition for ``month``.
+
+    Rows for that month that already landed in the default partition are
+    moved across before the new partition is attached.
+    """
+    name = partition_name(month)
+    bounds = [month, add_months(month, 1)]
+    with connection.cursor() as cursor:
+        cursor.execute(f'CREATE TABLE {name} (LIKE {TABLE} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)')
+        cursor.execute(
+            f'WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE created_at >= %s AND created_at < %s RETURNING *) '
+            f'INSERT INTO {name} SELECT * FROM moved',
+            bounds,
+        )
+        cursor.execute(f'ALTER TABLE {TABLE} ATTACH PARTITION {name} FOR VALUES FROM (%s) TO (%s)', bounds)
+    return name
+
+
+def ensure_partitions(now, months_ahead):
+    """Create any missing partitions from this month to ``months_ahead`` months out."""
+    existing = set(monthly_partitions())
+    created = []
+    current = month_start(now)
+    for offset in range(months_ahead + 1):
+        month = add_months(current, offset)
+        if month not in existing:
+            created.append(create_partition(month))
+    return created
+
+
+def drop_partition(month):
+    with connection.cursor() as cursor:
+        cursor.execute(f'DROP TABLE {partition_name(month)}')
+
+
+def lock_partition(month):
+    """Block writes to ``month`` until the current transaction ends."""
+    with connection.cursor() as cursor:
+        cursor.execute(f'LOCK TABLE {partition_name(month)} IN SHARE MODE')
+
+
+def on_persistent_storage(path):
+    """
+    Whether ``path`` is on its own mount, such as a volume, rather than on
+    the root filesystem, which in a container goes away with it.
+    """
+    return os.stat(path).st_dev != os.stat('/').st_dev
+
+
+def export_inquiries(queryset, path):
+    """
+    Write ``queryset`` to ``path`` as gzip-compressed JSON lines, in the
+    format of the admin export (see ``exports``).
+
+    The file is written under a temporary name and renamed once it is
+    complete and on disk. Returns the number of inquiries written.
+    """
+    count = 0
+    partial = f'{path}.partial'
+    with open(partial, 'wb') as raw:
+        with gzip.GzipFile(fileobj=raw, mode='wb') as out:
+            for line in jsonl_lines(queryset.order_by('created_at', 'id')):
+                out.write(line.encode())
+                count += 1
+        raw.flush()
+        os.fsync(raw.fileno())
+    os.replace(partial, path)
+    return count
@@ -0,0 +1,137 @@
+"""
+Daily inquiry statistics, kept up to date as inquiries arrive and are handled.
+
+``DailyInquiryStats`` holds one row per day, domain and inquiry type, for
+inquiries by the (local) day they were received. Saving an inquiry adds its
+changes to that row: one more received, and when ``read_at`` or
+``responded_at`` is first set, one more read or responded plus the seconds
+it took. Bulk updates that bypass ``save()`` pass the same deltas to
+``apply_deltas`` themselves. The rows are small and few, so the dashboard
+never touches the inquiry table; ``backfill_inquiry_stats`` rebuilds them
+from the inquiries still on record.
+"""
+from collections import Counter, defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import F, Sum
+from django.utils import timezone
+
+
+TRACKED_FIELDS = ('read_at', 'responded_at')
+
+
+def rollup_key(created_at, domain_id, inquiry_type_id):
+    return (timezone.localdate(created_at), domain_id, inquiry_type_id)
+
+
+def transition_deltas(created_at, field, value):
+    """Counts for an inquiry whose ``read_at`` or ``responded_at`` was just set."""
+    prefix = field[:-len('_at')]
+    return Counter({prefix: 1, f'{prefix}_seconds': max(0, int((value - created_at).total_seconds()))})
+
+
+def collect_transitions(rows, field, value):
+    """
+    Deltas for setting ``field`` to ``value`` on ``rows``.
+
+    ``rows`` are ``(created_at, domain_id, inquiry_type_id)`` tuples of
+    inquiries where the field was empty.
+    """
+    deltas = defaultdict(Counter)
+    for created_at, domain_id, inquiry_type_id in rows:
+        deltas[rollup_key(created_at, domain_id, inquiry_type_id)] += transition_deltas(created_at, field, value)
+    return deltas
+
+
+def apply_deltas(deltas):
+    """Add ``{(day, domain_id, inquiry_type_id): Counter}`` to the stats rows."""
+    from .models import DailyInquiryStats
+
+    # A fixed order, so concurrent writers lock rows without deadlocking
+    for key in sorted(deltas, key=lambda k: (k[0], k[1] or 0, k[2] or 0)):
+        counts = {field: count for field, count in deltas[key].items() if count}
+        if not counts:
+            continue
+        day, domain_id, inquiry_type_id = key
+        row = DailyInquiryStats.objects.filter(day=day, domain_id=domain_id, inquiry_type_id=inquiry_type_id)
+        increments = {field: F(field) + count for field, count in counts.items()}
+        if row.update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                DailyInquiryStats.objects.create(
+                    day=day, domain_id=domain_id, inquiry_type_id=inquiry_type_id, **counts,
+                )
+        except IntegrityError:
+            # Another request created the row first
+            row.update(**increments)
+
+
+def record_saved(inquiry, created):
+    """Add a saved inquiry's changes since it was loaded to the stats."""
+    if created:
+        before = dict.fromkeys(TRACKED_FIELDS)
+    else:
+        before = getattr(inquiry, '_loaded_values', None)
+        if before is None:
+            # Built without loading; nothing to compare against
+            return
+    counts = Counter(received=1) if created else Counter()
+    for field in TRACKED_FIELDS:
+        value = getattr(inquiry, field) if field in before else None
+        if value and not before[field]:
+            counts += transition_deltas(inquiry.created_at, field, value)
+    if counts:
+        apply_deltas({rollup_key(inquiry.created_at, inquiry.domain_id, inquiry.inquiry_type_id): counts})
+    inquiry._loaded_values = {
+        **before, **{field: getattr(inquiry, field) for field in TRACKED_FIELDS if field in before},
+    }
+
+
+def average_duration(seconds, count):
+    """'2h 05m' style average, or '-' when there is nothing to average."""
+    if not count:
+        return '-'
+    minutes = round(seconds / count / 60)
+    if minutes < 60:
+        return f'{minutes}m'
+    hours, minutes = divmod(minutes, 60)
+    if hours < 48:
+        return f'{hours}h {minutes:02d}m'
+    return f'{hours // 24}d {hours % 24}h'
+
+
+def _with_averages(sums):
+    received = sums['sum_received'] or 0
+    responded = sums['sum_responded'] or 0
+    return {
+        'received': received,
+        'read': sums['sum_read'] or 0,
+        'responded': responded,
+        'response_rate': f'{responded * 100 / received:.0f}%' if received else '-',
+        'time_to_read': average_duration(sums['sum_read_seconds'] or 0, sums['sum_read'] or 0),
+        'time_to_respond': average_duration(sums['sum_responded_seconds'] or 0, responded),
+    }
+
+
+def summarize(stats):
+    """Totals of a ``DailyInquiryStats`` queryset, and breakdowns by domain, type and day."""
+    sums = {
+        f'sum_{field}': Sum(field)
+        for field in ('received', 'read', 'read_seconds', 'responded', 'responded_seconds')
+    }
+
+    def breakdown(field):
+        return [
+            {'label': row[field], **_with_averages(row)}
+            for row in stats.values(field).annotate(**sums).order_by(field)
+        ]
+
+    by_day = breakdown('day')
+    by_day.reverse()
+    return {
+        'totals': _with_averages(stats.aggregate(**sums)),
+        'by_domain': breakdown('domain__name'),
+        'by_type': breakdown('inquiry_type__label'),
+        'by_day': by_day,
+    }
@@ -0,0 +1,42 @@
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from cmsapp.domains.models import Domain, DomainSetting
+from .models import (
+    ContactConfiguration, ContactInquiry, InquiryType, SpamClassifier,
+    contact_config_cache, inquiry_type_cache, spam_classifier_cache,
+)
+from .pagecache import invalidate_pages
+from .rollups import record_saved
+
+
+@receiver(post_save, sender=ContactConfiguration)
+@receiver(post_delete, sender=ContactConfiguration)
+def invalidate_contact_config(sender, **kwargs):
+    contact_config_cache.invalidate()
+    invalidate_pages()
+
+
+@receiver(post_save, sender=InquiryType)
+@receiver(post_delete, sender=InquiryType)
+def invalidate_inquiry_types(sender, **kwargs):
+    inquiry_type_cache.invalidate()
+    invalidate_pages()
+
+
+@receiver(post_save, sender=Domain)
+@receiver(post_save, sender=DomainSetting)
+def invalidate_contact_pages(sender, **kwargs):
+    """Page chrome (navigation, watermark, custom CSS) comes from these."""
+    invalidate_pages()
+
+
+@receiver(post_save, sender=SpamClassifier)
+@receiver(post_delete, sender=SpamClassifier)
+def invalidate_spam_classifier(sender, **kwargs):
+    spam_classifier_cache.invalidate()
+
+
+@receiver(post_save, sender=ContactInquiry)
+def update_inquiry_stats(sender, instance, created, raw=False, **kwargs):
+    if not raw:
+        record_saved(instance, created)
@@ -0,0 +1,147 @@
+"""
+Abuse checks run on contact submissions before anything is written.
+
+``screen_request`` looks only at the request: the honeypot field, the signed
+form-start stamp (forms sent faster than a person can type, or without a
+stamp, are turned away) and per-IP and per-domain token buckets. Once the
+form is valid, ``screen_inquiry`` drops repeats of a message seen within
+``CONTACT_DUPLICATE_WINDOW`` and, when a classifier has been trained,
+messages it scores as spam. A message only counts as seen once
+``remember_inquiry`` has recorded it after its inquiry was committed.
+
+All state lives in the shared cache, so the checks cost no queries. The
+buckets are read and written without a lock and may let a few extra
+requests through under heavy concurrency.
+"""
+import hashlib
+import logging
+import time
+
+from django.conf import settings
+from django.core import signing
+from django.core.cache import cache
+from django.db import transaction
+
+from .classifier import spam_probability, tokenize
+
+
+logger = logging.getLogger(__name__)
+
+HONEYPOT_FIELD = 'website'
+STAMP_FIELD = 'started'
+STAMP_SALT = 'cmsapp.contact.form-started'
+
+
+class Rejection(Exception):
+    """
+    A submission that must not be saved.
+
+    Silent rejections look like a successful submission to the sender, so
+    bots learn nothing; the others re-show the form with ``message``.
+    """
+
+    def __init__(self, reason, message=None, status=200):
+        super().__init__(reason)
+        self.reason = reason
+        self.message = message
+        self.status = status
+
+    @property
+    def silent(self):
+        return self.message is None
+
+
+def client_ip(request):
+    header = settings.CONTACT_CLIENT_IP_HEADER
+    return (header and request.META.get(header)) or request.META.get('REMOTE_ADDR', '')
+
+
+def sign_form_start(domain, at=None):
+    """Signed stamp recording when a visitor started filling in the form."""
+    return signing.dumps({'t': at or time.time(), 'd': getattr(domain, 'pk', None)}, salt=STAMP_SALT)
+
+
+def check_form_start(stamp, domain):
+    try:
+        data = signing.loads(stamp or '', salt=STAMP_SALT, max_age=settings.CONTACT_FORM_MAX_AGE)
+    except signing.BadSignature:
+        # Also covers SignatureExpired
+        return 'stale_form'
+    if data.get('d') != getattr(domain, 'pk', None):
+        return 'stale_form'
+    if time.time() - data['t'] < settings.CONTACT_MIN_FILL_SECONDS:
+        return 'too_fast'
+    return None
+
+
+def take_token(key, burst, per_hour):
+    """Take one token from a bucket holding ``burst`` that refills ``per_hour``."""
+    now = time.time()
+    tokens, updated = cache.get(key) or (burst, now)
+    tokens = min(burst, tokens + (now - updated) * per_hour / 3600)
+    allowed = tokens >= 1
+    if allowed:
+        tokens -= 1
+    # Keep the bucket until it would be full again anyway
+    cache.set(key, (tokens, now), int((burst - tokens) * 3600 / per_hour) + 1)
+    return allowed
+
+
+def screen_request(request, domain):
+    """Raise Rejection for a POST that fails the request-level checks."""
+    if request.POST.get(HONEYPOT_FIELD):
+        raise Rejection('honeypot')
+
+    problem = check_form_start(request.POST.get(STAMP_FIELD), domain)
+    if problem:
+        raise Rejection(problem, 'The form took too little time or has expired. Please check your message and send it again.')
+
+    domain_id = getattr(domain, 'pk', 0)
+    if not take_token(f"contact-rate:ip:{domain_id}:{client_ip(request)}",
+                      settings.CONTACT_IP_BURST, settings.CONTACT_IP_PER_HOUR):
+        raise Rejection('ip_rate', 'You have sent several messages already. Please try again later.', status=429)
+    if not take_token(f"contact-rate:domain:{domain_id}",
+                      settings.CONTACT_DOMAIN_BURST, settings.CONTACT_DOMAIN_PER_HOUR):
+        raise Rejection('domain_rate', 'We are receiving a lot of messages right now. Please try again later.', status=429)
+
+
+def duplicate_key(domain, cleaned_data):
+    """Cache key for a message, ignoring case and whitespace."""
+    normalized = ' '.join(cleaned_data.get('message', '').lower().split())
+    digest = hashlib.sha256(f"{cleaned_data.get('email', '').lower()}\n{normalized}".encode()).hexdigest()
+    return f"contact-duplicate:{getattr(domain, 'pk', 0)}:{digest}"
+
+
+def screen_inquiry(domain, cleaned_data):
+    """Raise Rejection for a valid form that repeats a recent message or reads as spam."""
+    name = cleaned_data.get('name', '')
+    email = cleaned_data.get('email', '')
+    message = cleaned_data.get('message', '')
+
+    if cache.get(duplicate_key(domain, cleaned_data)):
+        raise Rejection('duplicate')
+
+    if settings.CONTACT_SPAM_CLASSIFIER:
+        from .models import SpamClassifier
+
+        model = SpamClassifier.current()
+        if model is not None and spam_probability(model, tokenize(name, email, message)) >= settings.CONTACT_SPAM_THRESHOLD:
+            raise Rejection('classifier')
+
+
+def remember_inquiry(domain, cleaned_data):
+    """
+    Reject repeats of this message once the transaction saving it commits.
+
+    Recording it any earlier would turn away the sender's retry when the
+    save fails.
+    """
+    key = duplicate_key(domain, cleaned_data)
+    transaction.on_commit(lambda: cache.set(key, True, settings.CONTACT_DUPLICATE_WINDOW))
+
+
+def log_rejection(request, domain, rejection):
+    logger.info(
+        'Contact submission rejected (%s) from %s on %s',
+        rejection.reason, client_ip(request), getattr(domain, 'name', '-'),
+    )
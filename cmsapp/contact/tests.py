@@ -1,6 +1,35 @@
-from django.test import TestCase, Client
+import csv
+import gzip
+import json
+import os
+import socket
+import socketserver
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+from unittest import mock, skipUnless
+
+from django.conf import settings as django_settings
+from django.contrib.auth.models import Permission, User
+from django.core import mail
+from django.core.cache import cache
+from django.core.management import CommandError, call_command
+from django.db import connection, transaction
+from django.db.migrations.executor import MigrationExecutor
+from django.test import TestCase, TransactionTestCase, Client, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from .models import ContactInquiry, ContactConfiguration
+from django.utils import timezone
+from cmsapp.domains.models import Domain, DomainPermission, DomainSetting
+from .mailer import PooledMailer
+from .partitions import add_months, export_inquiries, is_partitioned, month_start, partition_name
+from .models import (
+    AlertThrottle, ContactInquiry, ContactConfiguration, DailyInquiryStats, InquiryType, OutboxMessage,
+    SpamClassifier,
+)
+from .spam import sign_form_start
 
 
 class ContactFormTestCase(TestCase):
@@ -94,3 +123,724 @@ class ContactFormTestCase(TestCase):
         inquiry.refresh_from_db()
         self.assertEqual(inquiry.status, 'read')
         self.assertIsNotNone(inquiry.read_at)
+
+
+class ConfigurationCacheTestCase(TestCase):
+    """Configuration is read from the process cache, not the database."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        ContactConfiguration.objects.create(admin_email='admin@example.com')
+
+    def test_new_domain_is_provisioned_with_settings(self):
+        self.assertTrue(DomainSetting.objects.filter(domain=self.domain).exists())
+
+    def test_contact_get_runs_no_configuration_queries(self):
+        self.client.get(reverse('contact:contact'))
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('contact:contact'))
+        self.assertEqual(response.status_code, 200)
+        tables = ('contact_contactconfiguration', 'domains_domainsetting')
+        self.assertFalse([q['sql'] for q in queries if any(table in q['sql'] for table in tables)])
+
+    def test_get_does_not_create_configuration(self):
+        ContactConfiguration.objects.all().delete()
+        response = self.client.get(reverse('contact:contact'))
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(ContactConfiguration.objects.exists())
+
+    def test_saving_invalidates_cached_values(self):
+        self.assertTrue(ContactConfiguration.get_config().enable_contact_form)
+        config = ContactConfiguration.objects.get()
+        self.assertEqual(config.pk, 1)
+        config.enable_contact_form = False
+        config.save()
+        self.assertFalse(ContactConfiguration.get_config().enable_contact_form)
+
+        self.assertEqual(DomainSetting.for_domain(self.domain).alert_delivery, 'immediate')
+        DomainSetting.objects.filter(domain=self.domain).update(alert_delivery='daily')
+        # update() sends no signal; the cached copy is still served
+        self.assertEqual(DomainSetting.for_domain(self.domain).alert_delivery, 'immediate')
+        settings_row = DomainSetting.objects.get(domain=self.domain)
+        settings_row.save()
+        self.assertEqual(DomainSetting.for_domain(self.domain).alert_delivery, 'daily')
+
+
+class ContactPageCacheTestCase(TestCase):
+    """Anonymous contact pages come from the shared cache without a CSRF token."""
+
+    def setUp(self):
+        cache.clear()
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        ContactConfiguration.objects.create(admin_email='admin@example.com')
+        self.url = reverse('contact:contact')
+
+    def test_second_get_is_served_from_cache(self):
+        first = self.client.get(self.url)
+        self.assertContains(first, 'Service')
+        with CaptureQueriesContext(connection) as queries:
+            second = self.client.get(self.url)
+        self.assertEqual(second.content, first.content)
+        self.assertIn('public', second['Cache-Control'])
+        self.assertFalse([q['sql'] for q in queries if 'contact_inquirytype' in q['sql']])
+        self.assertContains(second, 'name="csrfmiddlewaretoken" value=""')
+
+    def test_inquiry_type_change_refreshes_page(self):
+        self.client.get(self.url)
+        self.inquiry_type.label = 'Sales'
+        self.inquiry_type.save()
+        self.assertContains(self.client.get(self.url), 'Sales')
+
+    def test_visitors_with_a_session_get_a_fresh_page(self):
+        self.client.get(self.url)
+        self.client.cookies[django_settings.SESSION_COOKIE_NAME] = 'abc'
+        response = self.client.get(self.url)
+        self.assertNotIn('public', response.get('Cache-Control', ''))
+        self.assertTemplateUsed(response, 'modern/contact.html')
+
+    @override_settings(CONTACT_MIN_FILL_SECONDS=0)
+    def test_submission_with_token_from_csrf_endpoint(self):
+        client = Client(enforce_csrf_checks=True)
+        data = {
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'inquiry_type': self.inquiry_type.pk,
+            'message': 'Hello there.',
+        }
+        self.assertEqual(client.post(self.url, data).status_code, 403)
+        fetched = client.get(reverse('contact:csrf')).json()
+        response = client.post(self.url, dict(data, csrfmiddlewaretoken=fetched['token'], started=fetched['started']))
+        self.assertRedirects(response, reverse('contact:thank_you'), fetch_redirect_response=False)
+        self.assertEqual(ContactInquiry.objects.count(), 1)
+
+
+class SpamFilterTestCase(TestCase):
+    """Abusive submissions are turned away before anything is saved."""
+
+    def setUp(self):
+        cache.clear()
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        ContactConfiguration.objects.create(admin_email='admin@example.com', send_confirmation_email=False)
+        self.url = reverse('contact:contact')
+
+    def submit(self, started_ago=10, **overrides):
+        data = {
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'inquiry_type': self.inquiry_type.pk,
+            'message': 'Hello there.',
+            'started': sign_form_start(self.domain, at=time.time() - started_ago),
+        }
+        data.update(overrides)
+        return self.client.post(self.url, data)
+
+    def test_honeypot_is_silently_dropped(self):
+        response = self.submit(website='http://spam.example.com')
+        self.assertRedirects(response, reverse('contact:thank_you'), fetch_redirect_response=False)
+        self.assertFalse(ContactInquiry.objects.exists())
+
+    def test_form_sent_too_fast_or_unsigned_is_shown_again(self):
+        self.assertContains(self.submit(started_ago=0), 'took too little time')
+        self.assertContains(self.submit(started='forged'), 'took too little time')
+        self.assertFalse(ContactInquiry.objects.exists())
+
+    @override_settings(CONTACT_IP_BURST=2, CONTACT_IP_PER_HOUR=1)
+    def test_ip_rate_limit(self):
+        self.assertEqual(self.submit(message='One').status_code, 302)
+        self.assertEqual(self.submit(message='Two').status_code, 302)
+        self.assertEqual(self.submit(message='Three').status_code, 429)
+        self.assertEqual(ContactInquiry.objects.count(), 2)
+
+    def test_duplicate_message_is_saved_once(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            self.submit(message='Do you   service\nslide-outs?')
+        response = self.submit(message='do you service slide-outs?')
+        self.assertRedirects(response, reverse('contact:thank_you'), fetch_redirect_response=False)
+        self.assertEqual(ContactInquiry.objects.count(), 1)
+
+    def test_failed_save_does_not_block_a_retry(self):
+        with mock.patch.object(ContactInquiry, 'queue_notifications', side_effect=RuntimeError('db down')):
+            with self.captureOnCommitCallbacks(execute=True), self.assertRaises(RuntimeError):
+                self.submit()
+        self.assertFalse(ContactInquiry.objects.exists())
+
+        self.assertEqual(self.submit().status_code, 302)
+        self.assertEqual(ContactInquiry.objects.count(), 1)
+
+    @override_settings(CONTACT_SPAM_MIN_TRAINING=3)
+    def test_classifier_learns_from_inquiries_marked_as_spam(self):
+        for i in range(3):
+            ContactInquiry.objects.create(
+                domain=self.domain, name='Seo Expert', email=f'seo{i}@spam.example', status='spam',
+                message=f'Cheap SEO backlinks ranking offer {i} http://spam.example',
+            )
+            ContactInquiry.objects.create(
+                domain=self.domain, name='Pat Owner', email=f'pat{i}@example.com', status='responded',
+                message=f'My trailer awning needs repair, can you quote {i}?',
+            )
+        self.assertEqual(self.submit(message='Cheap SEO backlinks offer http://spam.example').status_code, 302)
+        self.assertEqual(ContactInquiry.objects.filter(status='new').count(), 1)
+
+        out = StringIO()
+        call_command('train_spam_filter', stdout=out)
+        self.assertIn('3 spam and 3 legitimate', out.getvalue())
+        self.submit(name='Seo Expert', message='SEO backlinks ranking offer, cheap! http://spam.example')
+        self.submit(message='The awning on my trailer needs repair')
+        self.assertEqual(
+            list(ContactInquiry.objects.filter(status='new').values_list('message', flat=True).order_by('pk')),
+            ['Cheap SEO backlinks offer http://spam.example', 'The awning on my trailer needs repair'],
+        )
+
+
+class InquiryExportTestCase(TestCase):
+    """Staff stream filtered inquiries from the admin as CSV or JSON lines."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        for status, message in [('closed', '=HYPERLINK("http://example.com")'), ('responded', 'Hello')]:
+            ContactInquiry.objects.create(
+                domain=self.domain, inquiry_type=self.inquiry_type, name='Jane', email='jane@example.com',
+                message=message, status=status,
+            )
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def test_csv_endpoint_applies_changelist_filters(self):
+        url = reverse('admin:contact_contactinquiry_export', args=['csv'])
+        self.assertContains(self.client.get(reverse('admin:contact_contactinquiry_changelist')), url)
+        response = self.client.get(url, {'status__exact': 'closed'})
+        self.assertTrue(response.streaming)
+        self.assertIn('attachment;', response['Content-Disposition'])
+        rows = list(csv.DictReader(b''.join(response.streaming_content).decode().splitlines()))
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['domain'], 'testserver')
+        self.assertEqual(rows[0]['inquiry_type'], 'Service')
+        # Cells are not interpreted as spreadsheet formulas
+        self.assertEqual(rows[0]['message'], '\'=HYPERLINK("http://example.com")')
+
+    def test_unknown_format_is_not_found(self):
+        self.assertEqual(self.client.get(reverse('admin:contact_contactinquiry_export', args=['xlsx'])).status_code, 404)
+
+    def test_action_exports_selected_as_json_lines(self):
+        selected = ContactInquiry.objects.get(status='responded')
+        response = self.client.post(reverse('admin:contact_contactinquiry_changelist'), {
+            'action': 'export_jsonl',
+            '_selected_action': [selected.pk],
+        })
+        rows = [json.loads(line) for line in b''.join(response.streaming_content).decode().splitlines()]
+        self.assertEqual([row['id'] for row in rows], [selected.pk])
+        self.assertEqual(rows[0]['message'], 'Hello')
+
+
+class InquiryStatsTestCase(TestCase):
+    """Daily rollups follow inquiries as they arrive and are handled."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+
+    def create_inquiry(self, **fields):
+        return ContactInquiry.objects.create(
+            domain=self.domain, inquiry_type=self.inquiry_type, name='Jane', email='jane@example.com',
+            message='Hello', **fields,
+        )
+
+    def stats(self):
+        return DailyInquiryStats.objects.values('received', 'read', 'responded').get()
+
+    def test_saves_update_the_day_row(self):
+        inquiry = self.create_inquiry()
+        self.create_inquiry()
+        self.assertEqual(self.stats(), {'received': 2, 'read': 0, 'responded': 0})
+
+        inquiry = ContactInquiry.objects.get(pk=inquiry.pk)
+        inquiry.mark_as_read()
+        inquiry.admin_notes = 'Called back'
+        inquiry.save()
+        self.assertEqual(self.stats(), {'received': 2, 'read': 1, 'responded': 0})
+
+    def test_responded_action_counts_first_responses_once(self):
+        inquiry = self.create_inquiry()
+        changelist = reverse('admin:contact_contactinquiry_changelist')
+        for _ in range(2):
+            self.client.post(changelist, {'action': 'mark_as_responded', '_selected_action': [inquiry.pk]})
+        self.assertEqual(self.stats()['responded'], 1)
+
+    def test_bulk_transitions_keep_earliest_timestamps(self):
+        earlier = timezone.now() - timedelta(hours=2)
+        seen = self.create_inquiry(status='read', read_at=earlier)
+        fresh = self.create_inquiry()
+        with self.assertNumQueries(6):
+            # savepoint, lock, update, one stats row each for read and responded, release
+            updated = ContactInquiry.set_status(ContactInquiry.objects.all(), 'responded')
+        self.assertEqual(updated, 2)
+        seen.refresh_from_db()
+        fresh.refresh_from_db()
+        self.assertEqual(seen.read_at, earlier)
+        self.assertEqual(fresh.read_at, fresh.responded_at)
+        # seen was already counted as read when it was created
+        self.assertEqual(self.stats(), {'received': 2, 'read': 2, 'responded': 2})
+        self.assertEqual(ContactInquiry.set_status(ContactInquiry.objects.all(), 'responded'), 0)
+
+    def test_only_opening_an_inquiry_marks_it_read(self):
+        opened = self.create_inquiry()
+        listed = self.create_inquiry()
+        self.client.get(reverse('admin:contact_contactinquiry_changelist'))
+        self.client.get(reverse('admin:contact_contactinquiry_export', args=['csv']))
+        self.assertFalse(ContactInquiry.objects.exclude(status='new').exists())
+
+        response = self.client.get(reverse('admin:contact_contactinquiry_change', args=[opened.pk]))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(ContactInquiry.objects.get(pk=opened.pk).status, 'read')
+        self.assertEqual(ContactInquiry.objects.get(pk=listed.pk).status, 'new')
+        self.assertEqual(self.stats(), {'received': 2, 'read': 1, 'responded': 0})
+
+    def test_bulk_spam_triage(self):
+        for _ in range(3):
+            self.create_inquiry()
+        changelist = reverse('admin:contact_contactinquiry_changelist')
+        with mock.patch.object(SpamClassifier, 'train') as train:
+            response = self.client.post(changelist, {
+                'action': 'mark_as_spam',
+                '_selected_action': list(ContactInquiry.objects.values_list('pk', flat=True)),
+            }, follow=True)
+        train.assert_not_called()
+        self.assertContains(response, '3 inquiries marked as Spam.')
+        self.assertEqual(ContactInquiry.objects.filter(status='spam').count(), 3)
+
+    def test_backfill_matches_incremental_counts(self):
+        self.create_inquiry()
+        self.create_inquiry().mark_as_read()
+        expected = list(DailyInquiryStats.objects.values('day', 'received', 'read', 'responded'))
+        DailyInquiryStats.objects.all().delete()
+        out = StringIO()
+        call_command('backfill_inquiry_stats', stdout=out)
+        self.assertIn('Rebuilt 1 daily stats rows', out.getvalue())
+        self.assertEqual(list(DailyInquiryStats.objects.values('day', 'received', 'read', 'responded')), expected)
+
+    def test_dashboard_reads_only_rollups(self):
+        self.create_inquiry()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('admin:contact_contactinquiry_dashboard'), {'days': '7'})
+        self.assertContains(response, 'Inquiry statistics')
+        self.assertContains(response, '<td>Service</td>', html=True)
+        self.assertFalse([q['sql'] for q in queries if 'contact_contactinquiry' in q['sql']])
+
+    def test_dashboard_shows_only_the_users_domains(self):
+        other = Domain.objects.create(name='other.example', title='Other')
+        self.create_inquiry()
+        ContactInquiry.objects.create(
+            domain=other, inquiry_type=InquiryType.objects.create(domain=other, slug='sales', label='Sales'),
+            name='John', email='john@example.com', message='Hello',
+        )
+        staff = User.objects.create_user('editor', 'editor@example.com', 'password', is_staff=True)
+        staff.user_permissions.add(Permission.objects.get(codename='view_contactinquiry'))
+        DomainPermission.objects.create(user=staff, domain=self.domain)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('admin:contact_contactinquiry_dashboard'))
+        self.assertEqual(list(response.context['domains']), [self.domain])
+        self.assertEqual(response.context['totals']['received'], 1)
+        self.assertEqual([row['label'] for row in response.context['by_domain']], ['testserver'])
+        self.assertNotContains(response, 'other.example')
+        self.assertNotContains(response, 'Sales')
+
+
+class ContactOutboxTestCase(TestCase):
+    """Notifications are queued with the inquiry and sent by contact_worker."""
+
+    def setUp(self):
+        cache.clear()
+        self.domain = Domain.objects.create(
+            name='testserver', title='Test', contact_email='alerts@example.com', contact_phone='+15550100',
+        )
+        DomainSetting.objects.filter(domain=self.domain).update(enable_alert_email=True)
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        ContactConfiguration.objects.create(admin_email='admin@example.com', send_confirmation_email=True)
+
+    def submit(self):
+        return self.client.post(reverse('contact:contact'), {
+            'name': 'John Doe',
+            'email': 'john@example.com',
+            'inquiry_type': self.inquiry_type.pk,
+            'message': 'Hello there.',
+            'started': sign_form_start(self.domain, at=time.time() - 10),
+        })
+
+    def test_submission_queues_without_sending(self):
+        response = self.submit()
+        self.assertEqual(response.status_code, 302)
+        self.assertEqual(len(mail.outbox), 0)
+        kinds = sorted(OutboxMessage.objects.values_list('kind', 'recipient'))
+        self.assertEqual(kinds, [('alert_email', 'alerts@example.com'), ('confirmation', 'john@example.com')])
+
+    def test_worker_delivers_and_clears_outbox(self):
+        self.submit()
+        call_command('contact_worker', '--once', stdout=StringIO())
+        self.assertEqual(sorted(m.to[0] for m in mail.outbox), ['alerts@example.com', 'john@example.com'])
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @mock.patch('cmsapp.contact.management.commands.contact_worker.close_old_connections')
+    def test_only_the_polling_loop_recycles_connections(self, close_old_connections):
+        call_command('contact_worker', '--once', stdout=StringIO())
+        close_old_connections.assert_not_called()
+
+        with mock.patch('cmsapp.contact.management.commands.contact_worker.time.sleep', side_effect=KeyboardInterrupt), \
+                self.assertRaises(KeyboardInterrupt):
+            call_command('contact_worker', '--poll-interval', '0', stdout=StringIO())
+        close_old_connections.assert_called_once_with()
+
+    def test_rolled_back_inquiry_leaves_no_messages(self):
+        config = ContactConfiguration.objects.get()
+        with self.assertRaises(RuntimeError), transaction.atomic():
+            inquiry = ContactInquiry.objects.create(
+                name='Jane', email='jane@example.com', message='Hi', domain=self.domain, inquiry_type=self.inquiry_type,
+            )
+            inquiry.queue_notifications(config, self.domain.settings)
+            raise RuntimeError('rollback')
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    @override_settings(CONTACT_OUTBOX_MAX_ATTEMPTS=2)
+    def test_failures_back_off_then_dead_letter(self):
+        self.submit()
+        OutboxMessage.objects.exclude(kind='confirmation').delete()
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP down')):
+            call_command('contact_worker', '--once', stdout=StringIO())
+            message = OutboxMessage.objects.get()
+            self.assertEqual(message.status, 'queued')
+            self.assertEqual(message.attempts, 1)
+            self.assertGreater(message.run_after, timezone.now() + timedelta(seconds=30))
+            self.assertIn('SMTP down', message.last_error)
+
+            OutboxMessage.objects.update(run_after=timezone.now())
+            call_command('contact_worker', '--once', stdout=StringIO())
+            message.refresh_from_db()
+            self.assertEqual(message.status, 'failed')
+            self.assertEqual(message.attempts, 2)
+
+        # A failed message is not picked up again until an admin retries it
+        call_command('contact_worker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 0)
+        from .outbox import retry_messages
+        self.assertEqual(retry_messages(OutboxMessage.objects.all()), 1)
+        call_command('contact_worker', '--once', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+
+class AlertDigestTestCase(TestCase):
+    """Digest delivery and rate limits merge alerts without losing any."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='testserver', title='Test', contact_email='alerts@example.com')
+        self.domain_settings = self.domain.settings
+        self.domain_settings.alert_delivery = 'hourly'
+        self.domain_settings.save()
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+        self.config = ContactConfiguration.objects.create(admin_email='admin@example.com', send_confirmation_email=False)
+
+    def inquire(self, name):
+        with transaction.atomic():
+            inquiry = ContactInquiry.objects.create(
+                name=name, email=f'{name.lower()}@example.com', message=f'Message from {name}',
+                domain=self.domain, inquiry_type=self.inquiry_type,
+            )
+            inquiry.queue_notifications(self.config, self.domain_settings)
+        return inquiry
+
+    def run_worker(self):
+        call_command('contact_worker', '--once', stdout=StringIO())
+
+    def test_next_alert_time(self):
+        now = timezone.make_aware(timezone.datetime(2026, 3, 1, 10, 25))
+        self.assertEqual(self.domain_settings.next_alert_time(now), now.replace(hour=11, minute=0))
+        self.domain_settings.alert_delivery = 'daily'
+        self.domain_settings.alert_digest_hour = 8
+        self.assertEqual(self.domain_settings.next_alert_time(now), now.replace(day=2, hour=8, minute=0))
+        self.domain_settings.alert_delivery = 'immediate'
+        self.assertEqual(self.domain_settings.next_alert_time(now), now)
+
+    def test_hourly_digest_waits_then_sends_one_email(self):
+        for name in ('Ann', 'Bob', 'Cy'):
+            self.inquire(name)
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 0)
+
+        # A restarted worker picks the same rows up once the digest is due
+        OutboxMessage.objects.update(run_after=timezone.now())
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].subject, '3 new inquiries for testserver')
+        for name in ('Ann', 'Bob', 'Cy'):
+            self.assertIn(f'Message from {name}', mail.outbox[0].body)
+        self.assertFalse(OutboxMessage.objects.exists())
+
+    def test_digest_is_not_split_across_batches(self):
+        for name in ('Ann', 'Bob', 'Cy'):
+            self.inquire(name)
+        OutboxMessage.objects.update(run_after=timezone.now())
+        call_command('contact_worker', '--once', '--batch-size', '1', stdout=StringIO())
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_rate_limit_defers_and_merges_alerts(self):
+        self.domain_settings.alert_delivery = 'immediate'
+        self.domain_settings.alert_min_interval = 30
+        self.domain_settings.save()
+        self.inquire('Ann')
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+
+        self.inquire('Bob')
+        self.inquire('Cy')
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        deferred = OutboxMessage.objects.all()
+        self.assertEqual(deferred.count(), 2)
+        self.assertTrue(all(m.status == 'queued' and m.attempts == 0 for m in deferred))
+        self.assertGreater(deferred[0].run_after, timezone.now() + timedelta(minutes=29))
+
+        AlertThrottle.objects.update(last_sent_at=timezone.now() - timedelta(minutes=31))
+        OutboxMessage.objects.update(run_after=timezone.now())
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 2)
+        self.assertEqual(mail.outbox[1].subject, '2 new inquiries for testserver')
+
+    def test_failed_alert_gives_its_slot_back(self):
+        self.domain_settings.alert_delivery = 'immediate'
+        self.domain_settings.alert_min_interval = 30
+        self.domain_settings.save()
+        self.inquire('Ann')
+        with mock.patch('django.core.mail.backends.locmem.EmailBackend.send_messages', side_effect=OSError('SMTP down')):
+            self.run_worker()
+        self.assertIsNone(AlertThrottle.objects.get().last_sent_at)
+
+        OutboxMessage.objects.update(run_after=timezone.now())
+        self.run_worker()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertIsNotNone(AlertThrottle.objects.get().last_sent_at)
+
+
+class SMTPStandIn(socketserver.ThreadingTCPServer):
+    """Just enough of an SMTP server to count connections and messages."""
+
+    allow_reuse_address = True
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), SMTPHandler)
+        self.connections = 0
+        self.messages = []
+        self.sockets = []
+
+    def drop_connections(self):
+        for sock in self.sockets:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+        self.sockets = []
+
+
+class SMTPHandler(socketserver.StreamRequestHandler):
+
+    def reply(self, line):
+        self.wfile.write(line.encode() + b'\r\n')
+
+    def handle(self):
+        self.server.connections += 1
+        self.server.sockets.append(self.request)
+        self.reply('220 stand-in ready')
+        try:
+            for raw in self.rfile:
+                command = raw.decode().strip().upper()
+                if command.startswith(('EHLO', 'HELO')):
+                    self.reply('250 stand-in')
+                elif command.startswith(('MAIL', 'RCPT', 'RSET', 'NOOP')):
+                    self.reply('250 OK')
+                elif command == 'DATA':
+                    self.reply('354 End data with <CR><LF>.<CR><LF>')
+                    lines = []
+                    for line in self.rfile:
+                        if line in (b'.\r\n', b'.\n'):
+                            break
+                        lines.append(line)
+                    self.server.messages.append(b''.join(lines))
+                    self.reply('250 Queued')
+                elif command == 'QUIT':
+                    self.reply('221 Bye')
+                    return
+                else:
+                    self.reply('502 Not implemented')
+        except OSError:
+            pass
+
+
+class PooledMailerTestCase(TestCase):
+    """Emails share one SMTP connection that is reopened when it drops."""
+
+    def setUp(self):
+        self.server = SMTPStandIn()
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+        settings_override = override_settings(
+            EMAIL_BACKEND='django.core.mail.backends.smtp.EmailBackend',
+            EMAIL_HOST='127.0.0.1',
+            EMAIL_PORT=self.server.server_address[1],
+            EMAIL_USE_TLS=False,
+            EMAIL_HOST_USER='',
+            EMAIL_HOST_PASSWORD='',
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+    def emails(self, count):
+        return [
+            mail.EmailMessage(f'Subject {n}', 'Body', 'from@example.com', [f'to{n}@example.com'])
+            for n in range(count)
+        ]
+
+    def test_batches_reuse_one_connection(self):
+        mailer = PooledMailer(healthcheck_interval=60)
+        self.assertEqual(mailer.send_batch(self.emails(3)), [None] * 3)
+        self.assertEqual(mailer.send_batch(self.emails(2)), [None] * 2)
+        mailer.close()
+        self.assertEqual(len(self.server.messages), 5)
+        self.assertEqual(self.server.connections, 1)
+
+    def test_health_check_reconnects_after_server_hangs_up(self):
+        mailer = PooledMailer(healthcheck_interval=0)
+        mailer.send_batch(self.emails(1))
+        self.server.drop_connections()
+        self.assertEqual(mailer.send_batch(self.emails(2)), [None] * 2)
+        mailer.close()
+        self.assertEqual(len(self.server.messages), 3)
+        self.assertEqual(mailer.connections_opened, 2)
+
+    def test_dropped_connection_is_reopened_without_health_check(self):
+        mailer = PooledMailer(healthcheck_interval=3600)
+        mailer.send_batch(self.emails(1))
+        self.server.drop_connections()
+        self.assertEqual(mailer.send_batch(self.emails(2)), [None] * 2)
+        mailer.close()
+        self.assertEqual(len(self.server.messages), 3)
+
+    def test_unreachable_server_fails_every_message(self):
+        mailer = PooledMailer(healthcheck_interval=0)
+        self.server.shutdown()
+        self.server.server_close()
+        results = mailer.send_batch(self.emails(2))
+        self.assertEqual(len(results), 2)
+        self.assertTrue(all(isinstance(error, OSError) for error in results))
+
+
+class InquiryArchiveTestCase(TestCase):
+    """Old months of inquiries are exported before their partition is dropped."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='testserver', title='Test')
+        self.inquiry_type = InquiryType.objects.create(domain=self.domain, slug='service', label='Service')
+
+    def test_month_arithmetic(self):
+        month = month_start(datetime(2026, 12, 31, 23, 30, tzinfo=dt_timezone(timedelta(hours=-5))))
+        self.assertEqual(month, datetime(2027, 1, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(add_months(month, -13), datetime(2025, 12, 1, tzinfo=dt_timezone.utc))
+        self.assertEqual(partition_name(month), 'contact_contactinquiry_y2027m01')
+
+    def test_export_writes_compressed_json_lines(self):
+        ContactInquiry.objects.create(
+            domain=self.domain, inquiry_type=self.inquiry_type, name='Jane', email='jane@example.com',
+            message='Hello', status='closed',
+        )
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'contact-inquiries-2026-10.jsonl.gz')
+            self.assertEqual(export_inquiries(ContactInquiry.objects.all(), path), 1)
+            self.assertEqual(os.listdir(directory), ['contact-inquiries-2026-10.jsonl.gz'])
+            with gzip.open(path, 'rt') as archive:
+                rows = [json.loads(line) for line in archive]
+        self.assertEqual(len(rows), 1)
+        self.assertEqual(rows[0]['domain'], 'testserver')
+        self.assertEqual(rows[0]['inquiry_type'], 'Service')
+        self.assertEqual(rows[0]['status'], 'closed')
+
+    @mock.patch('cmsapp.contact.management.commands.archive_inquiries.is_partitioned', return_value=False)
+    def test_command_requires_partitioned_table(self, is_partitioned):
+        with self.assertRaises(CommandError):
+            call_command('archive_inquiries', stdout=StringIO())
+
+    def archive_with(self, output_dir, persistent, *args):
+        """Run the command with one closed month past retention and ``output_dir``."""
+        ContactInquiry.objects.filter(pk=ContactInquiry.objects.create(
+            domain=self.domain, inquiry_type=self.inquiry_type, name='Jane', email='jane@example.com',
+            message='Hello', status='closed',
+        ).pk).update(created_at=datetime(2020, 1, 15, tzinfo=dt_timezone.utc))
+        command = 'cmsapp.contact.management.commands.archive_inquiries'
+        with mock.patch(f'{command}.is_partitioned', return_value=True), \
+                mock.patch(f'{command}.ensure_partitions', return_value=[]), \
+                mock.patch(f'{command}.monthly_partitions', return_value=[datetime(2020, 1, 1, tzinfo=dt_timezone.utc)]), \
+                mock.patch(f'{command}.lock_partition'), \
+                mock.patch(f'{command}.on_persistent_storage', return_value=persistent), \
+                mock.patch(f'{command}.drop_partition') as drop_partition:
+            try:
+                call_command('archive_inquiries', '--output-dir', output_dir, *args, stdout=StringIO())
+            finally:
+                self.dropped = drop_partition.call_count
+
+    def test_command_refuses_unset_or_missing_output_dir(self):
+        for output_dir in ('', '/nonexistent/archive'):
+            with self.assertRaises(CommandError):
+                self.archive_with(output_dir, True)
+            self.assertEqual(self.dropped, 0)
+        self.assertEqual(ContactInquiry.objects.count(), 2)
+
+    def test_command_refuses_root_filesystem(self):
+        with tempfile.TemporaryDirectory() as directory:
+            with self.assertRaisesMessage(CommandError, 'root filesystem'):
+                self.archive_with(directory, False)
+            self.assertEqual(self.dropped, 0)
+            self.assertEqual(os.listdir(directory), [])
+
+            self.archive_with(directory, False, '--allow-root-filesystem')
+            self.assertEqual(self.dropped, 1)
+            self.assertEqual(os.listdir(directory), ['contact-inquiries-2020-01.jsonl.gz'])
+
+
+@skipUnless(connection.vendor == 'postgresql', 'Inquiries are only partitioned on PostgreSQL')
+class InquiryPartitionMigrationTestCase(TransactionTestCase):
+    """0012 partitions the inquiry table and can be reversed without losing rows."""
+
+    def migrate(self, targets):
+        executor = MigrationExecutor(connection)
+        executor.loader.build_graph()
+        executor.migrate(targets or executor.loader.graph.leaf_nodes())
+
+    def test_migrate_backwards_and_forwards(self):
+        domain = Domain.objects.create(name='testserver', title='Test')
+        inquiry_type = InquiryType.objects.create(domain=domain, slug='service', label='Service')
+        old = ContactInquiry.objects.create(domain=domain, inquiry_type=inquiry_type, name='Old', email='old@example.com', message='Hello')
+        ContactInquiry.objects.filter(pk=old.pk).update(created_at=timezone.now() - timedelta(days=800))
+        ContactInquiry.objects.create(domain=domain, inquiry_type=inquiry_type, name='New', email='new@example.com', message='Hello')
+        rows = list(ContactInquiry.objects.order_by('id').values_list('id', 'name', 'created_at'))
+        self.assertTrue(is_partitioned())
+
+        try:
+            self.migrate([('contact', '0011_spam_filtering')])
+            self.assertFalse(is_partitioned())
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT id, name, created_at FROM contact_contactinquiry ORDER BY id')
+                self.assertEqual(cursor.fetchall(), rows)
+                cursor.execute(
+                    "INSERT INTO contact_contactinquiry (name, email, message, status, created_at, updated_at) "
+                    "VALUES ('Between', 'between@example.com', 'Hello', 'new', now(), now()) RETURNING id"
+                )
+                self.assertGreater(cursor.fetchone()[0], rows[-1][0])
+        finally:
+            self.migrate(None)
+
+        self.assertTrue(is_partitioned())
+        self.assertEqual(ContactInquiry.objects.count(), 3)
+        latest = ContactInquiry.objects.create(domain=domain, inquiry_type=inquiry_type, name='Later', email='later@example.com', message='Hello')
+        self.assertEqual(ContactInquiry.objects.order_by('-id').values_list('id', flat=True)[1] + 1, latest.pk)
@@ -6,4 +6,5 @@ app_name = 'contact'
 urlpatterns = [
     path('', views.contact, name='contact'),
     path('thank-you/', views.thank_you, name='thank_you'),
+    path('csrf/', views.csrf_token, name='csrf'),
 ]
@@ -1,21 +1,28 @@
 from django.shortcuts import render, redirect
-from django.views.decorators.http import require_http_methods
+from django.views.decorators.cache import never_cache
+from django.views.decorators.http import require_GET, require_http_methods
 from django.contrib import messages
+from django.db import transaction
+from django.http import JsonResponse
+from django.middleware.csrf import get_token
 from cmsapp.domains.models import DomainSetting
-from .models import ContactInquiry, ContactConfiguration
+from .models import ContactConfiguration
 from .forms import ContactForm
+from .pagecache import cached_page, is_cacheable
+from .spam import Rejection, log_rejection, remember_inquiry, screen_inquiry, screen_request, sign_form_start
 
 
 @require_http_methods(["GET", "POST"])
 def contact(request):
-    """Contact form view with domain-specific templates."""
+    """
+    Contact form view with domain-specific templates.
+
+    The blank form is served from the shared page cache; it carries no CSRF
+    token, which the page fetches from ``csrf_token`` when submitting.
+    """
     config = ContactConfiguration.get_config()
     domain = getattr(request, 'domain', None)
-    domain_settings = None
-    if domain:
-        domain_settings, _ = DomainSetting.objects.get_or_create(domain=domain)
-    print('Configuration:')
-    print(config)
+    domain_settings = DomainSetting.for_domain(domain) if domain else None
     
     # Check if contact form is enabled
     if not config.enable_contact_form:
@@ -24,21 +31,29 @@ def contact(request):
     
     if request.method == 'POST':
         form = ContactForm(request.POST, domain=domain)
+        try:
+            # Abuse checks run before validation touches the database
+            screen_request(request, domain)
+            if form.is_valid():
+                screen_inquiry(domain, form.cleaned_data)
+        except Rejection as rejection:
+            log_rejection(request, domain, rejection)
+            if rejection.silent:
+                return redirect('contact:thank_you')
+            form.add_error(None, rejection.message)
+            response = render_contact(request, form)
+            response.status_code = rejection.status
+            return response
+
         if form.is_valid():
-            # Save the inquiry to database
+            # Save the inquiry and queue its notifications together; the
+            # contact_worker sends them outside the request.
             inquiry = form.save(commit=False)
             inquiry.domain = domain  # Set the domain
-            inquiry.save()
-            
-            # Send confirmation email to inquirer if enabled
-            if config.send_confirmation_email:
-                inquiry.send_confirmation_email()
-            
-            # Send alert email to admin if enabled
-            inquiry.send_alert_email(config, domain, domain_settings)
-            
-            # Send SMS notification if enabled
-            inquiry.send_sms_notification(config, domain, domain_settings)
+            with transaction.atomic():
+                inquiry.save()
+                inquiry.queue_notifications(config, domain_settings)
+                remember_inquiry(domain, form.cleaned_data)
             
             # Show success message
             messages.success(
@@ -47,15 +62,22 @@ def contact(request):
                 f'We will respond to {inquiry.email} as soon as possible.'
             )
             return redirect('contact:thank_you')
+    elif is_cacheable(request):
+        return cached_page(request, 'contact', lambda: render_contact(request, ContactForm(domain=domain)))
     else:
         form = ContactForm(domain=domain)
     
+    return render_contact(request, form)
+
+
+def render_contact(request, form):
     context = {
         'form': form,
         'page_title': 'Contact Us',
     }
     
     # Use domain-specific template
+    domain = getattr(request, 'domain', None)
     if domain and domain.name == 'rvscope.com':
         return render(request, 'rvscope/contact.html', context)
     
@@ -64,6 +86,12 @@ def contact(request):
 
 def thank_you(request):
     """Thank you page after successful contact form submission."""
+    if is_cacheable(request):
+        return cached_page(request, 'thank_you', lambda: render_thank_you(request))
+    return render_thank_you(request)
+
+
+def render_thank_you(request):
     domain = getattr(request, 'domain', None)
     if domain and domain.name == 'rvscope.com':
         return render(request, 'rvscope/thank_you.html', {
@@ -73,3 +101,18 @@ def thank_you(request):
         'page_title': 'Thank You',
     })
 
+
+@never_cache
+@require_GET
+def csrf_token(request):
+    """
+    CSRF token and signed start time for the cached contact form.
+
+    Fetched when a visitor starts on the form; getting the token also sets
+    the CSRF cookie.
+    """
+    return JsonResponse({
+        'token': get_token(request),
+        'started': sign_form_start(getattr(request, 'domain', None)),
+    })
+
@@ -191,11 +191,25 @@ class DomainSettingAdmin(admin.ModelAdmin):
                 'show_pages_link',
             ),
         }),
+        ('Inquiry Alerts', {
+            'fields': (
+                'alert_delivery',
+                'alert_digest_hour',
+                'alert_min_interval',
+            ),
+        }),
         ('Visual Customization', {
             'fields': (
                 'show_background_watermark',
             ),
         }),
+        ('Media', {
+            'fields': (
+                'media_optimize_images',
+                'media_max_image_dimension',
+                'media_keep_original_images',
+            ),
+        }),
         ('Customization', {
             'fields': (
                 'custom_css',
@@ -0,0 +1,70 @@
+"""
+Process-local cache for configuration rows that are read on every request.
+
+Each worker process keeps loaded objects in a dict. A version token stored in
+the shared Django cache is replaced whenever one of the rows is saved or
+deleted; a process that sees a new token drops its copies and reloads from the
+database. A lookup therefore costs one shared-cache read and no SQL, and an
+admin change reaches every worker on its next lookup.
+
+Cached objects are shared between requests and must be treated as read-only.
+"""
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+
+class VersionedCache:
+    """Objects loaded by ``loader(key)``, kept until the shared version changes."""
+
+    def __init__(self, name, loader):
+        self.name = name
+        self.loader = loader
+        self.version = None
+        self.values = {}
+        self.lock = threading.Lock()
+
+    @property
+    def version_key(self):
+        return f"config-version:{self.name}"
+
+    def current_version(self):
+        version = cache.get(self.version_key)
+        if version is None:
+            # First use, or the shared cache was cleared: agree on a fresh token
+            cache.add(self.version_key, uuid.uuid4().hex, None)
+            version = cache.get(self.version_key)
+        return version
+
+    def get(self, key):
+        version = self.current_version()
+        with self.lock:
+            if version != self.version:
+                self.values = {}
+                self.version = version
+            if key in self.values:
+                return self.values[key]
+        value = self.loader(key)
+        with self.lock:
+            if self.version == version:
+                self.values[key] = value
+        return value
+
+    def invalidate(self):
+        """
+        Make every process reload.
+
+        The version is replaced straight away and again once the current
+        transaction commits, so copies loaded while it was still open are
+        dropped as well.
+        """
+        self.bump()
+        transaction.on_commit(self.bump)
+
+    def bump(self):
+        with self.lock:
+            self.values = {}
+            self.version = None
+        cache.set(self.version_key, uuid.uuid4().hex, None)
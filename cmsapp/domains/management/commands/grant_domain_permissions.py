@@ -62,7 +62,7 @@ class Command(BaseCommand):
             # Define models to grant permissions for
             app_models = {
                 'pages': ['page', 'pageblock', 'pageimage'],
-                'media': ['mediafolder', 'mediafile', 'mediagallery'],
+                'media': ['mediafolder', 'mediafile', 'mediagallery', 'mediatag'],
                 'templates': ['pagetemplate', 'stylesheet', 'layoutcomponent'],
                 'contact': ['contactinquiry', 'contactconfiguration'],
             }
@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0004_domainsetting_alert_toggles'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='domainsetting',
+            name='media_keep_original_images',
+            field=models.BooleanField(default=False, help_text='Keep an untouched copy of each optimized image'),
+        ),
+        migrations.AddField(
+            model_name='domainsetting',
+            name='media_max_image_dimension',
+            field=models.PositiveIntegerField(default=2560, help_text='Scale uploaded images down so neither edge exceeds this many pixels (0 = no limit)'),
+        ),
+        migrations.AddField(
+            model_name='domainsetting',
+            name='media_optimize_images',
+            field=models.BooleanField(default=True, help_text='Strip metadata from uploaded JPEG/PNG images and re-encode them smaller'),
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:21
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0005_domainsetting_media_optimization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='domainsetting',
+            name='alert_delivery',
+            field=models.CharField(choices=[('immediate', 'Immediately'), ('hourly', 'Hourly digest'), ('daily', 'Daily digest')], default='immediate', help_text='Alert on every inquiry, or collect inquiries into one hourly or daily digest', max_length=20),
+        ),
+        migrations.AddField(
+            model_name='domainsetting',
+            name='alert_digest_hour',
+            field=models.PositiveSmallIntegerField(default=8, help_text='Hour of the day (server time) the daily digest is sent', validators=[django.core.validators.MaxValueValidator(23)]),
+        ),
+        migrations.AddField(
+            model_name='domainsetting',
+            name='alert_min_interval',
+            field=models.PositiveIntegerField(default=0, help_text='Minimum minutes between alert emails, and between alert SMS; inquiries arriving sooner go out together in the next alert (0 = no limit)'),
+        ),
+    ]
@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def create_missing_settings(apps, schema_editor):
+    Domain = apps.get_model('domains', 'Domain')
+    DomainSetting = apps.get_model('domains', 'DomainSetting')
+    DomainSetting.objects.bulk_create([
+        DomainSetting(domain=domain)
+        for domain in Domain.objects.filter(settings__isnull=True)
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0006_domainsetting_alert_delivery'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_settings, migrations.RunPython.noop),
+    ]
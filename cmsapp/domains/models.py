@@ -1,4 +1,10 @@
+from datetime import timedelta
+
+from django.core.validators import MaxValueValidator
 from django.db import models
+from django.utils import timezone
+
+from .cache import VersionedCache
 from django.contrib.auth.models import User
 
 
@@ -120,6 +126,12 @@ class DomainPermission(models.Model):
 class DomainSetting(models.Model):
     """Store domain-specific settings."""
     
+    ALERT_DELIVERY_CHOICES = [
+        ('immediate', 'Immediately'),
+        ('hourly', 'Hourly digest'),
+        ('daily', 'Daily digest'),
+    ]
+    
     domain = models.OneToOneField(
         Domain,
         on_delete=models.CASCADE,
@@ -150,6 +162,21 @@ class DomainSetting(models.Model):
         default=False,
         help_text="Send SMS alerts to this domain's contact phone"
     )
+    alert_delivery = models.CharField(
+        max_length=20,
+        choices=ALERT_DELIVERY_CHOICES,
+        default='immediate',
+        help_text="Alert on every inquiry, or collect inquiries into one hourly or daily digest"
+    )
+    alert_digest_hour = models.PositiveSmallIntegerField(
+        default=8,
+        validators=[MaxValueValidator(23)],
+        help_text="Hour of the day (server time) the daily digest is sent"
+    )
+    alert_min_interval = models.PositiveIntegerField(
+        default=0,
+        help_text="Minimum minutes between alert emails, and between alert SMS; inquiries arriving sooner go out together in the next alert (0 = no limit)"
+    )
     
     # Customization
     custom_css = models.TextField(
@@ -173,6 +200,20 @@ class DomainSetting(models.Model):
         help_text="Show background watermark image on all pages"
     )
     
+    # Media
+    media_optimize_images = models.BooleanField(
+        default=True,
+        help_text="Strip metadata from uploaded JPEG/PNG images and re-encode them smaller"
+    )
+    media_max_image_dimension = models.PositiveIntegerField(
+        default=2560,
+        help_text="Scale uploaded images down so neither edge exceeds this many pixels (0 = no limit)"
+    )
+    media_keep_original_images = models.BooleanField(
+        default=False,
+        help_text="Keep an untouched copy of each optimized image"
+    )
+    
     google_analytics_id = models.CharField(
         max_length=50,
         blank=True,
@@ -188,3 +229,31 @@ class DomainSetting(models.Model):
     
     def __str__(self):
         return f"Settings for {self.domain.name}"
+    
+    @classmethod
+    def for_domain(cls, domain):
+        """
+        Cached settings for a domain, without a query on a cache hit.
+
+        Domains get their settings row when they are created; if it is
+        missing anyway, an unsaved instance with the defaults is returned.
+        """
+        domain_id = getattr(domain, 'pk', domain)
+        return domain_settings_cache.get(domain_id) or cls(domain_id=domain_id)
+    
+    def next_alert_time(self, now=None):
+        """When an alert for an inquiry submitted at ``now`` should go out."""
+        now = now or timezone.now()
+        local = timezone.localtime(now)
+        if self.alert_delivery == 'hourly':
+            return local.replace(minute=0, second=0, microsecond=0) + timedelta(hours=1)
+        if self.alert_delivery == 'daily':
+            send_at = local.replace(hour=self.alert_digest_hour, minute=0, second=0, microsecond=0)
+            return send_at if send_at > local else send_at + timedelta(days=1)
+        return now
+
+
+domain_settings_cache = VersionedCache(
+    'domain-settings',
+    lambda domain_id: DomainSetting.objects.filter(domain_id=domain_id).first(),
+)
@@ -1,8 +1,21 @@
-from django.db.models.signals import post_save
+from django.db.models.signals import post_delete, post_save
 from django.dispatch import receiver
 from django.contrib.auth.models import Permission
 from django.contrib.contenttypes.models import ContentType
-from .models import DomainPermission
+from .models import Domain, DomainPermission, DomainSetting, domain_settings_cache
+
+
+@receiver(post_save, sender=Domain)
+def provision_domain_settings(sender, instance, created, raw=False, **kwargs):
+    """Give every new domain its settings row, so requests never create one."""
+    if created and not raw:
+        DomainSetting.objects.get_or_create(domain=instance)
+
+
+@receiver(post_save, sender=DomainSetting)
+@receiver(post_delete, sender=DomainSetting)
+def invalidate_domain_settings(sender, **kwargs):
+    domain_settings_cache.invalidate()
 
 
 @receiver(post_save, sender=DomainPermission)
@@ -24,7 +37,7 @@ def grant_django_permissions(sender, instance, created, **kwargs):
     # Define which models this user should have access to based on role
     app_models = {
         'pages': ['page', 'pageblock', 'pageimage'],
-        'media': ['mediafolder', 'mediafile', 'mediagallery'],
+        'media': ['mediafolder', 'mediafile', 'mediagallery', 'mediatag'],
         'templates': ['pagetemplate', 'stylesheet', 'layoutcomponent'],
         'contact': ['contactinquiry', 'contactconfiguration'],
     }
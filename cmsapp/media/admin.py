@@ -1,24 +1,57 @@
 from django.contrib import admin
-from django.utils.html import format_html
+from django.urls import reverse, NoReverseMatch
+from django.utils.html import format_html, format_html_join
 from django.db.models import Count
-from .models import MediaFolder, MediaFile, MediaGallery
+from .archives import folder_entries, gallery_entries, subtree_files, zip_response
+from .documents import document_search_filter
+from .forms import MediaFileAdminForm
+from .jobs import enqueue_processing
+from .models import MediaFolder, MediaFile, MediaGallery, MediaGalleryItem, MediaTag
 from cmsapp.domains.utils import filter_queryset_by_domain, get_user_domains
 
 
+class FolderTreeFilter(admin.SimpleListFilter):
+    """
+    Filter by top-level folder, including everything beneath it.
+
+    Only root folders are offered as choices, and matching uses the
+    materialized ``tree_path`` so a whole subtree is one indexed lookup.
+    """
+    title = 'folder'
+    parameter_name = 'in_folder'
+    path_lookup = 'tree_path__startswith'
+    
+    def lookups(self, request, model_admin):
+        roots = filter_queryset_by_domain(MediaFolder.objects.filter(depth=0), request.user)
+        return [(folder.tree_path.strip('/'), folder.name) for folder in roots.only('name', 'tree_path')]
+    
+    def queryset(self, request, queryset):
+        value = self.value()
+        if value and value.isdigit():
+            return queryset.filter(**{self.path_lookup: f"/{value}/"})
+        return queryset
+
+
+class FileFolderTreeFilter(FolderTreeFilter):
+    path_lookup = 'folder__tree_path__startswith'
+
+
 @admin.register(MediaFolder)
 class MediaFolderAdmin(admin.ModelAdmin):
-    list_display = ('name', 'domain', 'parent', 'file_count', 'created_at')
-    list_filter = ('domain', 'created_at', 'parent')
+    list_display = ('name', 'full_name', 'domain', 'depth', 'file_count', 'created_at')
+    list_filter = ('domain', 'created_at', FolderTreeFilter)
+    ordering = ('domain', 'full_name')
+    actions = ['download_zip']
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
-    readonly_fields = ('created_at', 'updated_at')
+    readonly_fields = ('full_name', 'created_at', 'updated_at')
     
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'domain' and not request.user.is_superuser:
             kwargs["queryset"] = get_user_domains(request.user)
         if db_field.name == 'parent':
             kwargs["queryset"] = filter_queryset_by_domain(
-                db_field.remote_field.model.objects.all(),
+                db_field.remote_field.model.objects.order_by('full_name'),
                 request.user
             )
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
@@ -32,48 +65,100 @@ class MediaFolderAdmin(admin.ModelAdmin):
         return obj.files_count if hasattr(obj, 'files_count') else obj.files.count()
     file_count.short_description = 'Files'
     file_count.admin_order_field = 'files_count'
+    
+    @admin.action(description='Download selected folders (with subfolders) as ZIP')
+    def download_zip(self, request, queryset):
+        folders = list(queryset)
+        files = filter_queryset_by_domain(subtree_files(folders), request.user)
+        filename = f"{folders[0].slug}.zip" if len(folders) == 1 else 'media-folders.zip'
+        return zip_response(folder_entries(folders, files), filename)
 
 
 @admin.register(MediaFile)
 class MediaFileAdmin(admin.ModelAdmin):
+    form = MediaFileAdminForm
     list_display = (
         'thumbnail_preview', 'title', 'domain', 'media_type', 'folder', 
-        'file_size_display', 'usage_count', 'uploaded_at'
+        'file_size_display', 'processing_badge', 'usage_count', 'uploaded_at'
     )
-    list_filter = ('domain', 'media_type', 'folder', 'uploaded_at')
-    search_fields = ('title', 'description', 'tags', 'alt_text')
+    list_filter = ('domain', 'media_type', 'processing_status', 'is_private', FileFolderTreeFilter, 'uploaded_at')
+    list_select_related = ('domain', 'folder')
+    search_fields = ('title', 'description', 'tags__name', 'alt_text')
     prepopulated_fields = {'slug': ('title',)}
+    filter_horizontal = ('tags',)
     readonly_fields = (
         'file_preview', 'uploaded_at', 'updated_at', 'file_size', 
-        'file_extension', 'width', 'height', 'last_used'
+        'file_extension', 'width', 'height', 'duration', 'bitrate', 'codec', 'hit_count', 'last_used', 'checksum', 'thumbnail', 'used_in',
+        'original_file', 'optimized_at', 'optimization_summary',
+        'processing_status', 'processing_error', 'processing_jobs'
     )
+    actions = ['reprocess']
     
     def get_queryset(self, request):
-        qs = super().get_queryset(request)
+        qs = super().get_queryset(request).defer('content_text', 'search_vector')
         return filter_queryset_by_domain(qs, request.user)
     
+    def get_search_results(self, request, queryset, search_term):
+        # Also match inside extracted document text
+        results, may_have_duplicates = super().get_search_results(request, queryset, search_term)
+        if search_term:
+            results |= queryset.filter(document_search_filter(search_term))
+        return results, may_have_duplicates
+    
+    def get_form(self, request, obj=None, **kwargs):
+        form = super().get_form(request, obj, **kwargs)
+        form.current_user = request.user
+        return form
+    
+    def save_model(self, request, obj, form, change):
+        # Files sent through the chunked uploader arrive as a finished
+        # UploadSession rather than as part of this POST.
+        session = form.cleaned_data.get('upload_session')
+        if session:
+            session.attach(obj)
+        super().save_model(request, obj, form, change)
+        if session:
+            session.status = 'attached'
+            session.media_file = obj
+            session.save(update_fields=['status', 'media_file', 'updated_at'])
+    
     def formfield_for_foreignkey(self, db_field, request, **kwargs):
         if db_field.name == 'domain' and not request.user.is_superuser:
             kwargs["queryset"] = get_user_domains(request.user)
         if db_field.name == 'folder':
             kwargs["queryset"] = filter_queryset_by_domain(
-                db_field.remote_field.model.objects.all(),
+                db_field.remote_field.model.objects.order_by('full_name'),
                 request.user
             )
         return super().formfield_for_foreignkey(db_field, request, **kwargs)
     
+    def formfield_for_manytomany(self, db_field, request, **kwargs):
+        if db_field.name == 'tags':
+            kwargs["queryset"] = filter_queryset_by_domain(
+                db_field.remote_field.model.objects.select_related('domain'),
+                request.user
+            )
+        return super().formfield_for_manytomany(db_field, request, **kwargs)
+    
     fieldsets = (
         ('Basic Information', {
-            'fields': ('title', 'slug', 'description', 'file', 'media_type', 'folder')
+            'fields': ('title', 'slug', 'description', 'file', 'upload_session', 'media_type', 'folder')
         }),
         ('File Details', {
-            'fields': ('file_size', 'file_extension', 'mime_type', 'width', 'height')
+            'fields': ('file_size', 'file_extension', 'mime_type', 'width', 'height', 'duration', 'bitrate', 'codec', 'checksum', 'thumbnail')
+        }),
+        ('Processing', {
+            'fields': ('processing_status', 'processing_error', 'processing_jobs'),
+        }),
+        ('Optimization', {
+            'fields': ('optimized_at', 'optimization_summary', 'original_file'),
+            'classes': ('collapse',)
         }),
         ('Media Attributes', {
-            'fields': ('alt_text', 'tags')
+            'fields': ('alt_text', 'tags', 'is_private')
         }),
         ('Metadata', {
-            'fields': ('uploaded_by', 'uploaded_at', 'updated_at', 'usage_count', 'last_used')
+            'fields': ('uploaded_by', 'uploaded_at', 'updated_at', 'usage_count', 'hit_count', 'last_used', 'used_in')
         }),
         ('Preview', {
             'fields': ('file_preview',),
@@ -84,8 +169,8 @@ class MediaFileAdmin(admin.ModelAdmin):
     def thumbnail_preview(self, obj):
         if obj.media_type == 'image' and obj.file:
             return format_html(
-                '<img src="{}" style="max-width: 50px; max-height: 50px; object-fit: cover;" />',
-                obj.file.url
+                '<img src="{}" style="max-width: 50px; max-height: 50px; object-fit: cover;" loading="lazy" />',
+                (obj.thumbnail or obj.file).url
             )
         elif obj.media_type == 'video':
             return format_html('<span style="font-size: 20px;">🎬</span>')
@@ -96,6 +181,54 @@ class MediaFileAdmin(admin.ModelAdmin):
         return format_html('<span style="font-size: 20px;">📁</span>')
     thumbnail_preview.short_description = 'Preview'
     
+    PROCESSING_COLORS = {
+        'pending': '#6c757d',
+        'processing': '#0d6efd',
+        'ready': '#198754',
+        'failed': '#dc3545',
+    }
+    
+    def processing_badge(self, obj):
+        return format_html(
+            '<span style="color: {}; font-weight: bold;">{}</span>',
+            self.PROCESSING_COLORS.get(obj.processing_status, '#6c757d'),
+            obj.get_processing_status_display()
+        )
+    processing_badge.short_description = 'Processing'
+    processing_badge.admin_order_field = 'processing_status'
+    
+    def processing_jobs(self, obj):
+        if not obj.pk:
+            return '-'
+        rows = [
+            (job.get_status_display(), job.attempts, job.run_after, job.last_error or '-')
+            for job in obj.jobs.all()
+        ]
+        if not rows:
+            return 'No queued jobs'
+        return format_html(
+            '<ul>{}</ul>',
+            format_html_join(
+                '', '<li>{} &mdash; attempt {}, next run {}<br/><small>{}</small></li>', rows
+            )
+        )
+    processing_jobs.short_description = 'Jobs'
+    
+    @admin.action(description='Reprocess selected files')
+    def reprocess(self, request, queryset):
+        files = list(queryset.exclude(file=''))
+        for media_file in files:
+            enqueue_processing(media_file)
+        queryset.filter(pk__in=[f.pk for f in files]).update(processing_status='pending', processing_error='')
+        self.message_user(request, f'{len(files)} files queued for processing.')
+    
+    def optimization_summary(self, obj):
+        if not obj.original_size:
+            return '-'
+        percent = obj.bytes_saved * 100 / obj.original_size
+        return f"{obj.bytes_saved:,} bytes saved ({percent:.0f}%) from {obj.original_size:,}"
+    optimization_summary.short_description = 'Bytes saved'
+    
     def file_preview(self, obj):
         if obj.media_type == 'image' and obj.file:
             return format_html(
@@ -106,14 +239,15 @@ class MediaFileAdmin(admin.ModelAdmin):
             )
         elif obj.media_type == 'video' and obj.file:
             return format_html(
-                '<video controls style="max-width: 400px;"><source src="{}"></video><br/><br/>'
+                '<video controls preload="none" style="max-width: 400px; width: 100%; {}"><source src="{}"></video><br/><br/>'
                 '<strong>URL:</strong> <input type="text" value="{}" readonly style="width: 100%;" />',
+                f"aspect-ratio: {obj.width} / {obj.height};" if obj.width and obj.height else '',
                 obj.file.url,
                 obj.file.url
             )
         elif obj.media_type == 'audio' and obj.file:
             return format_html(
-                '<audio controls><source src="{}"></audio><br/><br/>'
+                '<audio controls preload="none"><source src="{}"></audio><br/><br/>'
                 '<strong>URL:</strong> <input type="text" value="{}" readonly style="width: 100%;" />',
                 obj.file.url,
                 obj.file.url
@@ -128,33 +262,101 @@ class MediaFileAdmin(admin.ModelAdmin):
         return 'No file uploaded'
     file_preview.short_description = 'File Preview & URL'
     
+    def used_in(self, obj):
+        if not obj.pk:
+            return '-'
+        rows = []
+        for ref in obj.references.select_related('content_type'):
+            label = f"{ref.content_type.name} #{ref.object_id} ({ref.field})"
+            try:
+                url = reverse(
+                    f'admin:{ref.content_type.app_label}_{ref.content_type.model}_change',
+                    args=[ref.object_id]
+                )
+            except NoReverseMatch:
+                url = ''
+            rows.append((url, label))
+        if not rows:
+            return 'Not referenced by any content'
+        return format_html(
+            '<ul>{}</ul>',
+            format_html_join('', '<li><a href="{}">{}</a></li>', rows)
+        )
+    used_in.short_description = 'Used in'
+    
     def file_size_display(self, obj):
         return obj.get_file_size_display()
     file_size_display.short_description = 'Size'
     file_size_display.admin_order_field = 'file_size'
 
 
+@admin.register(MediaTag)
+class MediaTagAdmin(admin.ModelAdmin):
+    list_display = ('name', 'domain', 'file_count', 'created_at')
+    list_filter = ('domain',)
+    search_fields = ('name', 'slug')
+    prepopulated_fields = {'slug': ('name',)}
+    readonly_fields = ('created_at',)
+    
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        qs = filter_queryset_by_domain(qs, request.user)
+        return qs.annotate(files_count=Count('files'))
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'domain' and not request.user.is_superuser:
+            kwargs["queryset"] = get_user_domains(request.user)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
+    def file_count(self, obj):
+        return obj.files_count
+    file_count.short_description = 'Files'
+    file_count.admin_order_field = 'files_count'
+
+
+class MediaGalleryItemInline(admin.TabularInline):
+    model = MediaGalleryItem
+    fields = ('position', 'media_file')
+    autocomplete_fields = ('media_file',)
+    extra = 1
+
+
 @admin.register(MediaGallery)
 class MediaGalleryAdmin(admin.ModelAdmin):
-    list_display = ('name', 'file_count', 'created_at')
-    list_filter = ('created_at',)
+    list_display = ('name', 'domain', 'slug', 'file_count', 'created_at')
+    list_filter = ('domain', 'created_at')
     search_fields = ('name', 'description')
     prepopulated_fields = {'slug': ('name',)}
-    filter_horizontal = ('files',)
     readonly_fields = ('created_at', 'updated_at')
+    inlines = [MediaGalleryItemInline]
+    actions = ['download_zip']
     
     fieldsets = (
         ('Basic Information', {
-            'fields': ('name', 'slug', 'description')
-        }),
-        ('Media Files', {
-            'fields': ('files',)
+            'fields': ('domain', 'name', 'slug', 'description')
         }),
         ('Metadata', {
             'fields': ('created_at', 'updated_at')
         }),
     )
     
+    def get_queryset(self, request):
+        qs = super().get_queryset(request)
+        qs = filter_queryset_by_domain(qs, request.user)
+        return qs.annotate(files_count=Count('items'))
+    
+    def formfield_for_foreignkey(self, db_field, request, **kwargs):
+        if db_field.name == 'domain' and not request.user.is_superuser:
+            kwargs["queryset"] = get_user_domains(request.user)
+        return super().formfield_for_foreignkey(db_field, request, **kwargs)
+    
     def file_count(self, obj):
-        return obj.files.count()
+        return obj.files_count
     file_count.short_description = 'Files'
+    file_count.admin_order_field = 'files_count'
+    
+    @admin.action(description='Download selected galleries as ZIP')
+    def download_zip(self, request, queryset):
+        galleries = list(queryset)
+        filename = f"{galleries[0].slug}.zip" if len(galleries) == 1 else 'media-galleries.zip'
+        return zip_response(gallery_entries(galleries, request.user), filename)
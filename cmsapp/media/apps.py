@@ -5,3 +5,7 @@ class MediaConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'cmsapp.media'
     verbose_name = 'Media Library'
+    
+    def ready(self):
+        """Import signals when app is ready."""
+        import cmsapp.media.signals
@@ -0,0 +1,159 @@
+"""
+Streaming ZIP archives of media folders and galleries.
+
+The archive is produced by a generator: ``zipfile`` writes into a small
+in-memory buffer that is drained after every chunk, so memory use stays
+constant whatever the archive size and nothing is written to disk. Because
+the output is not seekable, ``zipfile`` emits data descriptors after each
+entry instead of patching local headers.
+"""
+import os
+import posixpath
+import time
+import zipfile
+
+from django.conf import settings
+from django.db.models import Q
+from django.http import StreamingHttpResponse
+from django.utils.text import slugify
+from cmsapp.domains.utils import filter_queryset_by_domain
+
+
+ARCHIVE_CHUNK_SIZE = 256 * 1024
+
+# Formats that are already compressed; deflating them again costs CPU for
+# no gain, so they are stored as-is.
+STORED_EXTENSIONS = {
+    'jpg', 'jpeg', 'png', 'gif', 'webp', 'avif', 'heic',
+    'mp4', 'm4v', 'mov', 'webm', 'mkv', 'avi', 'wmv', 'flv',
+    'mp3', 'm4a', 'aac', 'ogg', 'opus', 'flac',
+    'zip', 'gz', 'bz2', 'xz', '7z', 'rar',
+    'docx', 'xlsx', 'pptx', 'odt', 'ods', 'odp', 'pdf',
+}
+
+
+class _StreamBuffer:
+    """Write-only, non-seekable file object whose contents are taken by the generator."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_zip(entries):
+    """
+    Yield a ZIP archive of ``(arcname, path)`` pairs as byte chunks.
+
+    Files that have disappeared from disk are skipped.
+    """
+    buffer = _StreamBuffer()
+    with zipfile.ZipFile(buffer, mode='w', allowZip64=True) as archive:
+        for arcname, path in entries:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            info = zipfile.ZipInfo(arcname, date_time=time.localtime(max(st.st_mtime, 315619200))[:6])
+            info.external_attr = 0o644 << 16
+            extension = os.path.splitext(arcname)[1].lower().lstrip('.')
+            info.compress_type = zipfile.ZIP_STORED if extension in STORED_EXTENSIONS else zipfile.ZIP_DEFLATED
+            # Tells zipfile up front whether the entry needs ZIP64 headers.
+            info.file_size = st.st_size
+
+            with open(path, 'rb') as src, archive.open(info, mode='w') as dest:
+                for chunk in iter(lambda: src.read(ARCHIVE_CHUNK_SIZE), b''):
+                    dest.write(chunk)
+                    data = buffer.drain()
+                    if data:
+                        yield data
+            data = buffer.drain()
+            if data:
+                yield data
+    yield buffer.drain()
+
+
+def _unique_name(name, used):
+    """Return ``name``, or ``name`` with a counter added if it was already used."""
+    if name not in used:
+        used.add(name)
+        return name
+    stem, ext = posixpath.splitext(name)
+    counter = 2
+    while f"{stem} ({counter}){ext}" in used:
+        counter += 1
+    name = f"{stem} ({counter}){ext}"
+    used.add(name)
+    return name
+
+
+def subtree_files(folders):
+    """Return the files in the given folders and all of their subfolders."""
+    from .models import MediaFile
+
+    query = Q()
+    for folder in folders:
+        query |= Q(folder__tree_path__startswith=folder.tree_path)
+    return MediaFile.objects.filter(query) if query else MediaFile.objects.none()
+
+
+def folder_entries(folders, files):
+    """
+    Yield ``(arcname, path)`` for ``files`` laid out by folder.
+
+    ``folders`` are the selected subtree roots; each file is placed under its
+    folder's path relative to the parent of the root it belongs to.
+    """
+    used = set()
+    # Outermost roots first, so a nested selection keeps its full layout
+    roots = sorted(folders, key=lambda folder: len(folder.tree_path))
+    media_root = str(settings.MEDIA_ROOT)
+    for media_file in files.select_related('folder').order_by('folder__full_name', 'file').iterator(chunk_size=500):
+        folder = media_file.folder
+        root = next((r for r in roots if folder and folder.tree_path.startswith(r.tree_path)), None)
+        if root is None:
+            directory = ''
+        else:
+            prefix = root.full_name[:-len(root.name)]
+            directory = '/'.join(part.replace('/', '-') for part in folder.full_name[len(prefix):].split(' / '))
+        arcname = posixpath.join(directory, posixpath.basename(media_file.file.name))
+        yield _unique_name(arcname, used), os.path.join(media_root, media_file.file.name)
+
+
+def gallery_entries(galleries, user):
+    """Yield ``(arcname, path)`` for galleries, one directory per gallery."""
+    from .models import MediaFile
+
+    used = set()
+    media_root = str(settings.MEDIA_ROOT)
+    for gallery in galleries:
+        directory = gallery.slug or slugify(gallery.name) or str(gallery.pk)
+        files = filter_queryset_by_domain(MediaFile.objects.all(), user).filter(gallery_items__gallery=gallery)
+        for media_file in files.order_by('gallery_items__position').iterator(chunk_size=500):
+            arcname = posixpath.join(directory, posixpath.basename(media_file.file.name))
+            yield _unique_name(arcname, used), os.path.join(media_root, media_file.file.name)
+
+
+def zip_response(entries, filename):
+    """Wrap archive entries in a streaming attachment response."""
+    response = StreamingHttpResponse(stream_zip(entries), content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    response['Cache-Control'] = 'no-store'
+    # Stop nginx buffering the archive to a temp file before sending it on.
+    response['X-Accel-Buffering'] = 'no'
+    return response
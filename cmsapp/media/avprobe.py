@@ -0,0 +1,426 @@
+"""
+Pure-Python metadata probe for audio and video files.
+
+Reads just enough of a file to learn its duration, dimensions, codec and
+bitrate, without ffprobe or decoding any media:
+
+- MP4/MOV/M4A: the ``moov`` box (found by skipping over box headers, so a
+  ``moov`` at the end of the file costs a few seeks);
+- WebM/Matroska: the EBML ``Info`` and ``Tracks`` elements of the segment;
+- MP3: the first frame header and its Xing/Info or VBRI header, falling
+  back to a constant-bitrate estimate;
+- WAV: the ``fmt `` and ``data`` chunk headers;
+- FLAC: the ``STREAMINFO`` metadata block.
+
+``probe_av(path)`` returns a dict with ``duration`` (seconds), ``width``,
+``height``, ``bitrate`` (bits per second) and ``codec``; values that could
+not be found are None (or '' for the codec). It returns None for formats it
+does not recognise or cannot parse.
+"""
+import os
+import struct
+
+
+# Largest moov box read into memory; anything bigger is not worth probing.
+MAX_MOOV_SIZE = 64 * 1024 * 1024
+
+
+def probe_av(path):
+    try:
+        with open(path, 'rb') as fh:
+            file_size = os.fstat(fh.fileno()).st_size
+            head = fh.read(12)
+            fh.seek(0)
+            if head[4:8] == b'ftyp' or head[4:8] in (b'moov', b'mdat', b'wide', b'free'):
+                info = _probe_mp4(fh, file_size)
+            elif head[:4] == b'\x1a\x45\xdf\xa3':
+                info = _probe_matroska(fh, file_size)
+            elif head[:4] == b'RIFF' and head[8:12] == b'WAVE':
+                info = _probe_wav(fh, file_size)
+            elif head[:4] == b'fLaC':
+                info = _probe_flac(fh, file_size)
+            elif head[:3] == b'ID3' or (len(head) > 1 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0):
+                info = _probe_mp3(fh, file_size)
+            else:
+                return None
+    except (OSError, struct.error, ValueError, IndexError):
+        return None
+    if info is None:
+        return None
+
+    result = {'duration': None, 'width': None, 'height': None, 'bitrate': None, 'codec': ''}
+    result.update({key: value for key, value in info.items() if value})
+    if result['duration'] and not result['bitrate']:
+        result['bitrate'] = int(file_size * 8 / result['duration'])
+    return result
+
+
+# MP4 / QuickTime
+
+def _iter_boxes(data, start=0, end=None):
+    """Yield (type, body_start, body_end) for the boxes in ``data[start:end]``."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset + 8 <= end:
+        size, box_type = struct.unpack('>I4s', data[offset:offset + 8])
+        header = 8
+        if size == 1:
+            size = struct.unpack('>Q', data[offset + 8:offset + 16])[0]
+            header = 16
+        elif size == 0:
+            size = end - offset
+        if size < header:
+            return
+        yield box_type, offset + header, min(offset + size, end)
+        offset += size
+
+
+def _child(data, start, end, box_type):
+    for child_type, body_start, body_end in _iter_boxes(data, start, end):
+        if child_type == box_type:
+            return body_start, body_end
+    return None
+
+
+def _read_moov(fh, file_size):
+    """Skip top-level boxes until ``moov`` and return its body."""
+    offset = 0
+    while offset + 8 <= file_size:
+        fh.seek(offset)
+        header = fh.read(16)
+        size, box_type = struct.unpack('>I4s', header[:8])
+        header_size = 8
+        if size == 1:
+            size = struct.unpack('>Q', header[8:16])[0]
+            header_size = 16
+        elif size == 0:
+            size = file_size - offset
+        if size < header_size:
+            return None
+        if box_type == b'moov':
+            if size > MAX_MOOV_SIZE:
+                return None
+            fh.seek(offset + header_size)
+            return fh.read(size - header_size)
+        offset += size
+    return None
+
+
+def _probe_mp4(fh, file_size):
+    moov = _read_moov(fh, file_size)
+    if moov is None:
+        return None
+    info = {}
+
+    mvhd = _child(moov, 0, len(moov), b'mvhd')
+    if mvhd:
+        body = moov[mvhd[0]:mvhd[1]]
+        if body[0] == 1:
+            timescale, duration = struct.unpack('>IQ', body[20:32])
+        else:
+            timescale, duration = struct.unpack('>II', body[12:20])
+        if timescale:
+            info['duration'] = duration / timescale
+
+    for box_type, start, end in _iter_boxes(moov):
+        if box_type != b'trak':
+            continue
+        mdia = _child(moov, start, end, b'mdia')
+        if not mdia:
+            continue
+        hdlr = _child(moov, mdia[0], mdia[1], b'hdlr')
+        handler = moov[hdlr[0] + 8:hdlr[0] + 12] if hdlr else b''
+        codec = _mp4_codec(moov, mdia)
+
+        if handler == b'vide' and 'width' not in info:
+            tkhd = _child(moov, start, end, b'tkhd')
+            if tkhd:
+                body = moov[tkhd[0]:tkhd[1]]
+                # The matrix and 16.16 fixed-point size end the box
+                matrix_a, matrix_b = struct.unpack('>ii', body[-44:-36])
+                width, height = struct.unpack('>II', body[-8:])
+                width, height = width >> 16, height >> 16
+                if matrix_a == 0 and matrix_b != 0:
+                    # Rotated 90 or 270 degrees for display
+                    width, height = height, width
+                if width and height:
+                    info['width'], info['height'] = width, height
+            info['codec'] = codec
+        elif handler == b'soun' and not info.get('codec'):
+            info['audio_codec'] = codec
+
+    if not info.get('codec'):
+        info['codec'] = info.pop('audio_codec', '')
+    info.pop('audio_codec', None)
+    return info
+
+
+def _mp4_codec(moov, mdia):
+    """The sample entry format of a track, e.g. avc1, hvc1 or mp4a."""
+    path = mdia
+    for box_type in (b'minf', b'stbl', b'stsd'):
+        path = _child(moov, path[0], path[1], box_type)
+        if not path:
+            return ''
+    # stsd: version/flags (4), entry count (4), then size (4) + format (4)
+    fourcc = moov[path[0] + 12:path[0] + 16]
+    return fourcc.decode('latin-1').strip()
+
+
+# Matroska / WebM
+
+EBML_SEGMENT = 0x18538067
+EBML_INFO = 0x1549A966
+EBML_TRACKS = 0x1654AE6B
+EBML_TRACK_ENTRY = 0xAE
+EBML_TIMECODE_SCALE = 0x2AD7B1
+EBML_DURATION = 0x4489
+EBML_TRACK_TYPE = 0x83
+EBML_CODEC_ID = 0x86
+EBML_VIDEO = 0xE0
+EBML_PIXEL_WIDTH = 0xB0
+EBML_PIXEL_HEIGHT = 0xBA
+EBML_DISPLAY_WIDTH = 0x54B0
+EBML_DISPLAY_HEIGHT = 0x54BA
+
+# Largest Info or Tracks element read into memory
+MAX_EBML_ELEMENT = 1024 * 1024
+
+
+def _read_vint(data, offset, keep_marker):
+    """Decode an EBML variable-length integer; returns (value, length, all_ones)."""
+    first = data[offset]
+    length = 1
+    mask = 0x80
+    while length <= 8 and not first & mask:
+        mask >>= 1
+        length += 1
+    if length > 8:
+        raise ValueError('Invalid EBML variable-length integer')
+    value = first if keep_marker else first & (mask - 1)
+    for byte in data[offset + 1:offset + length]:
+        value = (value << 8) | byte
+    all_ones = value == (1 << (7 * length)) - 1
+    return value, length, all_ones
+
+
+def _iter_elements(data, start=0, end=None):
+    """Yield (id, body_start, body_end) for EBML elements held in memory."""
+    end = len(data) if end is None else end
+    offset = start
+    while offset < end:
+        element_id, id_length, _ = _read_vint(data, offset, keep_marker=True)
+        size, size_length, unknown = _read_vint(data, offset + id_length, keep_marker=False)
+        body_start = offset + id_length + size_length
+        body_end = end if unknown else min(body_start + size, end)
+        yield element_id, body_start, body_end
+        offset = body_end
+
+
+def _uint(data):
+    return int.from_bytes(data, 'big')
+
+
+def _probe_matroska(fh, file_size):
+    # The EBML header is small; skip it and find the Segment
+    head = fh.read(12)
+    _, id_length, _ = _read_vint(head, 0, keep_marker=True)
+    size, size_length, _ = _read_vint(head, id_length, keep_marker=False)
+    header_end = id_length + size_length + size
+    fh.seek(header_end)
+    head = fh.read(12)
+    segment_id, id_length, _ = _read_vint(head, 0, keep_marker=True)
+    if segment_id != EBML_SEGMENT:
+        return None
+    size, size_length, unknown = _read_vint(head, id_length, keep_marker=False)
+    offset = header_end + id_length + size_length
+    segment_end = file_size if unknown else min(offset + size, file_size)
+
+    # Walk the Segment's children by their headers, reading only Info and Tracks
+    elements = {}
+    while offset < segment_end and len(elements) < 2:
+        fh.seek(offset)
+        head = fh.read(12)
+        if len(head) < 2:
+            break
+        element_id, id_length, _ = _read_vint(head, 0, keep_marker=True)
+        size, size_length, unknown = _read_vint(head, id_length, keep_marker=False)
+        body_start = offset + id_length + size_length
+        if element_id in (EBML_INFO, EBML_TRACKS) and not unknown and size <= MAX_EBML_ELEMENT:
+            fh.seek(body_start)
+            elements[element_id] = fh.read(size)
+        elif unknown:
+            # A live-streamed cluster of unknown length: nothing more to find
+            break
+        offset = body_start + size
+
+    info = {}
+    data = elements.get(EBML_INFO)
+    if data:
+        scale = 1000000
+        duration = None
+        for element_id, start, end in _iter_elements(data):
+            if element_id == EBML_TIMECODE_SCALE:
+                scale = _uint(data[start:end])
+            elif element_id == EBML_DURATION:
+                duration = struct.unpack('>f' if end - start == 4 else '>d', data[start:end])[0]
+        if duration:
+            info['duration'] = duration * scale / 1e9
+
+    data = elements.get(EBML_TRACKS)
+    if data:
+        for element_id, start, end in _iter_elements(data):
+            if element_id != EBML_TRACK_ENTRY:
+                continue
+            track = {}
+            for child_id, child_start, child_end in _iter_elements(data, start, end):
+                if child_id == EBML_TRACK_TYPE:
+                    track['type'] = _uint(data[child_start:child_end])
+                elif child_id == EBML_CODEC_ID:
+                    track['codec'] = data[child_start:child_end].decode('ascii', 'replace').strip('\x00')
+                elif child_id == EBML_VIDEO:
+                    for video_id, video_start, video_end in _iter_elements(data, child_start, child_end):
+                        value = _uint(data[video_start:video_end])
+                        if video_id == EBML_PIXEL_WIDTH:
+                            track.setdefault('width', value)
+                        elif video_id == EBML_PIXEL_HEIGHT:
+                            track.setdefault('height', value)
+                        elif video_id == EBML_DISPLAY_WIDTH:
+                            track['display_width'] = value
+                        elif video_id == EBML_DISPLAY_HEIGHT:
+                            track['display_height'] = value
+            if track.get('type') == 1 and 'width' not in info:
+                info['width'] = track.get('display_width') or track.get('width')
+                info['height'] = track.get('display_height') or track.get('height')
+                info['codec'] = track.get('codec', '')
+            elif track.get('type') == 2 and not info.get('codec'):
+                info['codec'] = track.get('codec', '')
+    return info
+
+
+# MP3
+
+MP3_BITRATES = {
+    1: [0, 32, 40, 48, 56, 64, 80, 96, 112, 128, 160, 192, 224, 256, 320],
+    2: [0, 8, 16, 24, 32, 40, 48, 56, 64, 80, 96, 112, 128, 144, 160],
+}
+MP3_SAMPLE_RATES = {
+    1: [44100, 48000, 32000],
+    2: [22050, 24000, 16000],
+    2.5: [11025, 12000, 8000],
+}
+
+# How far past the ID3 tag to look for the first frame
+MP3_SYNC_WINDOW = 64 * 1024
+
+
+def _probe_mp3(fh, file_size):
+    head = fh.read(10)
+    audio_start = 0
+    if head[:3] == b'ID3':
+        # Syncsafe size, plus a 10-byte footer if flagged
+        size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        audio_start = 10 + size + (10 if head[5] & 0x10 else 0)
+    fh.seek(audio_start)
+    data = fh.read(MP3_SYNC_WINDOW)
+
+    for offset in range(len(data) - 4):
+        if data[offset] != 0xFF or data[offset + 1] & 0xE0 != 0xE0:
+            continue
+        header = _parse_mp3_header(data[offset:offset + 4])
+        if header:
+            break
+    else:
+        return None
+    version, bitrate, sample_rate, mono = header
+    frame = data[offset:]
+    samples_per_frame = 1152 if version == 1 else 576
+
+    # A Xing/Info header (LAME, most VBR files) or VBRI header (Fraunhofer)
+    # in the first frame records the total frame count.
+    side_info = (17 if mono else 32) if version == 1 else (9 if mono else 17)
+    frames = None
+    xing = 4 + side_info
+    if frame[xing:xing + 4] in (b'Xing', b'Info'):
+        flags = struct.unpack('>I', frame[xing + 4:xing + 8])[0]
+        if flags & 0x1:
+            frames = struct.unpack('>I', frame[xing + 8:xing + 12])[0]
+    elif frame[36:40] == b'VBRI':
+        frames = struct.unpack('>I', frame[50:54])[0]
+
+    audio_size = file_size - audio_start - offset
+    fh.seek(max(file_size - 128, 0))
+    if fh.read(3) == b'TAG':
+        audio_size -= 128
+
+    info = {'codec': 'mp3'}
+    if frames:
+        info['duration'] = frames * samples_per_frame / sample_rate
+        info['bitrate'] = int(audio_size * 8 / info['duration']) if info['duration'] else None
+    elif bitrate:
+        info['bitrate'] = bitrate
+        info['duration'] = audio_size * 8 / bitrate
+    return info
+
+
+def _parse_mp3_header(header):
+    """Return (version, bitrate, sample_rate, mono) for a Layer III frame header, or None."""
+    version_bits = (header[1] >> 3) & 0x3
+    layer_bits = (header[1] >> 1) & 0x3
+    bitrate_index = header[2] >> 4
+    rate_index = (header[2] >> 2) & 0x3
+    if version_bits == 1 or layer_bits != 1 or bitrate_index in (0, 15) or rate_index == 3:
+        return None
+    version = {3: 1, 2: 2, 0: 2.5}[version_bits]
+    bitrate = MP3_BITRATES[1 if version == 1 else 2][bitrate_index] * 1000
+    sample_rate = MP3_SAMPLE_RATES[version][rate_index]
+    mono = (header[3] >> 6) == 3
+    return version, bitrate, sample_rate, mono
+
+
+# WAV
+
+def _probe_wav(fh, file_size):
+    offset = 12
+    byte_rate = None
+    codec = ''
+    while offset + 8 <= file_size:
+        fh.seek(offset)
+        chunk_id, size = struct.unpack('<4sI', fh.read(8))
+        if chunk_id == b'fmt ':
+            audio_format, channels, sample_rate, byte_rate = struct.unpack('<HHII', fh.read(12))
+            codec = 'pcm' if audio_format in (1, 0xFFFE) else f"wav-{audio_format:#06x}"
+        elif chunk_id == b'data':
+            if not byte_rate:
+                return None
+            # Streaming writers leave the size as 0 or 0xFFFFFFFF
+            if size in (0, 0xFFFFFFFF):
+                size = file_size - offset - 8
+            return {'duration': size / byte_rate, 'bitrate': byte_rate * 8, 'codec': codec}
+        # Chunks are padded to an even length
+        offset += 8 + size + (size & 1)
+    return None
+
+
+# FLAC
+
+def _probe_flac(fh, file_size):
+    fh.seek(4)
+    while True:
+        header = fh.read(4)
+        if len(header) < 4:
+            return None
+        block_type = header[0] & 0x7F
+        length = int.from_bytes(header[1:4], 'big')
+        if block_type == 0:
+            streaminfo = fh.read(length)
+            packed = int.from_bytes(streaminfo[10:18], 'big')
+            sample_rate = packed >> 44
+            total_samples = packed & 0xFFFFFFFFF
+            info = {'codec': 'flac'}
+            if sample_rate and total_samples:
+                info['duration'] = total_samples / sample_rate
+            return info
+        if header[0] & 0x80:
+            return None
+        fh.seek(length, os.SEEK_CUR)
@@ -0,0 +1,119 @@
+"""
+Buffered usage counters for media files.
+
+Incrementing ``MediaFile.hit_count`` with a read-modify-write ``save()``
+races under concurrency and costs a write transaction per hit. Instead,
+increments are accumulated in process memory and applied periodically with
+one ``UPDATE ... SET hit_count = hit_count + delta`` per file.
+"""
+import atexit
+import logging
+import threading
+
+from django.conf import settings
+from django.db import close_old_connections, connection, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Coalesce, Greatest
+from django.utils import timezone
+
+
+logger = logging.getLogger(__name__)
+
+
+class UsageBuffer:
+    """Thread-safe accumulator of per-file usage deltas."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._pending_total = 0
+        self._flusher = None
+        # Set once MEDIA_USAGE_FLUSH_THRESHOLD increments are pending; wakes
+        # the flusher thread early so the request itself never writes.
+        self.flush_requested = threading.Event()
+
+    def add(self, media_file_id, count=1, when=None):
+        """Record ``count`` uses of a file without touching the database."""
+        when = when or timezone.now()
+        with self._lock:
+            delta, last_used = self._pending.get(media_file_id, (0, when))
+            self._pending[media_file_id] = (delta + count, max(last_used, when))
+            self._pending_total += count
+            if self._pending_total >= settings.MEDIA_USAGE_FLUSH_THRESHOLD:
+                self.flush_requested.set()
+        self._ensure_flusher()
+
+    def pending(self):
+        """Return a copy of the unflushed deltas, keyed by file id."""
+        with self._lock:
+            return dict(self._pending)
+
+    def flush(self):
+        """
+        Apply all pending deltas. Returns the number of files updated.
+
+        A database error is logged and the deltas are kept for the next
+        flush, so a transient failure loses nothing.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+            self._pending_total = 0
+            self.flush_requested.clear()
+        if not pending:
+            return 0
+        try:
+            apply_usage(pending)
+        except Exception:
+            logger.exception('Failed to flush media usage counters')
+            with self._lock:
+                for media_file_id, (delta, last_used) in pending.items():
+                    current, current_last = self._pending.get(media_file_id, (0, last_used))
+                    self._pending[media_file_id] = (current + delta, max(current_last, last_used))
+                    self._pending_total += delta
+            return 0
+        return len(pending)
+
+    def _ensure_flusher(self):
+        interval = settings.MEDIA_USAGE_FLUSH_INTERVAL
+        if self._flusher is not None or interval <= 0:
+            return
+        with self._lock:
+            if self._flusher is not None:
+                return
+            self._flusher = threading.Thread(
+                target=self._run_flusher,
+                args=(interval,),
+                name='media-usage-flusher',
+                daemon=True,
+            )
+            self._flusher.start()
+        atexit.register(self.flush)
+
+    def _run_flusher(self, interval):
+        while True:
+            self.flush_requested.wait(interval)
+            close_old_connections()
+            try:
+                self.flush()
+            finally:
+                connection.close()
+
+
+def apply_usage(pending):
+    """
+    Write a batch of ``{media_file_id: (delta, last_used)}`` to the database.
+
+    Rows are updated in id order so concurrent flushers from other workers
+    always take row locks in the same order.
+    """
+    from .models import MediaFile
+
+    with transaction.atomic():
+        for media_file_id, (delta, last_used) in sorted(pending.items()):
+            MediaFile.objects.filter(pk=media_file_id).update(
+                hit_count=F('hit_count') + delta,
+                last_used=Greatest(Coalesce('last_used', Value(last_used)), Value(last_used)),
+            )
+
+
+usage_buffer = UsageBuffer()
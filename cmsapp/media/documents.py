@@ -0,0 +1,344 @@
+"""
+Full-text indexing of document files.
+
+``extract_text`` pulls plain text out of OOXML files (docx, xlsx, pptx),
+CSV/TXT and simple PDFs using only the standard library. Every reader
+streams its input and stops once ``MEDIA_TEXT_MAX_CHARS`` characters have
+been collected or ``MEDIA_TEXT_MAX_BYTES`` have been read, so a huge or
+malicious file cannot exhaust the worker.
+
+``index_document`` stores the text on the MediaFile and refreshes its
+``search_vector``, which a GIN index makes searchable per domain without
+touching the files at query time.
+"""
+import csv
+import io
+import re
+import zipfile
+import zlib
+from xml.etree.ElementTree import iterparse
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.utils import timezone
+
+
+TEXT_EXTENSIONS = {'txt', 'csv'}
+OOXML_EXTENSIONS = {'docx', 'xlsx', 'pptx'}
+EXTRACTABLE_EXTENSIONS = TEXT_EXTENSIONS | OOXML_EXTENSIONS | {'pdf'}
+
+READ_CHUNK_SIZE = 64 * 1024
+
+
+class _Full(Exception):
+    """Raised once enough text has been collected."""
+
+
+class _TextSink:
+    """Collects text fragments up to a character limit."""
+
+    def __init__(self, max_chars):
+        self.max_chars = max_chars
+        self.parts = []
+        self.size = 0
+
+    def add(self, text):
+        if not text:
+            return
+        remaining = self.max_chars - self.size
+        if len(text) >= remaining:
+            self.parts.append(text[:remaining])
+            self.size = self.max_chars
+            raise _Full()
+        self.parts.append(text)
+        self.size += len(text)
+
+    def text(self):
+        return re.sub(r'[ \t\r\f\v]+', ' ', re.sub(r'\s*\n\s*', '\n', ''.join(self.parts))).strip()
+
+
+class _CappedReader(io.RawIOBase):
+    """File wrapper that reports end of file after ``max_bytes``; guards against zip bombs."""
+
+    def __init__(self, fileobj, max_bytes):
+        self.fileobj = fileobj
+        self.remaining = max_bytes
+
+    def readable(self):
+        return True
+
+    def close(self):
+        self.fileobj.close()
+        super().close()
+
+    def readinto(self, buffer):
+        if self.remaining <= 0:
+            return 0
+        data = self.fileobj.read(min(len(buffer), self.remaining))
+        self.remaining -= len(data)
+        buffer[:len(data)] = data
+        return len(data)
+
+
+def extract_text(path, extension, max_chars=None, max_bytes=None):
+    """
+    Return the text content of a document, or '' if it has none we can read.
+
+    ``extension`` selects the reader; unsupported types return ''.
+    """
+    max_chars = max_chars or settings.MEDIA_TEXT_MAX_CHARS
+    max_bytes = max_bytes or settings.MEDIA_TEXT_MAX_BYTES
+    sink = _TextSink(max_chars)
+    readers = {
+        'txt': _read_txt,
+        'csv': _read_csv,
+        'docx': _read_docx,
+        'xlsx': _read_xlsx,
+        'pptx': _read_pptx,
+        'pdf': _read_pdf,
+    }
+    reader = readers.get(extension)
+    if reader is None:
+        return ''
+    try:
+        reader(path, sink, max_bytes)
+    except _Full:
+        pass
+    except (OSError, ValueError, zipfile.BadZipFile, zlib.error, SyntaxError):
+        # SyntaxError covers xml.etree.ElementTree.ParseError. Whatever was
+        # read before the damage is still worth indexing.
+        pass
+    return sink.text()
+
+
+def _open_text(path, max_bytes):
+    raw = io.BufferedReader(_CappedReader(open(path, 'rb'), max_bytes), READ_CHUNK_SIZE)
+    return io.TextIOWrapper(raw, encoding='utf-8', errors='replace', newline='')
+
+
+def _read_txt(path, sink, max_bytes):
+    with _open_text(path, max_bytes) as fh:
+        for chunk in iter(lambda: fh.read(READ_CHUNK_SIZE), ''):
+            sink.add(chunk)
+
+
+def _read_csv(path, sink, max_bytes):
+    with _open_text(path, max_bytes) as fh:
+        for row in csv.reader(fh):
+            sink.add(' '.join(cell for cell in row if cell) + '\n')
+
+
+# OOXML
+
+def _read_xml_text(archive, member, sink, max_bytes, text_tag='}t', break_tags=('}p',)):
+    """Stream ``<t>`` text out of one archive member, breaking lines at paragraphs."""
+    with archive.open(member) as raw:
+        reader = io.BufferedReader(_CappedReader(raw, max_bytes), READ_CHUNK_SIZE)
+        for event, element in iterparse(reader, events=('end',)):
+            tag = element.tag
+            if tag.endswith(text_tag):
+                sink.add(element.text)
+            elif tag.endswith('}tab'):
+                sink.add('\t')
+            elif tag.endswith(break_tags):
+                sink.add('\n')
+                element.clear()
+
+
+def _read_docx(path, sink, max_bytes):
+    with zipfile.ZipFile(path) as archive:
+        _read_xml_text(archive, 'word/document.xml', sink, max_bytes)
+
+
+def _read_xlsx(path, sink, max_bytes):
+    # Cell text lives in the shared string table; numbers are not indexed.
+    with zipfile.ZipFile(path) as archive:
+        if 'xl/sharedStrings.xml' in archive.namelist():
+            _read_xml_text(archive, 'xl/sharedStrings.xml', sink, max_bytes, break_tags=('}si',))
+
+
+def _read_pptx(path, sink, max_bytes):
+    with zipfile.ZipFile(path) as archive:
+        slides = [
+            name for name in archive.namelist()
+            if re.fullmatch(r'ppt/slides/slide\d+\.xml', name)
+        ]
+        slides.sort(key=lambda name: int(re.search(r'(\d+)\.xml$', name).group(1)))
+        for name in slides:
+            _read_xml_text(archive, name, sink, max_bytes)
+            sink.add('\n')
+
+
+# PDF
+
+PDF_STREAM = re.compile(rb'<<(.*?)>>\s*stream\r?\n', re.S)
+PDF_TEXT_BREAKS = {b'ET', b'Td', b'TD', b'T*', b'Tm', b"'", b'"'}
+PDF_ESCAPES = {
+    ord('n'): b'\n', ord('r'): b'\r', ord('t'): b'\t', ord('b'): b'\b', ord('f'): b'\f',
+    ord('('): b'(', ord(')'): b')', ord('\\'): b'\\',
+}
+
+
+def _read_pdf(path, sink, max_bytes):
+    """
+    Text from the content streams of an uncompressed or Flate-compressed PDF.
+
+    Only literal and single-byte hex strings shown with Tj, TJ, ' and " are
+    read, which covers PDFs exported by office software with standard
+    fonts. Scanned pages, encrypted files and CID-keyed fonts yield nothing.
+    """
+    with open(path, 'rb') as fh:
+        data = fh.read(max_bytes)
+    for match in PDF_STREAM.finditer(data):
+        dictionary = match.group(1)
+        start = match.end()
+        end = data.find(b'endstream', start)
+        if end == -1:
+            break
+        if b'/Subtype' in dictionary and b'/Image' in dictionary:
+            continue
+        stream = data[start:end]
+        if b'/FlateDecode' in dictionary:
+            decompressor = zlib.decompressobj()
+            stream = decompressor.decompress(stream, max_bytes)
+        elif b'/Filter' in dictionary:
+            continue
+        if b'BT' in stream:
+            _read_pdf_content(stream, sink)
+
+
+def _read_pdf_content(content, sink):
+    """Scan a content stream for text-showing operators."""
+    position = 0
+    length = len(content)
+    pending = []
+    while position < length:
+        char = content[position]
+        if char == 0x28:  # (
+            text, position = _pdf_literal(content, position + 1)
+            pending.append(text)
+        elif char == 0x3C:  # <hex> or << dictionary
+            if content[position + 1:position + 2] == b'<':
+                position += 2
+                continue
+            end = content.find(b'>', position)
+            if end == -1:
+                return
+            pending.append(_pdf_hex(content[position + 1:end]))
+            position = end + 1
+        elif char == 0x2F:  # /Name operand
+            match = re.match(rb'/[^\s/<>\[\]()%{}]*', content[position:position + 128])
+            position += len(match.group())
+        elif char == 0x25:  # % comment
+            end = content.find(b'\n', position)
+            position = length if end == -1 else end + 1
+        elif chr(char).isalpha() or char in (0x27, 0x22, 0x2A):  # operator
+            end = position + 1
+            while end < length and (chr(content[end]).isalpha() or content[end] == 0x2A):
+                end += 1
+            operator = content[position:end]
+            if operator in (b'Tj', b'TJ', b"'", b'"'):
+                if operator in (b"'", b'"'):
+                    sink.add('\n')
+                sink.add(''.join(pending))
+            if operator in PDF_TEXT_BREAKS:
+                sink.add('\n' if operator in (b'ET', b'T*', b"'", b'"') else ' ')
+            pending = []
+            position = end
+        elif char == 0x2D and pending:  # -kerning inside a TJ array
+            match = re.match(rb'-\d+(\.\d+)?', content[position:position + 16])
+            if match and float(match.group()) < -200:
+                pending.append(' ')
+            position += len(match.group()) if match else 1
+        else:
+            position += 1
+
+
+def _pdf_literal(content, position):
+    """Decode a (literal) string starting after its opening parenthesis."""
+    out = bytearray()
+    depth = 1
+    length = len(content)
+    while position < length:
+        char = content[position]
+        if char == 0x5C:  # backslash
+            position += 1
+            if position >= length:
+                break
+            escaped = content[position]
+            if escaped in PDF_ESCAPES:
+                out += PDF_ESCAPES[escaped]
+                position += 1
+            elif 0x30 <= escaped <= 0x37:
+                digits = re.match(rb'[0-7]{1,3}', content[position:position + 3]).group()
+                out.append(int(digits, 8) & 0xFF)
+                position += len(digits)
+            else:
+                # Line continuation or an unknown escape
+                position += 1
+            continue
+        if char == 0x28:
+            depth += 1
+        elif char == 0x29:
+            depth -= 1
+            if depth == 0:
+                return _pdf_decode(bytes(out)), position + 1
+        out.append(char)
+        position += 1
+    return _pdf_decode(bytes(out)), position
+
+
+def _pdf_hex(digits):
+    digits = re.sub(rb'\s', b'', digits)
+    if len(digits) % 2:
+        digits += b'0'
+    try:
+        return _pdf_decode(bytes.fromhex(digits.decode('ascii')))
+    except ValueError:
+        return ''
+
+
+def _pdf_decode(raw):
+    if raw.startswith(b'\xfe\xff'):
+        return raw[2:].decode('utf-16-be', 'replace')
+    if b'\x00' in raw:
+        # Two-byte glyph ids; without the font's CMap they are not text
+        return ''
+    return raw.decode('latin-1')
+
+
+def index_document(media_file, path):
+    """Extract a document's text and store it with its search vector."""
+    from .models import MediaFile
+
+    text = ''
+    if media_file.file_extension in EXTRACTABLE_EXTENSIONS:
+        text = extract_text(path, media_file.file_extension)
+    media_file.content_text = text
+    media_file.text_extracted_at = timezone.now()
+    files = MediaFile.objects.filter(pk=media_file.pk)
+    files.update(content_text=text, text_extracted_at=media_file.text_extracted_at)
+    update_search_vectors(files)
+
+
+def update_search_vectors(files):
+    """
+    Rebuild ``search_vector`` from ``content_text`` for a queryset of files.
+
+    Runs as its own UPDATE so the vector is built from text written by an
+    earlier statement. tsvector is PostgreSQL-only; on other databases the
+    text is kept and searched with a plain LIKE instead.
+    """
+    if connection.vendor != 'postgresql':
+        return 0
+    from django.contrib.postgres.search import SearchVector
+    return files.update(search_vector=SearchVector('content_text', config=settings.MEDIA_SEARCH_CONFIG))
+
+
+def document_search_filter(query):
+    """Q object matching files whose extracted text contains ``query``."""
+    if connection.vendor != 'postgresql':
+        return Q(content_text__icontains=query)
+    from django.contrib.postgres.search import SearchQuery
+    return Q(search_vector=SearchQuery(query, config=settings.MEDIA_SEARCH_CONFIG, search_type='websearch'))
@@ -0,0 +1,72 @@
+from django import forms
+from django.conf import settings
+from django.urls import reverse_lazy
+from .models import MediaFile, UploadSession
+
+
+class ChunkedFileInput(forms.ClearableFileInput):
+    """
+    File input that sends the selected file through the resumable upload
+    endpoint in fixed-size chunks instead of the form's multipart POST.
+    """
+
+    class Media:
+        js = ('js/chunked-upload.js',)
+
+    def __init__(self, attrs=None):
+        attrs = {
+            'data-chunked-upload': reverse_lazy('media:upload_create'),
+            'data-chunk-size': settings.MEDIA_UPLOAD_CHUNK_SIZE,
+            'data-session-field': 'upload_session',
+            **(attrs or {}),
+        }
+        super().__init__(attrs)
+
+
+class MediaFileAdminForm(forms.ModelForm):
+    """Media file form that accepts either a regular or a chunked upload."""
+
+    upload_session = forms.UUIDField(required=False, widget=forms.HiddenInput)
+
+    # Set by MediaFileAdmin.get_form so uploads can be checked for ownership.
+    current_user = None
+
+    class Meta:
+        model = MediaFile
+        fields = '__all__'
+        widgets = {
+            'file': ChunkedFileInput,
+        }
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        if 'file' in self.fields:
+            self.fields['file'].required = False
+
+    def clean_upload_session(self):
+        session_id = self.cleaned_data.get('upload_session')
+        if not session_id:
+            return None
+        try:
+            session = UploadSession.objects.get(pk=session_id, user=self.current_user)
+        except UploadSession.DoesNotExist:
+            raise forms.ValidationError('Upload not found. Please select the file again.')
+        if session.status != 'complete':
+            raise forms.ValidationError('The upload has not finished yet.')
+        return session
+
+    def clean(self):
+        cleaned_data = super().clean()
+        file = cleaned_data.get('file')
+        has_file = file or (file is None and self.instance.pk and self.instance.file)
+        if 'file' in self.fields and not has_file and not cleaned_data.get('upload_session'):
+            self.add_error('file', 'This field is required.')
+        # The admin fieldsets leave the domain out; use the file's own then
+        domain = cleaned_data.get('domain')
+        domain_id = domain.pk if domain else self.instance.domain_id
+        tags = cleaned_data.get('tags')
+        if domain_id and tags:
+            foreign = [tag.name for tag in tags if tag.domain_id != domain_id]
+            if foreign:
+                self.add_error('tags', f"Tags from another domain: {', '.join(foreign)}")
+        return cleaned_data
@@ -0,0 +1,121 @@
+"""
+Precomputed gallery manifests.
+
+A manifest is a plain JSON document describing a gallery and its files in
+order. It is stored on ``MediaGallery.manifest`` and in the cache, so
+rendering an embedded gallery is a single cache read. Changes to a gallery,
+its items or its files schedule a rebuild once the transaction commits.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, transaction
+
+
+def manifest_cache_key(domain_id, slug):
+    return f"media:gallery:{domain_id}:{slug}"
+
+
+def build_manifest(gallery):
+    """Return the manifest for a gallery, reading its items in one query."""
+    from .models import MediaGalleryItem
+
+    items = (
+        MediaGalleryItem.objects.filter(gallery=gallery)
+        .select_related('media_file')
+        .order_by('position', 'pk')
+    )
+    entries = []
+    for item in items:
+        media_file = item.media_file
+        if not media_file.file:
+            continue
+        entries.append({
+            'id': media_file.pk,
+            'title': media_file.title,
+            'alt': media_file.alt_text or media_file.title,
+            'caption': media_file.description,
+            'media_type': media_file.media_type,
+            'mime_type': media_file.mime_type,
+            'url': media_file.file.url,
+            'thumbnail': media_file.thumbnail.url if media_file.thumbnail else None,
+            'width': media_file.width,
+            'height': media_file.height,
+            'placeholder': media_file.placeholder_color,
+            'duration': media_file.duration,
+        })
+    return {
+        'id': gallery.pk,
+        'name': gallery.name,
+        'slug': gallery.slug,
+        'description': gallery.description,
+        'items': entries,
+    }
+
+
+def cache_manifest(domain_id, slug, manifest):
+    cache.set(manifest_cache_key(domain_id, slug), manifest, settings.MEDIA_GALLERY_CACHE_TIMEOUT)
+
+
+def get_gallery_manifest(domain_id, slug):
+    """
+    Return a gallery's manifest, or None if there is no such gallery.
+
+    A cache hit costs no queries. On a miss the stored manifest is read by
+    its unique key; galleries that have never been built are built now.
+    """
+    from .models import MediaGallery
+
+    manifest = cache.get(manifest_cache_key(domain_id, slug))
+    if manifest is not None:
+        return manifest
+    gallery = MediaGallery.objects.filter(domain_id=domain_id, slug=slug).first()
+    if gallery is None:
+        return None
+    if not gallery.manifest:
+        return gallery.rebuild_manifest()
+    cache_manifest(domain_id, slug, gallery.manifest)
+    return gallery.manifest
+
+
+def forget_manifest(domain_id, slug):
+    cache.delete(manifest_cache_key(domain_id, slug))
+
+
+def rebuild_manifests(gallery_ids):
+    from .models import MediaGallery
+
+    for gallery in MediaGallery.objects.filter(pk__in=gallery_ids):
+        gallery.rebuild_manifest()
+
+
+class ManifestRebuild:
+    """on_commit callback that rebuilds a growing set of galleries once."""
+
+    def __init__(self, gallery_ids):
+        self.gallery_ids = set(gallery_ids)
+        self.done = False
+
+    def __call__(self):
+        self.done = True
+        rebuild_manifests(self.gallery_ids)
+
+
+def schedule_manifest_rebuild(gallery_ids):
+    """
+    Rebuild the given galleries' manifests after the current transaction.
+
+    Saving a gallery with many inline items fires a signal per item; they
+    all join the one pending callback instead of each rebuilding the
+    manifest.
+    """
+    gallery_ids = {pk for pk in gallery_ids if pk}
+    if not gallery_ids:
+        return
+    if not connection.in_atomic_block:
+        rebuild_manifests(gallery_ids)
+        return
+    for _, callback, _ in connection.run_on_commit:
+        if isinstance(callback, ManifestRebuild) and not callback.done:
+            callback.gallery_ids.update(gallery_ids)
+            return
+    transaction.on_commit(ManifestRebuild(gallery_ids))
@@ -0,0 +1,182 @@
+"""
+Background processing of uploaded media.
+
+Saving a MediaFile with new content only records what is cheap to know
+(size, extension, type) and queues a MediaJob in the same transaction. The
+``media_worker`` command claims jobs with ``SELECT ... FOR UPDATE SKIP
+LOCKED`` and runs ``process_media_file``: probing, hashing, optimization,
+the thumbnail rendition, the placeholder colour and document text
+extraction. Failures are retried
+with exponential backoff until ``MEDIA_JOB_MAX_ATTEMPTS`` is reached.
+"""
+import logging
+import os
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+from .documents import index_document
+from .galleries import schedule_manifest_rebuild
+from .processing import THUMBNAIL_EXTENSIONS, hash_file, image_placeholder, probe_file, render_thumbnail
+
+
+logger = logging.getLogger(__name__)
+
+# Seconds before the first retry; doubled for every further attempt
+RETRY_BASE_DELAY = 30
+
+
+def enqueue_processing(media_file):
+    """Queue processing for a media file unless a job is already waiting."""
+    from .models import MediaJob
+
+    MediaJob.objects.filter(media_file=media_file, status='failed').delete()
+    if not MediaJob.objects.filter(media_file=media_file, status='queued').exists():
+        MediaJob.objects.create(media_file=media_file)
+
+
+def claim_job(worker_id):
+    """
+    Lock the next due job, mark it running and return it.
+
+    Rows locked by another worker are skipped rather than waited on, so
+    concurrent workers never block each other or pick the same job.
+    """
+    from .models import MediaFile, MediaJob
+
+    now = timezone.now()
+    with transaction.atomic():
+        job = (
+            MediaJob.objects.select_for_update(skip_locked=True)
+            .filter(status='queued', run_after__lte=now)
+            .order_by('run_after', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+        job.status = 'running'
+        job.attempts += 1
+        job.locked_at = now
+        job.locked_by = worker_id
+        job.save(update_fields=['status', 'attempts', 'locked_at', 'locked_by', 'updated_at'])
+        MediaFile.objects.filter(pk=job.media_file_id).update(processing_status='processing')
+    return job
+
+
+def release_stale_jobs():
+    """Requeue jobs whose worker died without finishing them."""
+    from .models import MediaJob
+
+    cutoff = timezone.now() - timedelta(seconds=settings.MEDIA_JOB_TIMEOUT)
+    return MediaJob.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_at=None, locked_by='', updated_at=timezone.now(),
+    )
+
+
+def run_job(job):
+    """Process a claimed job; returns True on success."""
+    from .models import MediaFile
+
+    try:
+        process_media_file(job.media_file)
+    except Exception as exc:
+        logger.warning('Media job %s failed (attempt %s): %s', job.pk, job.attempts, exc)
+        job.last_error = f"{type(exc).__name__}: {exc}"
+        job.locked_at = None
+        job.locked_by = ''
+        if job.attempts >= settings.MEDIA_JOB_MAX_ATTEMPTS:
+            job.status = 'failed'
+            status = 'failed'
+        else:
+            job.status = 'queued'
+            job.run_after = timezone.now() + timedelta(seconds=RETRY_BASE_DELAY * 2 ** (job.attempts - 1))
+            status = 'pending'
+        job.save(update_fields=['status', 'run_after', 'locked_at', 'locked_by', 'last_error', 'updated_at'])
+        MediaFile.objects.filter(pk=job.media_file_id).update(
+            processing_status=status, processing_error=job.last_error,
+        )
+        return False
+    job.delete()
+    return True
+
+
+def process_media_file(media_file):
+    """
+    Compute everything derived from a media file's content.
+
+    Writes the results with a single UPDATE so ``MediaFile.save`` is not
+    run again, then marks the file ready and refreshes the manifests of
+    galleries that show it.
+    """
+    from .models import MediaFile, MediaGalleryItem, get_thumbnail_path
+
+    storage = media_file.file.storage
+    path = media_file.file.path
+    if not os.path.exists(path):
+        raise FileNotFoundError(f"{media_file.file.name} is missing from storage")
+
+    info = probe_file(path)
+    media_file.file_size = info['file_size']
+    media_file.mime_type = info['mime_type'] or media_file.mime_type
+    if info['width'] and info['height']:
+        media_file.width, media_file.height = info['width'], info['height']
+    media_file.duration = info['duration']
+    media_file.bitrate = info['bitrate']
+    media_file.codec = info['codec'][:50]
+    media_file.checksum = hash_file(path)
+
+    if media_file.is_optimizable():
+        media_file.optimize()
+
+    if not media_file.thumbnail and media_file.file_extension in THUMBNAIL_EXTENSIONS:
+        basename = os.path.splitext(os.path.basename(media_file.file.name))[0]
+        name = storage.get_available_name(get_thumbnail_path(media_file, f"{basename}.jpg"))
+        if render_thumbnail(path, storage.path(name), settings.MEDIA_THUMBNAIL_SIZE):
+            media_file.thumbnail = name
+
+    if media_file.media_type == 'document':
+        index_document(media_file, path)
+
+    if media_file.media_type == 'image':
+        # The thumbnail gives the same colour for a fraction of the decoding
+        source = media_file.thumbnail.path if media_file.thumbnail else path
+        placeholder = image_placeholder(source)
+        if placeholder:
+            media_file.placeholder_color = placeholder['color']
+
+    media_file.processing_status = 'ready'
+    media_file.processing_error = ''
+    MediaFile.objects.filter(pk=media_file.pk).update(
+        file_size=media_file.file_size,
+        mime_type=media_file.mime_type,
+        width=media_file.width,
+        height=media_file.height,
+        duration=media_file.duration,
+        bitrate=media_file.bitrate,
+        codec=media_file.codec,
+        checksum=media_file.checksum,
+        thumbnail=media_file.thumbnail.name or '',
+        placeholder_color=media_file.placeholder_color,
+        processing_status='ready',
+        processing_error='',
+    )
+    schedule_manifest_rebuild(
+        MediaGalleryItem.objects.filter(media_file=media_file).values_list('gallery_id', flat=True)
+    )
+
+
+def process_inline(media_file):
+    """Process a media file in the current request (MEDIA_ASYNC_PROCESSING off)."""
+    from .models import MediaFile
+
+    try:
+        process_media_file(media_file)
+    except Exception as exc:
+        logger.warning('Could not process media file %s: %s', media_file.pk, exc)
+        media_file.processing_status = 'failed'
+        media_file.processing_error = f"{type(exc).__name__}: {exc}"
+        MediaFile.objects.filter(pk=media_file.pk).update(
+            processing_status='failed', processing_error=media_file.processing_error,
+        )
@@ -0,0 +1,125 @@
+import os
+import shutil
+import time
+
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+from cmsapp.media.models import MediaReference
+
+
+# Directories under MEDIA_ROOT that hold working files, not library content
+SKIP_DIRS = {'.uploads', '.quarantine'}
+
+
+def iter_media_files(root):
+    """
+    Walk a directory tree with os.scandir, yielding (relative_path, stat).
+
+    Only one directory listing is open at a time per level, so memory stays
+    proportional to tree depth rather than file count.
+    """
+    stack = ['']
+    while stack:
+        rel_dir = stack.pop()
+        try:
+            entries = os.scandir(os.path.join(root, rel_dir))
+        except OSError:
+            continue
+        with entries:
+            for entry in entries:
+                rel_path = f"{rel_dir}/{entry.name}" if rel_dir else entry.name
+                if entry.is_dir(follow_symlinks=False):
+                    if rel_dir or entry.name not in SKIP_DIRS:
+                        stack.append(rel_path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield rel_path, entry.stat(follow_symlinks=False)
+
+
+def file_columns():
+    """Return (model, field_name) for every FileField/ImageField in the project."""
+    columns = []
+    for model in apps.get_models():
+        for field in model._meta.concrete_fields:
+            if isinstance(field, models.FileField):
+                columns.append((model, field.name))
+    # Paths linked from page content (e.g. editor uploads) are in use too.
+    columns.append((MediaReference, 'path'))
+    return columns
+
+
+class Command(BaseCommand):
+    help = 'Find files under MEDIA_ROOT that no database row refers to, and optionally quarantine them'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--grace-days',
+            type=int,
+            default=7,
+            help='Ignore files modified within this many days (default: 7)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=1000,
+            help='Number of paths checked against the database per query (default: 1000)',
+        )
+        parser.add_argument(
+            '--quarantine',
+            action='store_true',
+            help='Move orphans to MEDIA_ROOT/.quarantine instead of only reporting them',
+        )
+
+    def handle(self, *args, **options):
+        self.media_root = str(settings.MEDIA_ROOT)
+        self.quarantine_root = os.path.join(self.media_root, '.quarantine')
+        self.quarantine = options['quarantine']
+        self.columns = file_columns()
+        cutoff = time.time() - options['grace_days'] * 86400
+        batch_size = options['batch_size']
+
+        self.scanned = self.orphans = self.orphan_bytes = 0
+        batch = {}
+        for rel_path, st in iter_media_files(self.media_root):
+            self.scanned += 1
+            if st.st_mtime > cutoff:
+                continue
+            batch[rel_path] = st.st_size
+            if len(batch) >= batch_size:
+                self.process_batch(batch)
+                batch = {}
+        if batch:
+            self.process_batch(batch)
+
+        action = 'Quarantined' if self.quarantine else 'Found'
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Scanned {self.scanned} files. {action} {self.orphans} orphans "
+            f"({self.orphan_bytes / (1024 * 1024):.1f} MB)"
+        ))
+
+    def process_batch(self, batch):
+        """Check one batch of paths against every file column."""
+        remaining = sorted(batch)
+        for model, field_name in self.columns:
+            if not remaining:
+                return
+            found = set(
+                model._default_manager.filter(**{f"{field_name}__in": remaining})
+                .values_list(field_name, flat=True)
+            )
+            if found:
+                remaining = [path for path in remaining if path not in found]
+
+        for rel_path in remaining:
+            size = batch[rel_path]
+            self.orphans += 1
+            self.orphan_bytes += size
+            if self.quarantine:
+                self.move_to_quarantine(rel_path)
+            self.stdout.write(f"{rel_path}\t{size}")
+
+    def move_to_quarantine(self, rel_path):
+        target = os.path.join(self.quarantine_root, rel_path)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        shutil.move(os.path.join(self.media_root, rel_path), target)
@@ -0,0 +1,332 @@
+"""
+Management command to bulk import a directory or ZIP archive into the media library.
+Usage: python manage.py import_media /path/to/assets --domain example.com --folder "Old site"
+
+Copying, image optimization, hashing, probing, thumbnailing, placeholder
+colours and document text extraction run in a process pool; rows are inserted with bulk_create
+in batches. Files
+already imported into the same location are skipped, so an interrupted
+import can simply be run again.
+"""
+import os
+import shutil
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections, transaction
+from django.utils import timezone
+from django.utils.text import slugify
+from cmsapp.domains.models import Domain, DomainSetting
+from cmsapp.media.documents import EXTRACTABLE_EXTENSIONS, extract_text, update_search_vectors
+from cmsapp.media.models import MediaFile, MediaFolder
+from cmsapp.media.processing import (
+    THUMBNAIL_EXTENSIONS, hash_file, image_placeholder, optimize_image, probe_file, render_thumbnail,
+)
+from cmsapp.media.references import link_new_files
+
+
+# Archive and OS clutter that should never become library entries
+SKIP_NAMES = {'__MACOSX', 'Thumbs.db', 'desktop.ini'}
+
+# Extensions MediaFile.is_optimizable() accepts
+OPTIMIZABLE_EXTENSIONS = ('jpg', 'jpeg', 'png')
+
+_open_archives = {}
+
+
+def _open_archive(path):
+    """Return a ZipFile for ``path``, opened once per worker process."""
+    if path not in _open_archives:
+        _open_archives[path] = zipfile.ZipFile(path)
+    return _open_archives[path]
+
+
+def prepare_file(task):
+    """
+    Copy one source file into MEDIA_ROOT and collect its metadata.
+
+    Runs in a worker process, so it only touches the filesystem. A target
+    that already exists with the expected size is assumed to be a copy left
+    by an earlier, interrupted run and is reused.
+
+    ``optimize`` is ``(max_dimension, keep_original)`` when the domain has
+    image optimization on, and is applied as ``MediaFile.optimize`` would.
+    """
+    source, member, size, target, thumbnail, thumbnail_size, optimize = task
+    media_root = str(settings.MEDIA_ROOT)
+    target_path = os.path.join(media_root, target)
+    try:
+        if not (os.path.exists(target_path) and os.path.getsize(target_path) == size):
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            partial_path = f"{target_path}.part"
+            if member is None:
+                shutil.copyfile(source, partial_path)
+            else:
+                with _open_archive(source).open(member) as src, open(partial_path, 'wb') as dst:
+                    shutil.copyfileobj(src, dst, 1024 * 1024)
+            os.replace(partial_path, target_path)
+
+        optimized = None
+        extension = os.path.splitext(target)[1].lower().lstrip('.')
+        if optimize and extension in OPTIMIZABLE_EXTENSIONS:
+            max_dimension, keep_original = optimize
+            original = f"originals/{target}" if keep_original else ''
+            try:
+                result = optimize_image(
+                    target_path, max_dimension, os.path.join(media_root, original) if original else None,
+                )
+            except Exception:
+                # Stored as imported, like an upload Pillow cannot handle
+                result = None
+            optimized = {'original_file': '', 'original_size': None}
+            if result:
+                optimized = {'original_file': original, 'original_size': result['original_size']}
+
+        info = probe_file(target_path)
+        info['optimized'] = optimized
+        info['checksum'] = hash_file(target_path)
+        info['content_text'] = ''
+        info['text_extracted'] = info['file_extension'] in EXTRACTABLE_EXTENSIONS
+        if info['text_extracted']:
+            info['content_text'] = extract_text(target_path, info['file_extension'])
+        info['thumbnail'] = ''
+        if thumbnail and render_thumbnail(target_path, os.path.join(media_root, thumbnail), thumbnail_size):
+            info['thumbnail'] = thumbnail
+        info['placeholder_color'] = ''
+        if info['mime_type'].startswith('image/'):
+            # The thumbnail gives the same colour for a fraction of the decoding
+            source = os.path.join(media_root, info['thumbnail']) if info['thumbnail'] else target_path
+            placeholder = image_placeholder(source)
+            if placeholder:
+                info['placeholder_color'] = placeholder['color']
+    except Exception as exc:
+        return target, None, str(exc)
+    return target, info, None
+
+
+class Command(BaseCommand):
+    help = 'Import a directory or ZIP archive of files into the media library'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', help='Directory or .zip file to import')
+        parser.add_argument(
+            '--domain',
+            type=str,
+            required=True,
+            help='Domain name the files belong to',
+        )
+        parser.add_argument(
+            '--folder',
+            type=str,
+            default='',
+            help='Top-level folder to import into (created if missing). '
+                 'Subdirectories become subfolders beneath it.',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes for copying and processing (default: CPU count, 1 runs inline)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=500,
+            help='Rows inserted per bulk_create (default: 500)',
+        )
+
+    def handle(self, *args, **options):
+        source = os.path.abspath(options['source'])
+        try:
+            self.domain = Domain.objects.get(name=options['domain'])
+        except Domain.DoesNotExist:
+            raise CommandError(f'Domain "{options["domain"]}" does not exist')
+
+        if os.path.isdir(source):
+            entries = self.walk_directory(source)
+        elif zipfile.is_zipfile(source):
+            entries = self.walk_archive(source)
+        else:
+            raise CommandError(f'"{source}" is neither a directory nor a ZIP archive')
+
+        self.root_folder = None
+        if options['folder']:
+            self.root_folder = self.get_folder(None, options['folder'])
+        self.folders = {(): self.root_folder}
+
+        domain_settings = DomainSetting.for_domain(self.domain)
+        self.optimize = None
+        if domain_settings.media_optimize_images:
+            self.optimize = (
+                domain_settings.media_max_image_dimension,
+                domain_settings.media_keep_original_images,
+            )
+
+        tasks, folder_ids = self.build_tasks(source, entries)
+        skipped = len(folder_ids)
+        folder_ids = self.exclude_imported(folder_ids)
+        skipped -= len(folder_ids)
+        tasks = [task for task in tasks if task[3] in folder_ids]
+        self.stdout.write(f"{len(tasks)} files to import, {skipped} already imported")
+
+        imported = failed = 0
+        batch = []
+        for target, info, error in self.run_tasks(tasks, options['workers']):
+            if error:
+                failed += 1
+                self.stderr.write(f"✗ {target}: {error}")
+                continue
+            batch.append(self.build_media_file(target, info, folder_ids[target]))
+            if len(batch) >= options['batch_size']:
+                imported += self.insert_batch(batch)
+                batch = []
+                self.stdout.write(f"Imported {imported}/{len(tasks)}")
+        if batch:
+            imported += self.insert_batch(batch)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Imported {imported} files into {self.domain.name} ({failed} failed, {skipped} skipped)"
+        ))
+
+    def walk_directory(self, root):
+        """Yield (relative_parts, source_path, member, size) for every file under ``root``."""
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith('.') and d not in SKIP_NAMES)
+            rel_dir = os.path.relpath(dirpath, root)
+            parts = () if rel_dir == '.' else tuple(rel_dir.split(os.sep))
+            for filename in sorted(filenames):
+                if filename.startswith('.') or filename in SKIP_NAMES:
+                    continue
+                path = os.path.join(dirpath, filename)
+                if os.path.isfile(path) and not os.path.islink(path):
+                    yield parts + (filename,), path, None, os.path.getsize(path)
+
+    def walk_archive(self, path):
+        """Yield (relative_parts, archive_path, member, size) for every file in a ZIP."""
+        with zipfile.ZipFile(path) as archive:
+            for info in archive.infolist():
+                if info.is_dir():
+                    continue
+                parts = tuple(part for part in info.filename.split('/') if part)
+                if any(part.startswith('.') or part in SKIP_NAMES for part in parts):
+                    continue
+                yield parts, path, info.filename, info.file_size
+
+    def build_tasks(self, source, entries):
+        """Turn source entries into worker tasks and note each target's folder."""
+        tasks = []
+        folder_ids = {}
+        prefix = f"media/{self.domain.name}/import"
+        for parts, path, member, size in entries:
+            try:
+                clean = [default_storage.get_valid_name(part) for part in parts]
+            except Exception:
+                self.stderr.write(f"✗ Skipping unsafe name: {'/'.join(parts)}")
+                continue
+            target = self.unique_target('/'.join([prefix, *clean]), folder_ids)
+            if len(target) > MediaFile._meta.get_field('file').max_length:
+                self.stderr.write(f"✗ Skipping path that is too long: {target}")
+                continue
+            folder = self.folder_for(parts[:-1])
+            thumbnail = None
+            if os.path.splitext(target)[1].lower().lstrip('.') in THUMBNAIL_EXTENSIONS:
+                thumbnail = f"thumbnails/{self.domain.name}/import/{target[len(prefix) + 1:]}.jpg"
+            tasks.append((path, member, size, target, thumbnail, settings.MEDIA_THUMBNAIL_SIZE, self.optimize))
+            folder_ids[target] = folder.pk if folder else None
+        return tasks, folder_ids
+
+    def unique_target(self, target, taken):
+        """
+        Number ``target`` if an earlier source file already cleaned to it.
+
+        Different names can clean to the same one ("My File.jpg" and
+        "My_File.jpg"). Entries are walked in a fixed order, so a rerun
+        picks the same numbers and still recognises imported files.
+        """
+        if target not in taken:
+            return target
+        root, ext = os.path.splitext(target)
+        counter = 1
+        while f"{root}_{counter}{ext}" in taken:
+            counter += 1
+        return f"{root}_{counter}{ext}"
+
+    def folder_for(self, parts):
+        """Return the folder mirroring a source directory, creating the chain if needed."""
+        if parts not in self.folders:
+            parent = self.folder_for(parts[:-1])
+            self.folders[parts] = self.get_folder(parent, parts[-1])
+        return self.folders[parts]
+
+    def get_folder(self, parent, name):
+        folder, _ = MediaFolder.objects.get_or_create(
+            domain=self.domain,
+            parent=parent,
+            slug=slugify(name)[:255] or 'folder',
+            defaults={'name': name[:255]},
+        )
+        return folder
+
+    def exclude_imported(self, folder_ids):
+        """Drop targets that already have a MediaFile row from an earlier run."""
+        targets = list(folder_ids)
+        existing = set()
+        for start in range(0, len(targets), 1000):
+            existing.update(
+                MediaFile.objects.filter(file__in=targets[start:start + 1000]).values_list('file', flat=True)
+            )
+        return {target: folder for target, folder in folder_ids.items() if target not in existing}
+
+    def run_tasks(self, tasks, workers):
+        if workers <= 1:
+            for task in tasks:
+                yield prepare_file(task)
+            return
+        # Forked workers must not inherit open database connections.
+        connections.close_all()
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            yield from pool.map(prepare_file, tasks, chunksize=16)
+
+    def build_media_file(self, target, info, folder_id):
+        """Build an unsaved MediaFile, doing what MediaFile.save() would do."""
+        title = os.path.splitext(os.path.basename(target))[0][:255]
+        media_file = MediaFile(
+            domain=self.domain,
+            folder_id=folder_id,
+            title=title,
+            slug=slugify(title)[:255],
+            file=target,
+            thumbnail=info['thumbnail'],
+            file_size=info['file_size'],
+            file_extension=info['file_extension'][:10],
+            mime_type=info['mime_type'][:100],
+            checksum=info['checksum'],
+            width=info['width'],
+            height=info['height'],
+            duration=info['duration'],
+            bitrate=info['bitrate'],
+            codec=info['codec'][:50],
+            content_text=info['content_text'],
+            placeholder_color=info['placeholder_color'],
+            uploaded_by='import_media',
+        )
+        if info['text_extracted']:
+            media_file.text_extracted_at = timezone.now()
+        if info['optimized'] is not None:
+            media_file.optimized_at = timezone.now()
+            media_file.original_file = info['optimized']['original_file']
+            media_file.original_size = info['optimized']['original_size']
+        media_file.media_type = media_file._detect_media_type()
+        return media_file
+
+    def insert_batch(self, batch):
+        with transaction.atomic():
+            created = MediaFile.objects.bulk_create(batch)
+            link_new_files(created)
+            update_search_vectors(MediaFile.objects.filter(
+                pk__in=[media_file.pk for media_file in created if media_file.content_text]
+            ))
+        return len(created)
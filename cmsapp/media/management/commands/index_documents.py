@@ -0,0 +1,47 @@
+"""
+Management command to queue text extraction for existing documents.
+Usage: python manage.py index_documents [--domain example.com]
+
+Documents uploaded before search existed have never had their text
+extracted. This queues a processing job for each of them; run media_worker
+to work through the queue. Documents that were extracted but contain no
+text (scans, empty files) are not queued again.
+"""
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from cmsapp.domains.models import Domain
+from cmsapp.media.documents import EXTRACTABLE_EXTENSIONS
+from cmsapp.media.jobs import enqueue_processing
+from cmsapp.media.models import MediaFile
+
+
+class Command(BaseCommand):
+    help = 'Queue text extraction for documents that have not been indexed'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--domain',
+            type=str,
+            help='Only index documents of this domain',
+        )
+
+    def handle(self, *args, **options):
+        files = MediaFile.objects.filter(
+            media_type='document',
+            file_extension__in=EXTRACTABLE_EXTENSIONS,
+            text_extracted_at=None,
+        ).exclude(file='')
+        if options['domain']:
+            try:
+                files = files.filter(domain=Domain.objects.get(name=options['domain']))
+            except Domain.DoesNotExist:
+                raise CommandError(f'Domain "{options["domain"]}" does not exist')
+
+        queued = 0
+        with transaction.atomic():
+            for media_file in files.only('pk').iterator(chunk_size=500):
+                enqueue_processing(media_file)
+                queued += 1
+            files.update(processing_status='pending')
+
+        self.stdout.write(self.style.SUCCESS(f"✓ Queued {queued} documents for indexing"))
@@ -0,0 +1,33 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand
+from cmsapp.media.models import MediaReference
+from cmsapp.media.references import INDEXED_FIELDS, index_object, refresh_usage_counts
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the media reference index from existing page and template content'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--clear',
+            action='store_true',
+            help='Delete all stored references before re-indexing',
+        )
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            deleted, _ = MediaReference.objects.all().delete()
+            self.stdout.write(f"Removed {deleted} existing references")
+
+        for label, fields in INDEXED_FIELDS.items():
+            model = apps.get_model(label)
+            field_names = [name for name, _ in fields]
+            indexed = 0
+            for instance in model.objects.only('pk', *field_names).iterator(chunk_size=500):
+                index_object(instance)
+                indexed += 1
+            self.stdout.write(f"Indexed {indexed} {model._meta.verbose_name_plural}")
+
+        # Files whose references were cleared need their counts reset too.
+        refresh_usage_counts()
+        self.stdout.write(self.style.SUCCESS('✓ Media reference index rebuilt'))
@@ -0,0 +1,120 @@
+"""
+Management command to process queued media jobs.
+Usage: python manage.py media_worker [--processes 4] [--once]
+
+Each process polls the MediaJob table and claims work with SELECT ... FOR
+UPDATE SKIP LOCKED, so any number of workers, on one host or several, can
+run side by side. SIGTERM lets the current job finish before exiting.
+"""
+import multiprocessing
+import os
+import signal
+import socket
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+from cmsapp.media.jobs import claim_job, release_stale_jobs, run_job
+
+
+class Worker:
+    """Claim-and-run loop for a single process."""
+
+    def __init__(self, name, poll_interval, once=False):
+        self.name = name
+        self.poll_interval = poll_interval
+        self.once = once
+        self.stopping = False
+        self.processed = 0
+        self.failed = 0
+
+    def stop(self, *args):
+        self.stopping = True
+
+    def run(self):
+        while not self.stopping:
+            if not self.once:
+                # Between polls of a long-running worker only: a --once
+                # pass may run inside a caller's transaction
+                close_old_connections()
+            job = claim_job(self.name)
+            if job is None:
+                if self.once:
+                    break
+                release_stale_jobs()
+                time.sleep(self.poll_interval)
+                continue
+            if run_job(job):
+                self.processed += 1
+            else:
+                self.failed += 1
+        return self.processed, self.failed
+
+
+def run_worker(name, poll_interval):
+    """Entry point for forked worker processes."""
+    worker = Worker(name, poll_interval)
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.run()
+
+
+class Command(BaseCommand):
+    help = 'Process queued media jobs (metadata, hashes, optimization and thumbnails)'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes',
+            type=int,
+            default=1,
+            help='Worker processes to run (default: 1)',
+        )
+        parser.add_argument(
+            '--poll-interval',
+            type=float,
+            default=settings.MEDIA_WORKER_POLL_INTERVAL,
+            help='Seconds to wait when the queue is empty',
+        )
+        parser.add_argument(
+            '--once',
+            action='store_true',
+            help='Process every due job and exit instead of polling',
+        )
+
+    def handle(self, *args, **options):
+        base_name = f"{socket.gethostname()}:{os.getpid()}"
+
+        if options['processes'] <= 1 or options['once']:
+            worker = Worker(base_name, options['poll_interval'], once=options['once'])
+            if not options['once']:
+                signal.signal(signal.SIGTERM, worker.stop)
+            processed, failed = worker.run()
+            self.stdout.write(self.style.SUCCESS(f"✓ Processed {processed} media jobs ({failed} failed)"))
+            return
+
+        # Forked workers must not inherit open database connections.
+        connections.close_all()
+        context = multiprocessing.get_context('fork')
+        children = [
+            context.Process(
+                target=run_worker,
+                args=(f"{base_name}/{index}", options['poll_interval']),
+                daemon=False,
+            )
+            for index in range(options['processes'])
+        ]
+        for child in children:
+            child.start()
+        self.stdout.write(f"Started {len(children)} media workers")
+
+        def shutdown(*args):
+            for child in children:
+                if child.is_alive():
+                    child.terminate()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        for child in children:
+            child.join()
+        self.stdout.write(self.style.SUCCESS('✓ Media workers stopped'))
@@ -0,0 +1,128 @@
+"""
+Management command to run the image optimization stage over existing files.
+Usage: python manage.py optimize_media [--domain example.com] [--workers 4]
+
+Re-encoding runs in a process pool; the parent process writes the results
+back with bulk_update. Files are marked as optimized even when nothing could
+be saved, so the command can be re-run and only picks up new work.
+"""
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.utils import timezone
+from cmsapp.domains.models import Domain, DomainSetting
+from cmsapp.media.models import MediaFile, get_original_path
+from cmsapp.media.processing import optimize_image
+
+
+UPDATE_FIELDS = ['optimized_at', 'original_file', 'original_size', 'file_size', 'width', 'height', 'checksum']
+
+
+def optimize_task(task):
+    """Optimize one file in a worker process; returns (pk, result, error)."""
+    pk, path, max_dimension, original_path = task
+    try:
+        return pk, optimize_image(path, max_dimension, original_path), None
+    except Exception as exc:
+        return pk, None, str(exc)
+
+
+class Command(BaseCommand):
+    help = 'Optimize existing JPEG and PNG media files according to each domain\'s settings'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--domain',
+            type=str,
+            help='Only optimize files of this domain',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=os.cpu_count() or 1,
+            help='Worker processes (default: CPU count, 1 runs inline)',
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=200,
+            help='Files processed and written back per batch (default: 200)',
+        )
+
+    def handle(self, *args, **options):
+        files = MediaFile.objects.filter(
+            media_type='image',
+            file_extension__in=['jpg', 'jpeg', 'png'],
+            optimized_at__isnull=True,
+        )
+        if options['domain']:
+            try:
+                files = files.filter(domain=Domain.objects.get(name=options['domain']))
+            except Domain.DoesNotExist:
+                raise CommandError(f'Domain "{options["domain"]}" does not exist')
+
+        self.domain_settings = {s.domain_id: s for s in DomainSetting.objects.all()}
+        pending = list(files.exclude(file='').values_list('pk', flat=True).order_by('pk'))
+        self.stdout.write(f"{len(pending)} images to optimize")
+
+        self.optimized = self.failed = self.saved = 0
+        self.pool = None
+        if options['workers'] > 1:
+            # Forked workers must not inherit open database connections.
+            connections.close_all()
+            self.pool = ProcessPoolExecutor(max_workers=options['workers'])
+        batch_size = options['batch_size']
+        try:
+            for start in range(0, len(pending), batch_size):
+                batch = MediaFile.objects.filter(pk__in=pending[start:start + batch_size])
+                self.process_batch(list(batch))
+                self.stdout.write(f"Processed {min(start + batch_size, len(pending))}/{len(pending)}")
+        finally:
+            if self.pool:
+                self.pool.shutdown()
+
+        self.stdout.write(self.style.SUCCESS(
+            f"✓ Optimized {self.optimized} images, saved {self.saved / (1024 * 1024):.1f} MB "
+            f"({self.failed} failed)"
+        ))
+
+    def process_batch(self, media_files):
+        by_pk = {media_file.pk: media_file for media_file in media_files}
+        original_names = {}
+        tasks = []
+        for media_file in media_files:
+            domain_settings = self.domain_settings.get(media_file.domain_id) or DomainSetting()
+            if not domain_settings.media_optimize_images:
+                continue
+            original_path = None
+            if domain_settings.media_keep_original_images:
+                original_names[media_file.pk] = get_original_path(media_file, None)
+                original_path = default_storage.path(original_names[media_file.pk])
+            tasks.append((media_file.pk, media_file.file.path, domain_settings.media_max_image_dimension, original_path))
+
+        if self.pool:
+            results = self.pool.map(optimize_task, tasks, chunksize=8)
+        else:
+            results = map(optimize_task, tasks)
+
+        now = timezone.now()
+        updated = []
+        for pk, result, error in results:
+            media_file = by_pk[pk]
+            if error:
+                self.failed += 1
+                self.stderr.write(f"✗ {media_file.file.name}: {error}")
+            media_file.optimized_at = now
+            if result:
+                media_file.original_file = original_names.get(pk, '')
+                media_file.original_size = result['original_size']
+                media_file.file_size = result['file_size']
+                media_file.width, media_file.height = result['width'], result['height']
+                media_file.checksum = result['checksum']
+                self.optimized += 1
+                self.saved += media_file.bytes_saved
+            updated.append(media_file)
+        MediaFile.objects.bulk_update(updated, UPDATE_FIELDS)
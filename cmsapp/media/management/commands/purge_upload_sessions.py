@@ -0,0 +1,29 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from cmsapp.media.models import UploadSession
+
+
+class Command(BaseCommand):
+    help = 'Delete abandoned or already attached chunked upload sessions and their temp files'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--hours',
+            type=int,
+            default=settings.MEDIA_UPLOAD_SESSION_MAX_AGE,
+            help='Discard sessions not touched for this many hours',
+        )
+
+    def handle(self, *args, **options):
+        cutoff = timezone.now() - timedelta(hours=options['hours'])
+        stale = UploadSession.objects.filter(updated_at__lt=cutoff)
+
+        removed = 0
+        for session in stale.iterator():
+            session.discard()
+            removed += 1
+
+        self.stdout.write(self.style.SUCCESS(f'✓ Removed {removed} upload sessions'))
@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:42
+
+import django.db.models.deletion
+import uuid
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0003_alter_mediafile_file'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='checksum',
+            field=models.CharField(blank=True, db_index=True, help_text='SHA-256 of the file contents', max_length=64),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='file_size',
+            field=models.PositiveBigIntegerField(blank=True, help_text='File size in bytes', null=True),
+        ),
+        migrations.CreateModel(
+            name='UploadSession',
+            fields=[
+                ('id', models.UUIDField(default=uuid.uuid4, editable=False, primary_key=True, serialize=False)),
+                ('filename', models.CharField(max_length=255)),
+                ('upload_length', models.PositiveBigIntegerField(help_text='Total size announced by the client')),
+                ('offset', models.PositiveBigIntegerField(default=0, help_text='Bytes received so far')),
+                ('status', models.CharField(choices=[('uploading', 'Uploading'), ('complete', 'Complete'), ('attached', 'Attached')], default='uploading', max_length=20)),
+                ('checksum', models.CharField(blank=True, max_length=64)),
+                ('mime_type', models.CharField(blank=True, max_length=100)),
+                ('width', models.PositiveIntegerField(blank=True, null=True)),
+                ('height', models.PositiveIntegerField(blank=True, null=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('completed_at', models.DateTimeField(blank=True, null=True)),
+                ('media_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='upload_sessions', to='media.mediafile')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='media_upload_sessions', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'verbose_name_plural': 'Upload Sessions',
+                'ordering': ['-created_at'],
+                'indexes': [models.Index(fields=['status', 'updated_at'], name='media_uploa_status_36dbcf_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:44
+
+import cmsapp.media.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0004_upload_sessions'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='is_private',
+            field=models.BooleanField(default=False, help_text='Only staff with access to this domain can download the file'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='file',
+            field=models.FileField(db_index=True, max_length=255, upload_to=cmsapp.media.models.get_domain_media_path),
+        ),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:46
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('media', '0005_mediafile_is_private'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaReference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('path', models.CharField(help_text='Path relative to MEDIA_ROOT', max_length=255)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('field', models.CharField(help_text='Field on the source that holds the reference', max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('content_type', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='contenttypes.contenttype')),
+                ('media_file', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='references', to='media.mediafile')),
+            ],
+            options={
+                'verbose_name_plural': 'Media References',
+                'indexes': [models.Index(fields=['path'], name='media_media_path_6d887f_idx'), models.Index(fields=['media_file'], name='media_media_media_f_893b82_idx')],
+                'unique_together': {('content_type', 'object_id', 'field', 'path')},
+            },
+        ),
+    ]
@@ -0,0 +1,83 @@
+# Replace the comma-separated MediaFile.tags string with a MediaTag model
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+
+def split_tags(apps, schema_editor):
+    """Create MediaTag rows from the old comma-separated strings."""
+    MediaFile = apps.get_model('media', 'MediaFile')
+    MediaTag = apps.get_model('media', 'MediaTag')
+    Through = MediaFile.tags.through
+
+    tag_ids = {}
+    links = []
+    files = MediaFile.objects.exclude(tags_text='').values_list('pk', 'domain_id', 'tags_text')
+    for file_id, domain_id, tags_text in files.iterator():
+        seen = set()
+        for name in tags_text.split(','):
+            name = name.strip()[:100]
+            slug = slugify(name)[:100]
+            if not slug or slug in seen:
+                continue
+            seen.add(slug)
+            key = (domain_id, slug)
+            if key not in tag_ids:
+                tag, _ = MediaTag.objects.get_or_create(domain_id=domain_id, slug=slug, defaults={'name': name})
+                tag_ids[key] = tag.pk
+            links.append(Through(mediafile_id=file_id, mediatag_id=tag_ids[key]))
+            if len(links) >= 1000:
+                Through.objects.bulk_create(links, ignore_conflicts=True)
+                links = []
+    Through.objects.bulk_create(links, ignore_conflicts=True)
+
+
+def join_tags(apps, schema_editor):
+    """Rebuild the comma-separated strings from MediaTag rows."""
+    MediaFile = apps.get_model('media', 'MediaFile')
+    for media_file in MediaFile.objects.prefetch_related('tags').iterator(chunk_size=500):
+        names = ', '.join(tag.name for tag in media_file.tags.all())
+        if names:
+            MediaFile.objects.filter(pk=media_file.pk).update(tags_text=names[:500])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0004_domainsetting_alert_toggles'),
+        ('media', '0006_mediareference'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MediaTag',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('slug', models.SlugField(max_length=100)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('domain', models.ForeignKey(help_text='Domain this tag belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='media_tags', to='domains.domain')),
+            ],
+            options={
+                'verbose_name_plural': 'Media Tags',
+                'ordering': ['name'],
+                'unique_together': {('domain', 'slug')},
+            },
+        ),
+        migrations.RenameField(
+            model_name='mediafile',
+            old_name='tags',
+            new_name='tags_text',
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='tags',
+            field=models.ManyToManyField(blank=True, related_name='files', to='media.mediatag'),
+        ),
+        migrations.RunPython(split_tags, join_tags),
+        migrations.RemoveField(
+            model_name='mediafile',
+            name='tags_text',
+        ),
+    ]
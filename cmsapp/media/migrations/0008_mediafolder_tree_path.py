@@ -0,0 +1,51 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:51
+
+from django.db import migrations, models
+
+
+def build_tree_paths(apps, schema_editor):
+    """Fill tree_path, depth and full_name for existing folders."""
+    MediaFolder = apps.get_model('media', 'MediaFolder')
+    folders = {folder.pk: folder for folder in MediaFolder.objects.all()}
+
+    def resolve(folder):
+        if folder.tree_path:
+            return
+        parent = folders.get(folder.parent_id)
+        if parent is None:
+            folder.tree_path, folder.depth, folder.full_name = f"/{folder.pk}/", 0, folder.name
+            return
+        resolve(parent)
+        folder.tree_path = f"{parent.tree_path}{folder.pk}/"
+        folder.depth = parent.depth + 1
+        folder.full_name = f"{parent.full_name} / {folder.name}"
+
+    for folder in folders.values():
+        resolve(folder)
+    MediaFolder.objects.bulk_update(folders.values(), ['tree_path', 'depth', 'full_name'], batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0007_mediatag'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafolder',
+            name='depth',
+            field=models.PositiveSmallIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='full_name',
+            field=models.CharField(blank=True, editable=False, help_text="Names of this folder and its ancestors, joined with ' / '", max_length=1024),
+        ),
+        migrations.AddField(
+            model_name='mediafolder',
+            name='tree_path',
+            field=models.CharField(blank=True, db_index=True, editable=False, help_text='Ids of this folder and its ancestors, e.g. /3/17/42/', max_length=255),
+        ),
+        migrations.RunPython(build_tree_paths, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:53
+
+import cmsapp.media.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0008_mediafolder_tree_path'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='thumbnail',
+            field=models.ImageField(blank=True, help_text='Small JPEG preview used in listings', max_length=255, upload_to=cmsapp.media.models.get_thumbnail_path),
+        ),
+    ]
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.9 on 2026-10-19 17:58
+
+import cmsapp.media.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0009_mediafile_thumbnail'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='optimized_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='original_file',
+            field=models.FileField(blank=True, db_index=True, help_text='The upload as received, kept when the domain asks for originals', max_length=255, upload_to=cmsapp.media.models.get_original_path),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='original_size',
+            field=models.PositiveBigIntegerField(blank=True, help_text='Size in bytes before optimization', null=True),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='thumbnail',
+            field=models.ImageField(blank=True, db_index=True, help_text='Small JPEG preview used in listings', max_length=255, upload_to=cmsapp.media.models.get_thumbnail_path),
+        ),
+    ]
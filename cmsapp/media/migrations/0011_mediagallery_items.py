@@ -0,0 +1,91 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:01
+
+import cmsapp.media.models
+import django.db.models.deletion
+from collections import Counter
+
+from django.db import migrations, models
+
+
+def copy_memberships(apps, schema_editor):
+    """Move gallery files into ordered items and give galleries a domain."""
+    MediaGallery = apps.get_model('media', 'MediaGallery')
+    MediaGalleryItem = apps.get_model('media', 'MediaGalleryItem')
+    Membership = MediaGallery.files.through
+
+    for gallery in MediaGallery.objects.all():
+        rows = Membership.objects.filter(mediagallery_id=gallery.pk).order_by('pk')
+        items = [
+            MediaGalleryItem(gallery_id=gallery.pk, media_file_id=row.mediafile_id, position=position)
+            for position, row in enumerate(rows)
+        ]
+        MediaGalleryItem.objects.bulk_create(items)
+        # Galleries used to be global; file them under their files' domain.
+        domains = Counter(rows.values_list('mediafile__domain_id', flat=True))
+        if domains:
+            MediaGallery.objects.filter(pk=gallery.pk).update(domain_id=domains.most_common(1)[0][0])
+
+
+def restore_memberships(apps, schema_editor):
+    MediaGallery = apps.get_model('media', 'MediaGallery')
+    MediaGalleryItem = apps.get_model('media', 'MediaGalleryItem')
+    Membership = MediaGallery.files.through
+    Membership.objects.bulk_create([
+        Membership(mediagallery_id=item.gallery_id, mediafile_id=item.media_file_id)
+        for item in MediaGalleryItem.objects.order_by('gallery_id', 'position')
+    ])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0005_domainsetting_media_optimization'),
+        ('media', '0010_mediafile_optimization'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediagallery',
+            name='domain',
+            field=models.ForeignKey(default=cmsapp.media.models.get_default_domain, help_text='Domain this gallery belongs to', on_delete=django.db.models.deletion.CASCADE, related_name='media_galleries', to='domains.domain'),
+        ),
+        migrations.AddField(
+            model_name='mediagallery',
+            name='manifest',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+        migrations.AlterField(
+            model_name='mediagallery',
+            name='slug',
+            field=models.SlugField(max_length=255),
+        ),
+        migrations.CreateModel(
+            name='MediaGalleryItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('position', models.PositiveIntegerField(default=0)),
+                ('gallery', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='media.mediagallery')),
+                ('media_file', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='gallery_items', to='media.mediafile')),
+            ],
+            options={
+                'ordering': ['position', 'pk'],
+                'unique_together': {('gallery', 'media_file')},
+            },
+        ),
+        migrations.RunPython(copy_memberships, restore_memberships),
+        # Django cannot add a through model to an existing M2M, so the field
+        # is recreated on top of the new table.
+        migrations.RemoveField(
+            model_name='mediagallery',
+            name='files',
+        ),
+        migrations.AddField(
+            model_name='mediagallery',
+            name='files',
+            field=models.ManyToManyField(blank=True, related_name='galleries', through='media.MediaGalleryItem', to='media.mediafile'),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mediagallery',
+            unique_together={('domain', 'slug')},
+        ),
+    ]
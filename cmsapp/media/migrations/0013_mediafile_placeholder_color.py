@@ -0,0 +1,18 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0012_mediajob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='placeholder_color',
+            field=models.CharField(blank=True, help_text='Dominant colour, shown in place of the image while it loads', max_length=7),
+        ),
+    ]
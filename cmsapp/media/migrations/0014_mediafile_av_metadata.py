@@ -0,0 +1,28 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:11
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0013_mediafile_placeholder_color'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='bitrate',
+            field=models.PositiveIntegerField(blank=True, help_text='Average bitrate in bits per second', null=True),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='codec',
+            field=models.CharField(blank=True, help_text='Video codec, or audio codec for audio files', max_length=50),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='duration',
+            field=models.FloatField(blank=True, help_text='Length in seconds (audio and video)', null=True),
+        ),
+    ]
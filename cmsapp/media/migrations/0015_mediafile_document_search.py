@@ -0,0 +1,30 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:15
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('domains', '0005_domainsetting_media_optimization'),
+        ('media', '0014_mediafile_av_metadata'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='content_text',
+            field=models.TextField(blank=True, editable=False, help_text='Text extracted from documents'),
+        ),
+        migrations.AddField(
+            model_name='mediafile',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='mediafile',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='media_file_search_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:48
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0015_mediafile_document_search'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='uploadsession',
+            name='checksum',
+        ),
+    ]
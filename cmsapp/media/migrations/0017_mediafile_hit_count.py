@@ -0,0 +1,23 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:50
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0016_remove_uploadsession_checksum'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='hit_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of times this file was used'),
+        ),
+        migrations.AlterField(
+            model_name='mediafile',
+            name='usage_count',
+            field=models.PositiveIntegerField(default=0, help_text='Number of places that reference this file'),
+        ),
+    ]
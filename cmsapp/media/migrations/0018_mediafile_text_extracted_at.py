@@ -0,0 +1,26 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:56
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def mark_extracted(apps, schema_editor):
+    """Files that already have text were extracted; the rest are queued once more."""
+    MediaFile = apps.get_model('media', 'MediaFile')
+    MediaFile.objects.exclude(content_text='').update(text_extracted_at=F('updated_at'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('media', '0017_mediafile_hit_count'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='mediafile',
+            name='text_extracted_at',
+            field=models.DateTimeField(blank=True, editable=False, help_text='When text extraction last ran, even if it found no text', null=True),
+        ),
+        migrations.RunPython(mark_extracted, migrations.RunPython.noop),
+    ]
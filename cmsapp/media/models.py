@@ -1,9 +1,24 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F, Value
+from django.db.models.functions import Concat, Substr
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.fields import GenericForeignKey
+from django.contrib.contenttypes.models import ContentType
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import SearchVectorField
+from django.core.files import File
 from django.utils.text import slugify
+from django.core.exceptions import ValidationError
 from django.core.validators import FileExtensionValidator
 from django.utils import timezone
-from cmsapp.domains.models import Domain
+from cmsapp.domains.models import Domain, DomainSetting
+import logging
 import os
+import uuid
+
+
+logger = logging.getLogger(__name__)
 
 
 def get_default_domain():
@@ -19,6 +34,21 @@ def get_default_domain():
     return domain.id
 
 
+def get_thumbnail_path(instance, filename):
+    """
+    Generate the path for a media file's thumbnail.
+    Format: thumbnails/{domain_name}/{year}/{month}/{filename}
+    """
+    domain_name = instance.domain.name if instance.domain else 'default'
+    date = timezone.now()
+    return f'thumbnails/{domain_name}/{date.strftime("%Y/%m")}/{filename}'
+
+
+def get_original_path(instance, filename):
+    """Keep the untouched upload alongside the optimized file: originals/{file path}."""
+    return f'originals/{instance.file.name}'
+
+
 def get_domain_media_path(instance, filename):
     """
     Generate domain-specific upload path for media files.
@@ -31,7 +61,14 @@ def get_domain_media_path(instance, filename):
 
 
 class MediaFolder(models.Model):
-    """Organize media files into folders."""
+    """
+    Organize media files into folders.
+
+    Each folder stores a materialized path of its ancestors' ids
+    (``tree_path``, e.g. ``/3/17/42/``) together with its depth and full
+    display name, so subtrees, breadcrumbs and labels never need to walk
+    ``parent`` one query at a time. The columns are kept in sync on save.
+    """
     
     domain = models.ForeignKey(
         Domain,
@@ -50,6 +87,20 @@ class MediaFolder(models.Model):
         related_name='subfolders'
     )
     description = models.TextField(blank=True)
+    tree_path = models.CharField(
+        max_length=255,
+        blank=True,
+        db_index=True,
+        editable=False,
+        help_text="Ids of this folder and its ancestors, e.g. /3/17/42/"
+    )
+    depth = models.PositiveSmallIntegerField(default=0, editable=False)
+    full_name = models.CharField(
+        max_length=1024,
+        blank=True,
+        editable=False,
+        help_text="Names of this folder and its ancestors, joined with ' / '"
+    )
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
     
@@ -62,20 +113,121 @@ class MediaFolder(models.Model):
         ]
     
     def __str__(self):
-        if self.parent:
-            return f"{self.parent} / {self.name}"
-        return self.name
+        return self.full_name or self.name
+    
+    def clean(self):
+        super().clean()
+        if self.pk and self.parent_id:
+            parent_path = self.parent.tree_path
+            if self.parent_id == self.pk or (self.tree_path and parent_path.startswith(self.tree_path)):
+                raise ValidationError({'parent': 'A folder cannot be moved inside itself.'})
+        if self.parent_id and self.domain_id and self.parent.domain_id != self.domain_id:
+            raise ValidationError({'parent': 'The parent folder belongs to another domain.'})
+        if self.pk:
+            # Subfolders and files keep their own domain, so only an empty
+            # folder can change domains.
+            old_domain_id = MediaFolder.objects.filter(pk=self.pk).values_list('domain_id', flat=True).first()
+            if old_domain_id and old_domain_id != self.domain_id and (
+                self.get_descendants().exists() or self.get_all_files().exists()
+            ):
+                raise ValidationError({
+                    'domain': 'A folder with subfolders or files cannot be moved to another domain.'
+                })
     
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        
+        old_path = old_name = None
+        if self.pk:
+            old_path, old_name = MediaFolder.objects.filter(pk=self.pk).values_list(
+                'tree_path', 'full_name'
+            ).first() or (None, None)
+        
+        if self.parent_id:
+            parent_path, parent_depth, parent_name = MediaFolder.objects.filter(
+                pk=self.parent_id
+            ).values_list('tree_path', 'depth', 'full_name').get()
+            self.depth = parent_depth + 1
+            self.full_name = f"{parent_name} / {self.name}"
+        else:
+            parent_path = '/'
+            self.depth = 0
+            self.full_name = self.name
+        
+        update_fields = kwargs.get('update_fields')
+        if update_fields is not None:
+            kwargs['update_fields'] = {*update_fields, 'tree_path', 'depth', 'full_name'}
+        
+        with transaction.atomic():
+            if self.pk:
+                self.tree_path = f"{parent_path}{self.pk}/"
+                super().save(*args, **kwargs)
+            else:
+                super().save(*args, **kwargs)
+                self.tree_path = f"{parent_path}{self.pk}/"
+                MediaFolder.objects.filter(pk=self.pk).update(tree_path=self.tree_path)
+            
+            if old_path and (old_path, old_name) != (self.tree_path, self.full_name):
+                self._rebase_descendants(old_path, old_name)
+    
+    def _rebase_descendants(self, old_path, old_name):
+        """Rewrite the stored paths of every descendant after a move or rename."""
+        depth_change = self.tree_path.count('/') - old_path.count('/')
+        MediaFolder.objects.filter(tree_path__startswith=old_path).exclude(pk=self.pk).update(
+            tree_path=Concat(Value(self.tree_path), Substr('tree_path', len(old_path) + 1)),
+            full_name=Concat(Value(self.full_name), Substr('full_name', len(old_name) + 1)),
+            depth=F('depth') + depth_change,
+        )
+    
+    def get_ancestors(self, include_self=False):
+        """Return the folders above this one, root first, in one query."""
+        ids = [int(pk) for pk in self.tree_path.strip('/').split('/') if pk]
+        if not include_self:
+            ids = ids[:-1]
+        return MediaFolder.objects.filter(pk__in=ids).order_by('depth')
+    
+    def get_descendants(self, include_self=False):
+        """Return every folder below this one in one indexed query."""
+        qs = MediaFolder.objects.filter(tree_path__startswith=self.tree_path)
+        if not include_self:
+            qs = qs.exclude(pk=self.pk)
+        return qs
+    
+    def get_all_files(self):
+        """Return the files in this folder and all of its subfolders."""
+        return MediaFile.objects.filter(folder__tree_path__startswith=self.tree_path)
     
     def get_path(self):
         """Get the full folder path."""
-        if self.parent:
-            return f"{self.parent.get_path()}/{self.slug}"
-        return self.slug
+        return '/'.join(self.get_ancestors(include_self=True).values_list('slug', flat=True))
+
+
+class MediaTag(models.Model):
+    """A tag for organizing media files, unique per domain."""
+    
+    domain = models.ForeignKey(
+        Domain,
+        on_delete=models.CASCADE,
+        related_name='media_tags',
+        help_text="Domain this tag belongs to"
+    )
+    name = models.CharField(max_length=100)
+    slug = models.SlugField(max_length=100)
+    created_at = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        ordering = ['name']
+        verbose_name_plural = 'Media Tags'
+        unique_together = ('domain', 'slug')
+    
+    def __str__(self):
+        return self.name
+    
+    def save(self, *args, **kwargs):
+        if not self.slug:
+            self.slug = slugify(self.name)
+        super().save(*args, **kwargs)
 
 
 class MediaFile(models.Model):
@@ -99,7 +251,7 @@ class MediaFile(models.Model):
     title = models.CharField(max_length=255)
     slug = models.SlugField(max_length=255, blank=True)
     description = models.TextField(blank=True)
-    file = models.FileField(upload_to=get_domain_media_path)
+    file = models.FileField(upload_to=get_domain_media_path, max_length=255, db_index=True)
     media_type = models.CharField(max_length=20, choices=MEDIA_TYPES, default='other')
     folder = models.ForeignKey(
         MediaFolder, 
@@ -110,14 +262,55 @@ class MediaFile(models.Model):
     )
     
     # File metadata
-    file_size = models.PositiveIntegerField(null=True, blank=True, help_text='File size in bytes')
+    file_size = models.PositiveBigIntegerField(null=True, blank=True, help_text='File size in bytes')
     file_extension = models.CharField(max_length=10, blank=True)
     mime_type = models.CharField(max_length=100, blank=True)
+    checksum = models.CharField(max_length=64, blank=True, db_index=True, help_text='SHA-256 of the file contents')
+    duration = models.FloatField(null=True, blank=True, help_text='Length in seconds (audio and video)')
+    bitrate = models.PositiveIntegerField(null=True, blank=True, help_text='Average bitrate in bits per second')
+    codec = models.CharField(max_length=50, blank=True, help_text='Video codec, or audio codec for audio files')
+    placeholder_color = models.CharField(
+        max_length=7,
+        blank=True,
+        help_text='Dominant colour, shown in place of the image while it loads'
+    )
+    
+    # Document search
+    content_text = models.TextField(blank=True, editable=False, help_text='Text extracted from documents')
+    text_extracted_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        editable=False,
+        help_text='When text extraction last ran, even if it found no text'
+    )
+    search_vector = SearchVectorField(null=True, editable=False)
     
     # Image-specific fields
     width = models.PositiveIntegerField(null=True, blank=True)
     height = models.PositiveIntegerField(null=True, blank=True)
     alt_text = models.CharField(max_length=255, blank=True, help_text='Alternative text for images')
+    thumbnail = models.ImageField(
+        upload_to=get_thumbnail_path,
+        max_length=255,
+        blank=True,
+        db_index=True,
+        help_text='Small JPEG preview used in listings'
+    )
+    
+    # Image optimization
+    original_file = models.FileField(
+        upload_to=get_original_path,
+        max_length=255,
+        blank=True,
+        db_index=True,
+        help_text='The upload as received, kept when the domain asks for originals'
+    )
+    original_size = models.PositiveBigIntegerField(
+        null=True,
+        blank=True,
+        help_text='Size in bytes before optimization'
+    )
+    optimized_at = models.DateTimeField(null=True, blank=True)
     
     # Metadata
     uploaded_by = models.CharField(max_length=100, default='Admin')
@@ -125,24 +318,79 @@ class MediaFile(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     
     # Usage tracking
-    usage_count = models.PositiveIntegerField(default=0, help_text='Number of times this file is used')
+    usage_count = models.PositiveIntegerField(default=0, help_text='Number of places that reference this file')
+    hit_count = models.PositiveIntegerField(default=0, help_text='Number of times this file was used')
     last_used = models.DateTimeField(null=True, blank=True)
     
     # Tags for organization
-    tags = models.CharField(max_length=500, blank=True, help_text='Comma-separated tags')
+    tags = models.ManyToManyField(MediaTag, related_name='files', blank=True)
+    
+    # Access control
+    is_private = models.BooleanField(
+        default=False,
+        help_text='Only staff with access to this domain can download the file'
+    )
+    
+    # Background processing
+    PROCESSING_STATUSES = [
+        ('pending', 'Pending'),
+        ('processing', 'Processing'),
+        ('ready', 'Ready'),
+        ('failed', 'Failed'),
+    ]
+    processing_status = models.CharField(
+        max_length=20,
+        choices=PROCESSING_STATUSES,
+        default='ready',
+        db_index=True,
+        help_text='Whether metadata, thumbnails and optimization are done'
+    )
+    processing_error = models.TextField(blank=True)
     
     class Meta:
         ordering = ['-uploaded_at']
         verbose_name_plural = 'Media Files'
+        indexes = [
+            GinIndex(fields=['search_vector'], name='media_file_search_idx'),
+        ]
     
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored name so save() can tell when a new file arrives
+        instance._loaded_file_name = instance.__dict__.get('file')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         
-        # Extract file metadata if file exists
+        file_changed = bool(self.file) and (
+            not self.file._committed
+            or self.file.name != getattr(self, '_loaded_file_name', None)
+        )
+        stale_thumbnail = None
+        if file_changed:
+            # Everything derived from the previous file is recomputed
+            self.optimized_at = None
+            self.original_size = None
+            self.original_file = ''
+            self.processing_error = ''
+            self.placeholder_color = ''
+            self.content_text = ''
+            self.text_extracted_at = None
+            self.search_vector = None
+            if settings.MEDIA_ASYNC_PROCESSING:
+                self.processing_status = 'pending'
+            if self.pk and self.thumbnail and self.thumbnail._committed:
+                stale_thumbnail = self.thumbnail.name
+                self.thumbnail = ''
+        
+        # Cheap metadata is filled in right away; dimensions, hashing and
+        # optimization happen in process_media_file().
         if self.file:
             self.file_size = self.file.size
             self.file_extension = os.path.splitext(self.file.name)[1].lower().replace('.', '')
@@ -150,22 +398,89 @@ class MediaFile(models.Model):
             # Auto-detect media type based on extension
             if not self.media_type or self.media_type == 'other':
                 self.media_type = self._detect_media_type()
-            
-            # Get image dimensions for image files
-            if self.media_type == 'image' and not self.width:
-                try:
-                    from PIL import Image
-                    image = Image.open(self.file)
-                    self.width, self.height = image.size
-                except Exception:
-                    pass
         
         super().save(*args, **kwargs)
+        self._loaded_file_name = self.file.name if self.file else None
+        
+        if stale_thumbnail:
+            storage = self.thumbnail.storage
+            transaction.on_commit(lambda: storage.delete(stale_thumbnail))
+        if file_changed:
+            from .jobs import enqueue_processing, process_inline
+            if settings.MEDIA_ASYNC_PROCESSING:
+                enqueue_processing(self)
+            else:
+                process_inline(self)
+    
+    def is_optimizable(self):
+        """Whether the optimization stage applies to this file."""
+        return (
+            self.media_type == 'image'
+            and self.file_extension in ('jpg', 'jpeg', 'png')
+            and self.optimized_at is None
+        )
+    
+    def optimize(self, domain_settings=None):
+        """
+        Optimize the stored image in place according to the domain's settings.
+
+        Returns the number of bytes saved. The row is updated directly so
+        this can run after ``save()`` without triggering it again.
+        """
+        from .processing import optimize_image
+        
+        if domain_settings is None:
+            domain_settings = DomainSetting.for_domain(self.domain_id)
+        if not domain_settings.media_optimize_images:
+            return 0
+        
+        original_name = get_original_path(self, None) if domain_settings.media_keep_original_images else ''
+        try:
+            result = optimize_image(
+                self.file.path,
+                domain_settings.media_max_image_dimension,
+                self.file.storage.path(original_name) if original_name else None,
+            )
+        except Exception as exc:
+            # A file Pillow cannot handle is stored as uploaded.
+            logger.warning('Could not optimize media file %s: %s', self.pk, exc)
+            result = None
+        self.optimized_at = timezone.now()
+        fields = {'optimized_at': self.optimized_at}
+        if result:
+            self.original_file = original_name
+            self.original_size = result['original_size']
+            self.file_size = result['file_size']
+            self.width, self.height = result['width'], result['height']
+            self.checksum = result['checksum']
+            fields.update(
+                original_file=self.original_file.name,
+                original_size=self.original_size,
+                file_size=self.file_size,
+                width=self.width,
+                height=self.height,
+                checksum=self.checksum,
+            )
+        MediaFile.objects.filter(pk=self.pk).update(**fields)
+        return self.bytes_saved
+    
+    @property
+    def placeholder_style(self):
+        """Inline CSS for the box an image occupies before it has loaded."""
+        from .processing import placeholder_css
+        return placeholder_css(self.placeholder_color, self.width, self.height)
+    
+    @property
+    def bytes_saved(self):
+        """Bytes removed by the optimization stage."""
+        if self.original_size and self.file_size:
+            return max(self.original_size - self.file_size, 0)
+        return 0
     
     def _detect_media_type(self):
         """Auto-detect media type from file extension."""
         image_exts = ['jpg', 'jpeg', 'png', 'gif', 'webp', 'svg', 'bmp', 'ico']
-        video_exts = ['mp4', 'webm', 'ogg', 'mov', 'avi', 'wmv', 'flv']
+        video_exts = ['mp4', 'm4v', 'webm', 'mkv', 'ogg', 'mov', 'avi', 'wmv', 'flv']
         audio_exts = ['mp3', 'wav', 'ogg', 'flac', 'aac', 'm4a']
         doc_exts = ['pdf', 'doc', 'docx', 'xls', 'xlsx', 'ppt', 'pptx', 'txt', 'csv']
         
@@ -195,20 +510,265 @@ class MediaFile(models.Model):
             self.file_size /= 1024.0
         return f"{self.file_size:.1f} TB"
     
-    def increment_usage(self):
-        """Track usage of this media file."""
-        self.usage_count += 1
-        self.last_used = timezone.now()
-        self.save(update_fields=['usage_count', 'last_used'])
+    def get_duration_display(self):
+        """Duration as h:mm:ss or m:ss."""
+        if not self.duration:
+            return ''
+        minutes, seconds = divmod(int(round(self.duration)), 60)
+        hours, minutes = divmod(minutes, 60)
+        if hours:
+            return f"{hours}:{minutes:02d}:{seconds:02d}"
+        return f"{minutes}:{seconds:02d}"
+    
+    def get_bitrate_display(self):
+        """Bitrate in kbit/s or Mbit/s."""
+        if not self.bitrate:
+            return ''
+        if self.bitrate >= 1000000:
+            return f"{self.bitrate / 1000000:.1f} Mbit/s"
+        return f"{self.bitrate // 1000} kbit/s"
+    
+    def increment_hits(self, count=1):
+        """
+        Track use of this media file in ``hit_count`` and ``last_used``.
+
+        The increment is buffered in memory and written later by
+        ``cmsapp.media.counters``; only this instance is updated right away.
+        ``usage_count`` is not touched: it is the number of references and
+        belongs to ``cmsapp.media.references``.
+        """
+        from .counters import usage_buffer
+
+        now = timezone.now()
+        usage_buffer.add(self.pk, count, now)
+        self.hit_count += count
+        self.last_used = now
+
+
+class MediaJob(models.Model):
+    """
+    A queued processing job for a media file.
+
+    Workers claim jobs with ``SELECT ... FOR UPDATE SKIP LOCKED``, so any
+    number of ``media_worker`` processes can share the table without
+    handing the same job out twice. Finished jobs are deleted; failed ones
+    stay for inspection.
+    """
+    
+    STATUS_CHOICES = [
+        ('queued', 'Queued'),
+        ('running', 'Running'),
+        ('failed', 'Failed'),
+    ]
+    
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name='jobs')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='queued')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    run_after = models.DateTimeField(default=timezone.now)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    locked_by = models.CharField(max_length=100, blank=True)
+    last_error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    class Meta:
+        ordering = ['run_after', 'pk']
+        indexes = [
+            models.Index(fields=['run_after'], condition=models.Q(status='queued'), name='media_job_queued_idx'),
+            models.Index(fields=['status', 'locked_at'], name='media_job_status_locked_idx'),
+        ]
+    
+    def __str__(self):
+        return f"Process {self.media_file_id} ({self.status})"
+
+
+class MediaReference(models.Model):
+    """
+    A media path referenced by a piece of content.
+
+    Maintained by ``cmsapp.media.references`` whenever pages, blocks, page
+    images or layout components are saved, so "where is this file used"
+    and reverse cache invalidation are single indexed lookups.
+    """
+
+    path = models.CharField(max_length=255, help_text='Path relative to MEDIA_ROOT')
+    media_file = models.ForeignKey(
+        MediaFile,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='references'
+    )
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveBigIntegerField()
+    source = GenericForeignKey('content_type', 'object_id')
+    field = models.CharField(max_length=100, help_text='Field on the source that holds the reference')
+
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        verbose_name_plural = 'Media References'
+        unique_together = ('content_type', 'object_id', 'field', 'path')
+        indexes = [
+            models.Index(fields=['path']),
+            models.Index(fields=['media_file']),
+        ]
+
+    def __str__(self):
+        return f"{self.path} <- {self.content_type.model} #{self.object_id} ({self.field})"
+
+
+class _AssembledFile(File):
+    """
+    A finished upload on local disk.
+
+    Exposing ``temporary_file_path`` lets FileSystemStorage move the file into
+    place instead of copying it chunk by chunk.
+    """
+
+    def __init__(self, path, name):
+        super().__init__(open(path, 'rb'), name=name)
+        self._path = path
+
+    def temporary_file_path(self):
+        return self._path
+
+
+class UploadSession(models.Model):
+    """
+    A resumable, chunked upload in progress.
+
+    Chunks are appended to a temporary file under MEDIA_UPLOAD_TEMP_DIR at the
+    offset the client reports, so an interrupted transfer can continue from
+    the last byte the server acknowledged instead of starting over.
+    """
+
+    STATUS_CHOICES = [
+        ('uploading', 'Uploading'),
+        ('complete', 'Complete'),
+        ('attached', 'Attached'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='media_upload_sessions'
+    )
+    filename = models.CharField(max_length=255)
+    upload_length = models.PositiveBigIntegerField(help_text='Total size announced by the client')
+    offset = models.PositiveBigIntegerField(default=0, help_text='Bytes received so far')
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='uploading')
+
+    # Filled in when the last chunk arrives
+    mime_type = models.CharField(max_length=100, blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+
+    media_file = models.ForeignKey(
+        'MediaFile',
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='upload_sessions'
+    )
+
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+    completed_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        verbose_name_plural = 'Upload Sessions'
+        indexes = [
+            models.Index(fields=['status', 'updated_at']),
+        ]
+
+    def __str__(self):
+        return f"{self.filename} ({self.offset}/{self.upload_length})"
+
+    @property
+    def temp_path(self):
+        """Location of the partially assembled file."""
+        return os.path.join(settings.MEDIA_UPLOAD_TEMP_DIR, f"{self.pk}.part")
+
+    @property
+    def is_complete(self):
+        return self.offset >= self.upload_length
+
+    def finalize(self):
+        """
+        Probe the assembled file once every byte has arrived.
+
+        The file is not hashed here: that would read the whole upload while
+        the request holds the session lock. The media job computes the
+        checksum once the file is attached.
+        """
+        from .processing import probe_file
+
+        info = probe_file(self.temp_path, self.filename)
+        self.mime_type = info['mime_type']
+        self.width = info['width']
+        self.height = info['height']
+        self.status = 'complete'
+        self.completed_at = timezone.now()
+        self.save(update_fields=[
+            'mime_type', 'width', 'height', 'status', 'completed_at', 'updated_at',
+        ])
+
+    def attach(self, media_file):
+        """
+        Move the assembled file into storage as ``media_file.file``.
+
+        The probed metadata is copied across so ``MediaFile.save`` does not
+        need to reopen the file. The media file itself is not saved.
+        """
+        content = _AssembledFile(self.temp_path, self.filename)
+        try:
+            media_file.file.save(self.filename, content, save=False)
+        finally:
+            content.close()
+        media_file.mime_type = self.mime_type
+        media_file.file_size = self.upload_length
+        if self.width and self.height:
+            media_file.width = self.width
+            media_file.height = self.height
+
+    def discard(self):
+        """Remove the temporary file and the session row."""
+        try:
+            os.remove(self.temp_path)
+        except FileNotFoundError:
+            pass
+        self.delete()
 
 
 class MediaGallery(models.Model):
-    """Collection of media files that can be embedded in pages."""
+    """
+    Collection of media files that can be embedded in pages.
+
+    ``manifest`` holds everything needed to render the gallery (URLs,
+    dimensions, alt text) and is rebuilt whenever the gallery, its items or
+    one of its files change, so rendering never has to join the items.
+    """
     
+    domain = models.ForeignKey(
+        Domain,
+        on_delete=models.CASCADE,
+        related_name='media_galleries',
+        default=get_default_domain,
+        help_text="Domain this gallery belongs to"
+    )
     name = models.CharField(max_length=255)
-    slug = models.SlugField(unique=True, max_length=255)
+    slug = models.SlugField(max_length=255)
     description = models.TextField(blank=True)
-    files = models.ManyToManyField(MediaFile, related_name='galleries', blank=True)
+    files = models.ManyToManyField(
+        MediaFile,
+        through='MediaGalleryItem',
+        related_name='galleries',
+        blank=True
+    )
+    manifest = models.JSONField(default=dict, blank=True, editable=False)
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -216,11 +776,42 @@ class MediaGallery(models.Model):
     class Meta:
         ordering = ['name']
         verbose_name_plural = 'Media Galleries'
+        unique_together = ('domain', 'slug')
     
     def __str__(self):
         return self.name
     
     def save(self, *args, **kwargs):
+        from .galleries import forget_manifest
+        
         if not self.slug:
             self.slug = slugify(self.name)
+        if self.pk:
+            previous = MediaGallery.objects.filter(pk=self.pk).values_list('domain_id', 'slug').first()
+            if previous and previous != (self.domain_id, self.slug):
+                forget_manifest(*previous)
         super().save(*args, **kwargs)
+    
+    def rebuild_manifest(self):
+        """Recompute the manifest, store it on the row and refresh the cache."""
+        from .galleries import build_manifest, cache_manifest
+        
+        self.manifest = build_manifest(self)
+        MediaGallery.objects.filter(pk=self.pk).update(manifest=self.manifest)
+        cache_manifest(self.domain_id, self.slug, self.manifest)
+        return self.manifest
+
+
+class MediaGalleryItem(models.Model):
+    """A file in a gallery, at a given position."""
+    
+    gallery = models.ForeignKey(MediaGallery, on_delete=models.CASCADE, related_name='items')
+    media_file = models.ForeignKey(MediaFile, on_delete=models.CASCADE, related_name='gallery_items')
+    position = models.PositiveIntegerField(default=0)
+    
+    class Meta:
+        ordering = ['position', 'pk']
+        unique_together = ('gallery', 'media_file')
+    
+    def __str__(self):
+        return f"{self.gallery} #{self.position}"
@@ -0,0 +1,218 @@
+"""
+File processing helpers for the media library.
+
+These functions work on plain filesystem paths so they can be shared by the
+request cycle, management commands and background workers.
+"""
+import hashlib
+import mimetypes
+import os
+import shutil
+
+
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# Containers avprobe can read
+AV_EXTENSIONS = {'mp4', 'm4v', 'm4a', 'mov', 'webm', 'mkv', 'mka', 'mp3', 'wav', 'flac'}
+
+
+def hash_file(path):
+    """Return the SHA-256 hex digest of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as fh:
+        for chunk in iter(lambda: fh.read(HASH_CHUNK_SIZE), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def probe_file(path, filename=None):
+    """
+    Collect basic metadata for a file on disk.
+
+    Returns a dict with file_size, file_extension, mime_type and, for images
+    Pillow can read, width and height. Audio and video files also get
+    duration, bitrate and codec (and width and height for video) from
+    ``avprobe``.
+    """
+    filename = filename or os.path.basename(path)
+    extension = os.path.splitext(filename)[1].lower().replace('.', '')
+    mime_type, _ = mimetypes.guess_type(filename)
+
+    info = {
+        'file_size': os.path.getsize(path),
+        'file_extension': extension,
+        'mime_type': mime_type or '',
+        'width': None,
+        'height': None,
+        'duration': None,
+        'bitrate': None,
+        'codec': '',
+    }
+
+    if info['mime_type'].startswith('image/'):
+        try:
+            from PIL import Image
+            with Image.open(path) as image:
+                info['width'], info['height'] = image.size
+        except Exception:
+            pass
+    elif extension in AV_EXTENSIONS:
+        from .avprobe import probe_av
+        av_info = probe_av(path)
+        if av_info:
+            info.update(av_info)
+
+    return info
+
+
+# Raster formats Pillow can thumbnail (SVG and icons are shown as-is)
+THUMBNAIL_EXTENSIONS = {'jpg', 'jpeg', 'png', 'gif', 'webp', 'bmp', 'tif', 'tiff'}
+
+
+def render_thumbnail(path, target_path, size):
+    """
+    Write a JPEG thumbnail of an image, no larger than ``size`` on either edge.
+
+    Returns True when a thumbnail was written, False if the file could not
+    be read as an image.
+    """
+    try:
+        from PIL import Image, ImageOps
+        with Image.open(path) as image:
+            image.draft('RGB', (size, size))
+            image = ImageOps.exif_transpose(image)
+            image.thumbnail((size, size))
+            if image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            os.makedirs(os.path.dirname(target_path), exist_ok=True)
+            image.save(target_path, 'JPEG', quality=80, optimize=True)
+    except Exception:
+        return False
+    return True
+
+
+def image_placeholder(source):
+    """
+    Return the dominant colour and size of an image, for inline placeholders.
+
+    ``source`` is a path or an open file; a file's position is restored
+    afterwards. The image is decoded at a reduced size, quantized to a few
+    colours and the most common one is returned as ``#rrggbb`` together
+    with the (EXIF-rotated) width and height. Returns None if Pillow cannot
+    read the image.
+    """
+    from PIL import Image, ImageOps
+
+    position = source.tell() if hasattr(source, 'tell') else None
+    try:
+        with Image.open(source) as image:
+            width, height = image.size
+            if image.getexif().get(0x0112, 1) in (5, 6, 7, 8):
+                width, height = height, width
+            # Let JPEG decode straight to roughly 1/8 scale
+            image.draft('RGB', (64, 64))
+            small = ImageOps.exif_transpose(image).convert('RGB')
+            small.thumbnail((64, 64))
+            palette = small.quantize(colors=5)
+            count, index = max(palette.getcolors())
+            red, green, blue = palette.getpalette()[index * 3:index * 3 + 3]
+    except Exception:
+        return None
+    finally:
+        if position is not None:
+            source.seek(position)
+    return {
+        'color': f"#{red:02x}{green:02x}{blue:02x}",
+        'width': width,
+        'height': height,
+    }
+
+
+def placeholder_css(color, width, height):
+    """Inline style reserving an image's box and filling it until it loads."""
+    rules = []
+    if color:
+        rules.append(f"background-color: {color};")
+    if width and height:
+        rules.append(f"aspect-ratio: {width} / {height};")
+    return ' '.join(rules)
+
+
+# Formats the optimization stage re-encodes
+OPTIMIZE_FORMATS = {'JPEG', 'PNG'}
+JPEG_QUALITY = 85
+
+
+def optimize_image(path, max_dimension=0, original_path=None):
+    """
+    Rewrite a JPEG or PNG in place without metadata.
+
+    EXIF orientation is applied to the pixels, the image is scaled down so
+    neither edge exceeds ``max_dimension`` (0 means no limit), and it is
+    re-encoded with an optimized, progressive encoder. ICC profiles are
+    kept so colours do not shift.
+
+    The rewrite is only kept if it changed the pixels, removed metadata or
+    made the file smaller. If ``original_path`` is given the untouched file
+    is copied there first. Returns a dict with original_size, file_size,
+    width, height and checksum, or None if the file was left alone.
+    """
+    from PIL import Image, ImageOps
+
+    original_size = os.path.getsize(path)
+    temp_path = f"{path}.optimizing"
+    try:
+        with Image.open(path) as source:
+            image_format = source.format
+            if image_format not in OPTIMIZE_FORMATS:
+                return None
+            exif = source.getexif()
+            has_metadata = bool(exif) or any(
+                key in source.info for key in ('exif', 'xmp', 'XML:com.adobe.xmp', 'comment')
+            )
+            icc_profile = source.info.get('icc_profile')
+
+            rotated = exif.get(0x0112, 1) != 1
+            image = ImageOps.exif_transpose(source) if rotated else source
+            resized = bool(max_dimension) and max(image.size) > max_dimension
+            if resized:
+                image = image.copy() if image is source else image
+                image.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+
+            options = {'optimize': True}
+            if icc_profile:
+                options['icc_profile'] = icc_profile
+            if image_format == 'JPEG':
+                options['progressive'] = True
+                if rotated or resized:
+                    options['quality'] = JPEG_QUALITY
+                else:
+                    # Re-use the source quantization tables, so dropping
+                    # metadata does not cost another generation of loss.
+                    options['quality'] = 'keep'
+                if image.mode not in ('RGB', 'L', 'CMYK'):
+                    image = image.convert('RGB')
+            image.save(temp_path, image_format, **options)
+            width, height = image.size
+
+        file_size = os.path.getsize(temp_path)
+        if not (rotated or resized or has_metadata or file_size < original_size):
+            os.remove(temp_path)
+            return None
+
+        if original_path and not os.path.exists(original_path):
+            os.makedirs(os.path.dirname(original_path), exist_ok=True)
+            shutil.copy2(path, original_path)
+        os.replace(temp_path, path)
+    except Exception:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
+
+    return {
+        'original_size': original_size,
+        'file_size': file_size,
+        'width': width,
+        'height': height,
+        'checksum': hash_file(path),
+    }
@@ -0,0 +1,180 @@
+"""
+Incremental index of which content references which media files.
+
+Every save of an indexed model re-parses only that object, diffs the paths
+it references against the stored ``MediaReference`` rows and applies the
+difference. ``MediaFile.usage_count`` is then recomputed for the affected
+files with a single set-based UPDATE.
+"""
+import re
+from urllib.parse import unquote, urlsplit
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+# Models whose content can reference media, mapped to (field, kind) pairs.
+# "html" fields are scanned for MEDIA_URL links, "file" fields hold a path.
+INDEXED_FIELDS = {
+    'pages.page': [('content', 'html'), ('featured_image', 'file')],
+    'pages.pageblock': [('content', 'html')],
+    'pages.pageimage': [('image', 'file')],
+    'templates.layoutcomponent': [('html_content', 'html')],
+}
+
+URL_ATTR_RE = re.compile(
+    r"""(?:src|href|poster|data-src)\s*=\s*["']([^"']+)["']"""
+    r"""|srcset\s*=\s*["']([^"']+)["']"""
+    r"""|url\(\s*["']?([^"')]+)["']?\s*\)""",
+    re.IGNORECASE,
+)
+
+
+def _media_path_from_url(url):
+    """Turn a URL into a path relative to MEDIA_ROOT, or None if it isn't media."""
+    path = unquote(urlsplit(url.strip()).path)
+    if not path.startswith(settings.MEDIA_URL):
+        return None
+    path = path[len(settings.MEDIA_URL):].lstrip('/')
+    return path[:255] or None
+
+
+def extract_media_paths(html):
+    """Return the set of media paths linked from an HTML fragment."""
+    paths = set()
+    if not html:
+        return paths
+    for src, srcset, css_url in URL_ATTR_RE.findall(html):
+        candidates = [src, css_url]
+        if srcset:
+            candidates.extend(part.strip().split(' ')[0] for part in srcset.split(','))
+        for url in candidates:
+            path = _media_path_from_url(url) if url else None
+            if path:
+                paths.add(path)
+    return paths
+
+
+def collect_references(instance):
+    """Return ``{(field, path)}`` for everything an object references."""
+    refs = set()
+    for field_name, kind in INDEXED_FIELDS.get(instance._meta.label_lower, []):
+        value = getattr(instance, field_name)
+        if kind == 'html':
+            refs.update((field_name, path) for path in extract_media_paths(value))
+        elif value and value.name:
+            refs.add((field_name, value.name))
+    return refs
+
+
+def refresh_usage_counts(media_file_ids=None):
+    """
+    Set usage_count to the number of references for the given files,
+    or for every file when ``media_file_ids`` is None.
+    """
+    from .models import MediaFile, MediaReference
+
+    if media_file_ids is not None and not media_file_ids:
+        return
+    ref_counts = (
+        MediaReference.objects.filter(media_file=OuterRef('pk'))
+        .order_by()
+        .values('media_file')
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    files = MediaFile.objects.all()
+    if media_file_ids is not None:
+        files = files.filter(pk__in=media_file_ids)
+    files.update(usage_count=Coalesce(Subquery(ref_counts), Value(0)))
+
+
+def index_object(instance):
+    """Bring the stored references for one object in line with its content."""
+    from .models import MediaFile, MediaReference
+
+    content_type = ContentType.objects.get_for_model(instance)
+    existing = {
+        (ref.field, ref.path): ref
+        for ref in MediaReference.objects.filter(content_type=content_type, object_id=instance.pk)
+    }
+    wanted = collect_references(instance)
+    stale = [ref for key, ref in existing.items() if key not in wanted]
+    added = wanted - existing.keys()
+    if not stale and not added:
+        return
+
+    with transaction.atomic():
+        affected = {ref.media_file_id for ref in stale if ref.media_file_id}
+        if stale:
+            MediaReference.objects.filter(pk__in=[ref.pk for ref in stale]).delete()
+        if added:
+            file_ids = dict(
+                MediaFile.objects.filter(file__in={path for _, path in added}).values_list('file', 'pk')
+            )
+            MediaReference.objects.bulk_create([
+                MediaReference(
+                    path=path,
+                    media_file_id=file_ids.get(path),
+                    content_type=content_type,
+                    object_id=instance.pk,
+                    field=field_name,
+                )
+                for field_name, path in added
+            ])
+            affected.update(file_ids.values())
+        refresh_usage_counts(affected)
+
+
+def unindex_object(instance):
+    """Drop all references held by an object that is being deleted."""
+    from .models import MediaReference
+
+    content_type = ContentType.objects.get_for_model(instance)
+    refs = MediaReference.objects.filter(content_type=content_type, object_id=instance.pk)
+    affected = set(refs.exclude(media_file=None).values_list('media_file_id', flat=True))
+    refs.delete()
+    refresh_usage_counts(affected)
+
+
+def link_media_file(media_file):
+    """Attach references recorded before the file existed (or after it moved)."""
+    from .models import MediaReference
+
+    refs = MediaReference.objects.filter(media_file=media_file).exclude(path=media_file.file.name)
+    affected = {media_file.pk} if refs.update(media_file=None) else set()
+    if media_file.file and MediaReference.objects.filter(
+        path=media_file.file.name
+    ).exclude(media_file=media_file).update(media_file=media_file):
+        affected.add(media_file.pk)
+    refresh_usage_counts(affected)
+
+
+def link_new_files(media_files):
+    """
+    Bulk version of ``link_media_file`` for freshly inserted files.
+
+    ``bulk_create`` skips post_save, so importers call this once per batch.
+    """
+    from .models import MediaReference
+
+    file_ids = {media_file.file.name: media_file.pk for media_file in media_files if media_file.pk}
+    if not file_ids:
+        return
+    unlinked = MediaReference.objects.filter(path__in=file_ids, media_file=None)
+    affected = set()
+    for path in set(unlinked.values_list('path', flat=True)):
+        MediaReference.objects.filter(path=path, media_file=None).update(media_file_id=file_ids[path])
+        affected.add(file_ids[path])
+    refresh_usage_counts(affected)
+
+
+def referencing_objects(media_file):
+    """Yield the objects that reference a media file."""
+    for ref in media_file.references.select_related('content_type'):
+        source = ref.source
+        if source is not None:
+            yield source
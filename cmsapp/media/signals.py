@@ -0,0 +1,77 @@
+from django.apps import apps
+from django.db.models.signals import m2m_changed, post_save, post_delete
+from django.dispatch import receiver
+from .galleries import forget_manifest, schedule_manifest_rebuild
+from .models import MediaFile, MediaGallery, MediaGalleryItem
+from .references import INDEXED_FIELDS, index_object, unindex_object, link_media_file
+
+
+def update_media_references(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Re-index the media paths an object references after it is saved."""
+    if raw:
+        return
+    indexed = {field for field, _ in INDEXED_FIELDS[sender._meta.label_lower]}
+    if update_fields is not None and not indexed.intersection(update_fields):
+        return
+    index_object(instance)
+
+
+def remove_media_references(sender, instance, **kwargs):
+    """Drop an object's media references when it is deleted."""
+    unindex_object(instance)
+
+
+for label in INDEXED_FIELDS:
+    model = apps.get_model(label)
+    post_save.connect(update_media_references, sender=model, dispatch_uid=f'media_refs_save_{label}')
+    post_delete.connect(remove_media_references, sender=model, dispatch_uid=f'media_refs_delete_{label}')
+
+
+@receiver(post_save, sender=MediaFile)
+def link_media_references(sender, instance, raw=False, update_fields=None, **kwargs):
+    """Point existing references at a file once it is uploaded or moved."""
+    if raw or (update_fields is not None and 'file' not in update_fields):
+        return
+    link_media_file(instance)
+
+
+@receiver(post_save, sender=MediaGallery)
+def rebuild_gallery_manifest(sender, instance, raw=False, **kwargs):
+    """Keep the gallery's manifest in step with its name and description."""
+    if not raw:
+        schedule_manifest_rebuild([instance.pk])
+
+
+@receiver(post_delete, sender=MediaGallery)
+def drop_gallery_manifest(sender, instance, **kwargs):
+    forget_manifest(instance.domain_id, instance.slug)
+
+
+@receiver(post_save, sender=MediaGalleryItem)
+@receiver(post_delete, sender=MediaGalleryItem)
+def rebuild_manifest_for_item(sender, instance, raw=False, **kwargs):
+    """Rebuild after a file is added, moved or removed."""
+    if not raw:
+        schedule_manifest_rebuild([instance.gallery_id])
+
+
+@receiver(m2m_changed, sender=MediaGallery.files.through)
+def rebuild_manifest_for_files(sender, instance, action, reverse, pk_set, **kwargs):
+    """Catch ``gallery.files.add()/remove()/clear()`` from either side."""
+    if action == 'pre_clear' and reverse:
+        # pk_set is not provided for clear(), so note the galleries first.
+        instance._cleared_gallery_ids = list(instance.gallery_items.values_list('gallery_id', flat=True))
+    elif action in ('post_add', 'post_remove'):
+        schedule_manifest_rebuild(pk_set if reverse else [instance.pk])
+    elif action == 'post_clear':
+        schedule_manifest_rebuild(instance._cleared_gallery_ids if reverse else [instance.pk])
+
+
+@receiver(post_save, sender=MediaFile)
+def rebuild_manifests_for_file(sender, instance, created=False, raw=False, **kwargs):
+    """A file's title, alt text or URL appears in every gallery holding it."""
+    if raw or created:
+        return
+    schedule_manifest_rebuild(
+        MediaGalleryItem.objects.filter(media_file=instance).values_list('gallery_id', flat=True)
+    )
@@ -0,0 +1,19 @@
+from django import template
+from ..galleries import get_gallery_manifest
+
+register = template.Library()
+
+
+@register.inclusion_tag('media/gallery_embed.html', takes_context=True)
+def media_gallery(context, slug, domain=None):
+    """
+    Render a gallery of the current domain from its cached manifest.
+
+    Usage: {% load media_tags %}{% media_gallery "summer-2026" %}
+    """
+    if domain is None:
+        request = context.get('request')
+        domain = getattr(request, 'domain', None)
+    domain_id = getattr(domain, 'pk', domain)
+    manifest = get_gallery_manifest(domain_id, slug) if domain_id else None
+    return {'gallery': manifest}
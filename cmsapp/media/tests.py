@@ -0,0 +1,1133 @@
+import hashlib
+import io
+import os
+import shutil
+import struct
+import tempfile
+import time
+import zipfile
+import zlib
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.core.management import call_command
+from django.db import DatabaseError
+from django.template import Context, Template
+from django.test import TestCase, Client, RequestFactory, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from cmsapp.domains.models import Domain
+from cmsapp.pages.models import Page, PageBlock
+from .avprobe import probe_av
+from .counters import usage_buffer
+from .documents import extract_text
+from .galleries import get_gallery_manifest
+from .jobs import claim_job, release_stale_jobs, run_job
+from .management.commands.media_worker import Worker
+from .models import (
+    MediaFile, MediaFolder, MediaGallery, MediaGalleryItem, MediaJob, MediaReference, MediaTag, UploadSession,
+)
+from .references import extract_media_paths, referencing_objects, refresh_usage_counts
+from .views import MediaLibraryView, media_facets
+
+
+class MediaTestCase(TestCase):
+    """Base test case with a throwaway MEDIA_ROOT."""
+
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings_override = override_settings(
+            MEDIA_ROOT=self.media_root,
+            MEDIA_UPLOAD_TEMP_DIR=os.path.join(self.media_root, '.uploads'),
+        )
+        self.settings_override.enable()
+
+    def tearDown(self):
+        self.settings_override.disable()
+        shutil.rmtree(self.media_root, ignore_errors=True)
+
+    def create_file(self, path, content=b'x' * 1000):
+        """Write a file under MEDIA_ROOT and return its storage path."""
+        full_path = os.path.join(self.media_root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        with open(full_path, 'wb') as fh:
+            fh.write(content)
+        return path
+
+
+class ChunkedUploadTestCase(MediaTestCase):
+    """Test cases for the resumable upload endpoint."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.payload = b'0123456789' * 1000
+
+    def _create(self, length=None):
+        response = self.client.post(
+            reverse('media:upload_create'),
+            HTTP_UPLOAD_LENGTH=str(length or len(self.payload)),
+            HTTP_UPLOAD_METADATA='filename ZGF0YS50eHQ=',
+        )
+        self.assertEqual(response.status_code, 201)
+        return response['Location']
+
+    def _patch(self, location, offset, data):
+        return self.client.generic(
+            'PATCH', location, data,
+            content_type='application/offset+octet-stream',
+            HTTP_UPLOAD_OFFSET=str(offset),
+        )
+
+    def test_upload_in_chunks(self):
+        """Chunks are appended at the acknowledged offset and the file is probed at the end."""
+        location = self._create()
+
+        response = self._patch(location, 0, self.payload[:4000])
+        self.assertEqual(response.status_code, 204)
+        self.assertEqual(response['Upload-Offset'], '4000')
+
+        response = self.client.head(location)
+        self.assertEqual(response['Upload-Offset'], '4000')
+
+        response = self._patch(location, 4000, self.payload[4000:])
+        self.assertEqual(response.status_code, 204)
+
+        session = UploadSession.objects.get()
+        self.assertEqual(session.status, 'complete')
+        self.assertEqual(session.filename, 'data.txt')
+        self.assertEqual(session.mime_type, 'text/plain')
+
+    def test_offset_mismatch_is_rejected(self):
+        """A chunk sent for the wrong offset is refused with the server's offset."""
+        location = self._create()
+        self._patch(location, 0, self.payload[:100])
+
+        response = self._patch(location, 50, self.payload[50:200])
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response['Upload-Offset'], '100')
+
+    def test_upload_longer_than_announced_is_rejected(self):
+        location = self._create(length=10)
+        response = self._patch(location, 0, self.payload[:20])
+        self.assertEqual(response.status_code, 413)
+        self.assertEqual(UploadSession.objects.get().offset, 0)
+
+    def test_admin_attaches_finished_upload(self):
+        """Saving the admin form moves the assembled file into the media library."""
+        location = self._create()
+        self._patch(location, 0, self.payload)
+        session = UploadSession.objects.get()
+
+        response = self.client.post(reverse('admin:media_mediafile_add'), {
+            'domain': self.domain.pk,
+            'title': 'Data',
+            'slug': 'data',
+            'upload_session': str(session.pk),
+            'media_type': 'other',
+            'uploaded_by': 'Admin',
+            'usage_count': 0,
+        })
+        self.assertEqual(response.status_code, 302)
+
+        call_command('media_worker', '--once', stdout=StringIO())
+        media_file = MediaFile.objects.get()
+        self.assertEqual(media_file.checksum, hashlib.sha256(self.payload).hexdigest())
+        self.assertEqual(media_file.file_size, len(self.payload))
+        self.assertEqual(media_file.media_type, 'document')
+        self.assertFalse(os.path.exists(session.temp_path))
+
+        session.refresh_from_db()
+        self.assertEqual(session.status, 'attached')
+        self.assertEqual(session.media_file, media_file)
+
+
+@override_settings(MEDIA_ACCEL_REDIRECT=True)
+class MediaServingTestCase(MediaTestCase):
+    """Test cases for domain-scoped media downloads."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.other_domain = Domain.objects.create(name='other.com', title='Other')
+        self.client = Client(HTTP_HOST='example.com')
+
+        self.path = self.create_file('media/example.com/2026/01/clip.mp4')
+        self.media_file = MediaFile.objects.create(domain=self.domain, title='Clip', file=self.path)
+
+    def test_public_file_is_handed_to_nginx(self):
+        response = self.client.get('/media/' + self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/' + self.path)
+        self.assertEqual(response['Accept-Ranges'], 'bytes')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=300')
+        self.assertEqual(response['Content-Type'], 'video/mp4')
+
+        response = self.client.get('/media/' + self.path, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_unchanged_file_revalidates_by_date(self):
+        response = self.client.get('/media/' + self.path)
+        response = self.client.get('/media/' + self.path, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(response.status_code, 304)
+        self.assertNotIn('immutable', response['Cache-Control'])
+
+    def test_file_is_scoped_to_its_domain(self):
+        response = Client(HTTP_HOST='other.com').get('/media/' + self.path)
+        self.assertEqual(response.status_code, 404)
+
+    def test_private_file_requires_staff(self):
+        self.media_file.is_private = True
+        self.media_file.save()
+        self.assertEqual(self.client.get('/media/' + self.path).status_code, 404)
+
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        response = self.client.get('/media/' + self.path)
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_internal_paths_are_not_served(self):
+        self.assertEqual(self.client.get('/media/.uploads/anything.part').status_code, 404)
+        self.assertEqual(self.client.get('/media/../settings.py').status_code, 404)
+
+    @override_settings(MEDIA_ACCEL_REDIRECT=False)
+    def test_range_request_without_nginx(self):
+        response = self.client.get('/media/' + self.path, HTTP_RANGE='bytes=100-199')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response['Content-Range'], 'bytes 100-199/1000')
+        self.assertEqual(len(b''.join(response.streaming_content)), 100)
+
+
+@override_settings(MEDIA_USAGE_FLUSH_INTERVAL=0, MEDIA_USAGE_FLUSH_THRESHOLD=1000)
+class UsageCounterTestCase(TestCase):
+    """Test cases for buffered usage counting."""
+
+    def setUp(self):
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.media_file = MediaFile.objects.create(domain=self.domain, title='Logo')
+        usage_buffer.flush()
+
+    def test_increments_are_buffered_until_flush(self):
+        for _ in range(3):
+            self.media_file.increment_hits()
+
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.hit_count, 0)
+        self.assertEqual(usage_buffer.pending()[self.media_file.pk][0], 3)
+
+        self.assertEqual(usage_buffer.flush(), 1)
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.hit_count, 3)
+        self.assertIsNotNone(self.media_file.last_used)
+
+    def test_flush_adds_to_current_value(self):
+        """Flushing applies a delta, so concurrent writers don't overwrite each other."""
+        self.media_file.increment_hits(2)
+        MediaFile.objects.filter(pk=self.media_file.pk).update(hit_count=10)
+        usage_buffer.flush()
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.hit_count, 12)
+
+    @override_settings(MEDIA_USAGE_FLUSH_THRESHOLD=2)
+    def test_threshold_wakes_flusher(self):
+        """Reaching the threshold signals the flusher; the caller doesn't write."""
+        self.media_file.increment_hits()
+        self.assertFalse(usage_buffer.flush_requested.is_set())
+        self.media_file.increment_hits()
+        self.assertTrue(usage_buffer.flush_requested.is_set())
+        self.assertEqual(MediaFile.objects.get(pk=self.media_file.pk).hit_count, 0)
+
+        usage_buffer.flush()
+        self.assertFalse(usage_buffer.flush_requested.is_set())
+        self.assertEqual(MediaFile.objects.get(pk=self.media_file.pk).hit_count, 2)
+
+    def test_hits_survive_reference_recount(self):
+        """The reference index owns usage_count and leaves hit_count alone."""
+        self.media_file.increment_hits(3)
+        usage_buffer.flush()
+        refresh_usage_counts([self.media_file.pk])
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.hit_count, 3)
+        self.assertEqual(self.media_file.usage_count, 0)
+
+    def test_failed_flush_keeps_deltas(self):
+        self.media_file.increment_hits(2)
+        with mock.patch('cmsapp.media.counters.apply_usage', side_effect=DatabaseError('gone')):
+            with self.assertLogs('cmsapp.media.counters', 'ERROR'):
+                self.assertEqual(usage_buffer.flush(), 0)
+        self.assertEqual(usage_buffer.pending()[self.media_file.pk][0], 2)
+
+
+class MediaReferenceTestCase(MediaTestCase):
+    """Test cases for the media reference index."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.media_file = MediaFile.objects.create(
+            domain=self.domain, title='Hero', file=self.create_file('media/example.com/2026/01/hero.jpg')
+        )
+
+    def test_extract_media_paths(self):
+        html = (
+            '<p><img src="/media/media/example.com/2026/01/hero.jpg?v=2" '
+            'srcset="/media/a.jpg 1x, https://example.com/media/b%20c.jpg 2x">'
+            '<a href="/contact/">Contact</a>'
+            '<div style="background: url(\'/media/bg.png\')"></div></p>'
+        )
+        self.assertEqual(
+            extract_media_paths(html),
+            {'media/example.com/2026/01/hero.jpg', 'a.jpg', 'b c.jpg', 'bg.png'},
+        )
+
+    def test_page_save_maintains_references_and_usage_count(self):
+        page = Page.objects.create(
+            domain=self.domain,
+            title='About',
+            slug='about',
+            content='<img src="/media/media/example.com/2026/01/hero.jpg">',
+        )
+        PageBlock.objects.create(
+            page=page, content='<img src="/media/media/example.com/2026/01/hero.jpg">'
+        )
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.usage_count, 2)
+        self.assertEqual(set(referencing_objects(self.media_file)), {page, page.blocks.get()})
+
+        page.content = '<p>No images</p>'
+        page.save()
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.usage_count, 1)
+
+        page.delete()
+        self.media_file.refresh_from_db()
+        self.assertEqual(self.media_file.usage_count, 0)
+        self.assertFalse(MediaReference.objects.exists())
+
+    def test_reference_recorded_before_upload_is_linked(self):
+        page = Page.objects.create(
+            domain=self.domain, title='News', slug='news',
+            content='<img src="/media/media/example.com/2026/01/later.jpg">',
+        )
+        reference = MediaReference.objects.get()
+        self.assertIsNone(reference.media_file)
+
+        later = MediaFile.objects.create(
+            domain=self.domain, title='Later', file=self.create_file('media/example.com/2026/01/later.jpg')
+        )
+        reference.refresh_from_db()
+        self.assertEqual(reference.media_file, later)
+        self.assertEqual(MediaFile.objects.get(pk=later.pk).usage_count, 1)
+        self.assertEqual(reference.source, page)
+
+
+class OrphanCollectorTestCase(MediaTestCase):
+    """Test cases for the gc_media command."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        week_ago = time.time() - 8 * 86400
+
+        self.kept = self.create_file('media/example.com/2026/01/kept.jpg')
+        MediaFile.objects.create(domain=self.domain, title='Kept', file=self.kept)
+        self.linked = self.create_file('editor-upload.png')
+        Page.objects.create(domain=self.domain, title='Home', slug='home', content='<img src="/media/editor-upload.png">')
+        self.orphan = self.create_file('media/example.com/2026/01/orphan.jpg')
+        self.recent = self.create_file('media/example.com/2026/01/recent.jpg')
+        self.create_file('.uploads/abc.part')
+
+        for path in (self.kept, self.linked, self.orphan, '.uploads/abc.part'):
+            os.utime(os.path.join(self.media_root, path), (week_ago, week_ago))
+
+    def test_report_only_lists_old_unreferenced_files(self):
+        out = StringIO()
+        call_command('gc_media', stdout=out)
+        listed = [line.split('\t')[0] for line in out.getvalue().splitlines() if '\t' in line]
+        self.assertEqual(listed, [self.orphan])
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, self.orphan)))
+
+    def test_quarantine_moves_orphans(self):
+        call_command('gc_media', '--quarantine', '--batch-size', '1', stdout=StringIO())
+        self.assertFalse(os.path.exists(os.path.join(self.media_root, self.orphan)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, '.quarantine', self.orphan)))
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, self.kept)))
+
+
+class MediaTagTestCase(MediaTestCase):
+    """Test cases for tag filtering and library facet counts."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client(HTTP_HOST='example.com')
+        self.client.force_login(self.user)
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.folder = MediaFolder.objects.create(domain=self.domain, name='Photos')
+        self.beach = MediaTag.objects.create(domain=self.domain, name='Beach')
+        self.sunset = MediaTag.objects.create(domain=self.domain, name='Sunset')
+
+        self.first = MediaFile.objects.create(
+            domain=self.domain, title='First', folder=self.folder,
+            file=self.create_file('media/example.com/first.jpg'),
+        )
+        self.first.tags.add(self.beach, self.sunset)
+        self.second = MediaFile.objects.create(
+            domain=self.domain, title='Second',
+            file=self.create_file('media/example.com/second.pdf'),
+        )
+        self.second.tags.add(self.beach)
+
+    def test_tag_slug_is_generated(self):
+        self.assertEqual(self.beach.slug, 'beach')
+
+    def test_facets_count_types_folders_and_tags(self):
+        with self.assertNumQueries(1):
+            facets = media_facets(MediaFile.objects.filter(domain=self.domain))
+        self.assertEqual(facets['type']['image'], ('image', 1))
+        self.assertEqual(facets['type']['document'], ('document', 1))
+        self.assertEqual(facets['folder'][str(self.folder.pk)], ('Photos', 1))
+        self.assertEqual(facets['tag']['beach'], ('Beach', 2))
+        self.assertEqual(facets['tag']['sunset'], ('Sunset', 1))
+
+    def test_library_filters_by_tag(self):
+        response = self.client.get(reverse('media:library'), {'tag': 'sunset'})
+        self.assertEqual(list(response.context['media_files']), [self.first])
+        self.assertEqual(response.context['tag_facets'][0], ('beach', 'Beach', 2))
+
+    def test_search_matches_exact_tag(self):
+        response = self.client.get(reverse('media:library'), {'search': 'Beach'})
+        self.assertEqual(set(response.context['media_files']), {self.first, self.second})
+
+    def test_admin_rejects_tags_of_another_domain(self):
+        other = Domain.objects.create(name='other.com', title='Other')
+        foreign = MediaTag.objects.create(domain=other, name='Foreign')
+        response = self.client.post(reverse('admin:media_mediafile_change', args=[self.second.pk]), {
+            'title': 'Second',
+            'slug': 'second',
+            'media_type': 'document',
+            'uploaded_by': 'Admin',
+            'usage_count': 0,
+            'tags': [self.beach.pk, foreign.pk],
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Tags from another domain: Foreign', response.context['adminform'].form.errors['tags'][0])
+        self.assertEqual(list(self.second.tags.all()), [self.beach])
+
+
+class MediaFolderTreeTestCase(MediaTestCase):
+    """Test cases for the materialized folder paths."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.root = MediaFolder.objects.create(domain=self.domain, name='Site')
+        self.photos = MediaFolder.objects.create(domain=self.domain, name='Photos', parent=self.root)
+        self.events = MediaFolder.objects.create(domain=self.domain, name='Events', parent=self.photos)
+        self.docs = MediaFolder.objects.create(domain=self.domain, name='Docs')
+
+    def test_paths_are_stored_on_create(self):
+        self.assertEqual(self.events.tree_path, f"/{self.root.pk}/{self.photos.pk}/{self.events.pk}/")
+        self.assertEqual(self.events.depth, 2)
+        self.assertEqual(str(self.events), 'Site / Photos / Events')
+
+    def test_ancestors_and_descendants_use_one_query(self):
+        with self.assertNumQueries(1):
+            self.assertEqual(list(self.events.get_ancestors()), [self.root, self.photos])
+        with self.assertNumQueries(1):
+            self.assertEqual(set(self.root.get_descendants()), {self.photos, self.events})
+        self.assertEqual(self.events.get_path(), 'site/photos/events')
+
+    def test_move_and_rename_rewrite_descendants(self):
+        self.photos.parent = self.docs
+        self.photos.name = 'Pictures'
+        self.photos.save()
+
+        self.events.refresh_from_db()
+        self.assertEqual(self.events.tree_path, f"/{self.docs.pk}/{self.photos.pk}/{self.events.pk}/")
+        self.assertEqual(self.events.depth, 2)
+        self.assertEqual(self.events.full_name, 'Docs / Pictures / Events')
+        self.assertEqual(set(self.root.get_descendants()), set())
+
+    def test_cannot_move_into_own_subtree(self):
+        self.root.parent = self.events
+        with self.assertRaises(ValidationError):
+            self.root.clean()
+
+    def test_folder_with_contents_cannot_change_domain(self):
+        other = Domain.objects.create(name='other.com', title='Other')
+        self.photos.domain = other
+        with self.assertRaises(ValidationError):
+            self.photos.clean()
+
+        self.events.parent = None
+        self.events.save()
+        self.events.domain = other
+        self.events.clean()
+
+    def test_parent_must_share_domain(self):
+        other = Domain.objects.create(name='other.com', title='Other')
+        folder = MediaFolder(domain=other, name='Elsewhere', parent=self.root)
+        with self.assertRaises(ValidationError):
+            folder.clean()
+
+    def test_library_lists_subtrees_together(self):
+        """Subfolders follow their parent even when a sibling's name sorts between them."""
+        MediaFolder.objects.create(domain=self.domain, name='Site Archive')
+        request = RequestFactory().get(reverse('media:library'))
+        request.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        request.domain = self.domain
+        view = MediaLibraryView()
+        view.setup(request)
+        view.object_list = view.get_queryset()
+        names = [folder.full_name for folder in view.get_context_data()['folders']]
+        self.assertEqual(names, [
+            'Docs', 'Site', 'Site / Photos', 'Site / Photos / Events', 'Site Archive',
+        ])
+
+    def test_all_files_includes_subfolders(self):
+        nested = MediaFile.objects.create(
+            domain=self.domain, title='Party', folder=self.events,
+            file=self.create_file('media/example.com/party.jpg'),
+        )
+        MediaFile.objects.create(
+            domain=self.domain, title='Manual', folder=self.docs,
+            file=self.create_file('media/example.com/manual.pdf'),
+        )
+        self.assertEqual(list(self.root.get_all_files()), [nested])
+
+
+class ImportMediaTestCase(MediaTestCase):
+    """Test cases for the import_media command."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.source, ignore_errors=True)
+        os.makedirs(os.path.join(self.source, 'Photos', 'Events'))
+        from PIL import Image
+        Image.new('RGB', (800, 600), 'red').save(os.path.join(self.source, 'Photos', 'Events', 'party.jpg'))
+        with open(os.path.join(self.source, 'readme.txt'), 'w') as fh:
+            fh.write('hello')
+        with open(os.path.join(self.source, '.DS_Store'), 'w') as fh:
+            fh.write('junk')
+
+    def import_media(self, source, *args):
+        call_command('import_media', source, '--domain', 'example.com', '--workers', '1', *args,
+                     stdout=StringIO(), stderr=StringIO())
+
+    def test_import_directory(self):
+        self.import_media(self.source, '--folder', 'Old Site')
+
+        party = MediaFile.objects.get(title='party')
+        self.assertEqual(party.folder.full_name, 'Old Site / Photos / Events')
+        self.assertEqual((party.media_type, party.width, party.height), ('image', 800, 600))
+        self.assertEqual(len(party.checksum), 64)
+        self.assertTrue(party.thumbnail)
+        self.assertTrue(os.path.exists(os.path.join(self.media_root, party.thumbnail.name)))
+        readme = MediaFile.objects.get(title='readme')
+        self.assertEqual(readme.folder.name, 'Old Site')
+        self.assertEqual(readme.file.name, 'media/example.com/import/readme.txt')
+        self.assertEqual(MediaFile.objects.count(), 2)
+
+    def test_rerun_skips_imported_files(self):
+        self.import_media(self.source)
+        os.remove(os.path.join(self.media_root, 'media/example.com/import/readme.txt'))
+        MediaFile.objects.filter(title='readme').delete()
+
+        self.import_media(self.source)
+        self.assertEqual(MediaFile.objects.count(), 2)
+        self.assertEqual(MediaFolder.objects.filter(name='Photos').count(), 1)
+
+    def test_import_zip(self):
+        archive = os.path.join(self.source, 'assets.zip')
+        with zipfile.ZipFile(archive, 'w') as zf:
+            zf.writestr('docs/manual.pdf', b'%PDF-1.4 test')
+            zf.writestr('__MACOSX/docs/._manual.pdf', b'junk')
+        self.import_media(archive)
+
+        manual = MediaFile.objects.get()
+        self.assertEqual(manual.folder.name, 'docs')
+        self.assertEqual(manual.media_type, 'document')
+        with manual.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'%PDF-1.4 test')
+
+    def test_names_that_clean_alike_are_numbered(self):
+        for name, body in (('My File.txt', 'first'), ('My_File.txt', 'second')):
+            with open(os.path.join(self.source, name), 'w') as fh:
+                fh.write(body)
+        self.import_media(self.source)
+
+        first = MediaFile.objects.get(file='media/example.com/import/My_File.txt')
+        second = MediaFile.objects.get(file='media/example.com/import/My_File_1.txt')
+        with first.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'first')
+        with second.file.open('rb') as fh:
+            self.assertEqual(fh.read(), b'second')
+
+        self.import_media(self.source)
+        self.assertEqual(MediaFile.objects.count(), 4)
+
+    def test_images_are_optimized(self):
+        domain_settings = self.domain.settings
+        domain_settings.media_max_image_dimension = 400
+        domain_settings.media_keep_original_images = True
+        domain_settings.save()
+        self.import_media(self.source)
+
+        party = MediaFile.objects.get(title='party')
+        self.assertEqual((party.width, party.height), (400, 300))
+        self.assertIsNotNone(party.optimized_at)
+        self.assertEqual(party.original_file.name, 'originals/media/example.com/import/Photos/Events/party.jpg')
+        self.assertTrue(os.path.exists(party.original_file.path))
+        self.assertFalse(MediaJob.objects.exists())
+
+
+class MediaArchiveTestCase(MediaTestCase):
+    """Test cases for streamed ZIP downloads."""
+
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_superuser('admin', 'admin@example.com', 'password')
+        self.client = Client()
+        self.client.force_login(self.user)
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.root = MediaFolder.objects.create(domain=self.domain, name='Site')
+        self.events = MediaFolder.objects.create(domain=self.domain, name='Events', parent=self.root)
+        self.photo = MediaFile.objects.create(
+            domain=self.domain, title='Party', folder=self.events,
+            file=self.create_file('media/example.com/party.jpg', b'\xff\xd8' + b'x' * 5000),
+        )
+        self.notes = MediaFile.objects.create(
+            domain=self.domain, title='Notes', folder=self.root,
+            file=self.create_file('media/example.com/notes.txt', b'note ' * 2000),
+        )
+
+    def read_zip(self, response):
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Type'], 'application/zip')
+        return zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content)))
+
+    def test_folder_download_includes_subfolders(self):
+        response = self.client.get(reverse('media:download_folder', args=[self.root.pk]))
+        archive = self.read_zip(response)
+        self.assertEqual(sorted(archive.namelist()), ['Site/Events/party.jpg', 'Site/notes.txt'])
+        self.assertEqual(archive.getinfo('Site/Events/party.jpg').compress_type, zipfile.ZIP_STORED)
+        self.assertEqual(archive.getinfo('Site/notes.txt').compress_type, zipfile.ZIP_DEFLATED)
+        self.assertEqual(archive.read('Site/notes.txt'), b'note ' * 2000)
+        self.assertIsNone(archive.testzip())
+
+    def test_gallery_download(self):
+        gallery = MediaGallery.objects.create(name='Highlights')
+        gallery.files.add(self.photo, self.notes)
+        response = self.client.get(reverse('media:download_gallery', args=[gallery.pk]))
+        archive = self.read_zip(response)
+        self.assertEqual(sorted(archive.namelist()), ['highlights/notes.txt', 'highlights/party.jpg'])
+
+    def test_admin_action_streams_zip(self):
+        response = self.client.post(reverse('admin:media_mediafolder_changelist'), {
+            'action': 'download_zip',
+            '_selected_action': [self.events.pk],
+        })
+        archive = self.read_zip(response)
+        self.assertEqual(archive.namelist(), ['Events/party.jpg'])
+
+
+class ImageOptimizationTestCase(MediaTestCase):
+    """Test cases for the image optimization stage."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.domain_settings = self.domain.settings
+        self.domain_settings.media_max_image_dimension = 1000
+        self.domain_settings.save()
+
+    def camera_jpeg(self, path, size=(1600, 1200)):
+        """Write a JPEG with EXIF orientation (rotate 90) and a GPS tag."""
+        from PIL import Image
+        exif = Image.Exif()
+        exif[0x0112] = 6
+        exif[0x010F] = 'CameraMaker'
+        full_path = os.path.join(self.media_root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        Image.new('RGB', size, 'green').save(full_path, 'JPEG', quality=95, exif=exif)
+        return path
+
+    def upload(self, path='media/photo.jpg'):
+        """Create a media file from a camera JPEG and let the worker process it."""
+        media_file = MediaFile.objects.create(domain=self.domain, title='Photo', file=self.camera_jpeg(path))
+        call_command('media_worker', '--once', stdout=StringIO())
+        media_file.refresh_from_db()
+        return media_file
+
+    def test_upload_is_rotated_capped_and_stripped(self):
+        from PIL import Image
+        media_file = self.upload()
+
+        self.assertIsNotNone(media_file.optimized_at)
+        self.assertEqual((media_file.width, media_file.height), (750, 1000))
+        self.assertGreater(media_file.bytes_saved, 0)
+        with Image.open(media_file.file.path) as image:
+            self.assertEqual(image.size, (750, 1000))
+            self.assertFalse(image.getexif())
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.file_size, os.path.getsize(media_file.file.path))
+        self.assertFalse(media_file.original_file)
+
+    def test_original_is_kept_when_configured(self):
+        self.domain_settings.media_keep_original_images = True
+        self.domain_settings.save()
+        media_file = self.upload()
+
+        self.assertEqual(media_file.original_file.name, 'originals/media/photo.jpg')
+        self.assertEqual(os.path.getsize(media_file.original_file.path), media_file.original_size)
+
+    def test_replaced_image_is_optimized_again(self):
+        media_file = self.upload()
+        media_file.file = self.camera_jpeg('media/replacement.jpg', size=(2400, 1800))
+        media_file.save()
+        self.assertIsNone(media_file.optimized_at)
+        self.assertIsNone(media_file.original_size)
+
+        call_command('media_worker', '--once', stdout=StringIO())
+        media_file.refresh_from_db()
+        self.assertIsNotNone(media_file.optimized_at)
+        self.assertEqual((media_file.width, media_file.height), (750, 1000))
+
+    def test_backfill_command(self):
+        self.upload()
+        MediaFile.objects.update(optimized_at=None)
+        self.domain_settings.media_max_image_dimension = 500
+        self.domain_settings.save()
+
+        out = StringIO()
+        call_command('optimize_media', '--workers', '1', stdout=out)
+        media_file = MediaFile.objects.get()
+        self.assertIsNotNone(media_file.optimized_at)
+        self.assertEqual((media_file.width, media_file.height), (375, 500))
+        self.assertIn('Optimized 1 images', out.getvalue())
+
+
+class MediaJobTestCase(MediaTestCase):
+    """Test cases for background media processing."""
+
+    def setUp(self):
+        super().setUp()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+
+    def png(self, path, size=(800, 600)):
+        from PIL import Image
+        full_path = os.path.join(self.media_root, path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        Image.new('RGB', size, 'blue').save(full_path, 'PNG')
+        return path
+
+    def test_upload_is_queued_then_processed(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        self.assertEqual(media_file.processing_status, 'pending')
+        self.assertIsNone(media_file.width)
+        self.assertEqual(MediaJob.objects.filter(media_file=media_file, status='queued').count(), 1)
+
+        out = StringIO()
+        call_command('media_worker', '--once', stdout=out)
+        self.assertIn('Processed 1 media jobs', out.getvalue())
+
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.processing_status, 'ready')
+        self.assertEqual((media_file.width, media_file.height), (800, 600))
+        self.assertEqual(len(media_file.checksum), 64)
+        self.assertTrue(media_file.thumbnail.name.endswith('chart.jpg'))
+        self.assertTrue(os.path.exists(media_file.thumbnail.path))
+        self.assertFalse(MediaJob.objects.exists())
+
+    @mock.patch('cmsapp.media.management.commands.media_worker.close_old_connections')
+    def test_only_the_polling_loop_recycles_connections(self, close_old_connections):
+        call_command('media_worker', '--once', stdout=StringIO())
+        close_old_connections.assert_not_called()
+
+        worker = Worker('worker-1', poll_interval=0)
+        with mock.patch('cmsapp.media.management.commands.media_worker.time.sleep', side_effect=worker.stop):
+            worker.run()
+        close_old_connections.assert_called_once_with()
+
+    def test_claim_marks_job_running(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        job = claim_job('worker-1')
+
+        self.assertEqual((job.status, job.attempts, job.locked_by), ('running', 1, 'worker-1'))
+        self.assertIsNone(claim_job('worker-2'))
+        media_file.refresh_from_db()
+        self.assertEqual(media_file.processing_status, 'processing')
+
+    @override_settings(MEDIA_JOB_MAX_ATTEMPTS=2)
+    def test_failures_are_retried_with_backoff(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Gone', file=self.png('media/gone.png'))
+        os.remove(media_file.file.path)
+
+        job = claim_job('worker-1')
+        self.assertFalse(run_job(job))
+        job.refresh_from_db()
+        self.assertEqual(job.status, 'queued')
+        self.assertGreater(job.run_after, timezone.now())
+        self.assertIn('FileNotFoundError', job.last_error)
+        # Not due yet
+        self.assertIsNone(claim_job('worker-1'))
+
+        MediaJob.objects.update(run_after=timezone.now())
+        self.assertFalse(run_job(claim_job('worker-1')))
+        job.refresh_from_db()
+        media_file.refresh_from_db()
+        self.assertEqual(job.status, 'failed')
+        self.assertEqual(media_file.processing_status, 'failed')
+        self.assertIn('missing from storage', media_file.processing_error)
+
+    def test_stale_running_jobs_are_requeued(self):
+        MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        claim_job('worker-1')
+        MediaJob.objects.update(locked_at=timezone.now() - timedelta(hours=1))
+
+        self.assertEqual(release_stale_jobs(), 1)
+        self.assertEqual(claim_job('worker-2').attempts, 2)
+
+    def test_placeholder_colour(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        call_command('media_worker', '--once', stdout=StringIO())
+        media_file.refresh_from_db()
+
+        # Read from the JPEG thumbnail, so allow for compression error
+        self.assertRegex(media_file.placeholder_color, r'^#0000f[0-9a-f]$')
+        self.assertEqual(
+            media_file.placeholder_style,
+            f'background-color: {media_file.placeholder_color}; aspect-ratio: 800 / 600;'
+        )
+
+    def test_page_images_get_placeholders(self):
+        from django.core.files.uploadedfile import SimpleUploadedFile
+        from PIL import Image
+        buffer = io.BytesIO()
+        Image.new('RGB', (300, 200), (200, 10, 10)).save(buffer, 'PNG')
+        page = Page.objects.create(
+            domain=self.domain, title='About',
+            featured_image=SimpleUploadedFile('hero.png', buffer.getvalue(), 'image/png'),
+        )
+
+        self.assertEqual((page.featured_image_width, page.featured_image_height), (300, 200))
+        self.assertEqual(page.featured_image_color, '#c80a0a')
+        page.featured_image = None
+        page.save()
+        self.assertEqual(page.featured_image_style, '')
+
+    def test_page_image_is_decoded_only_when_it_changes(self):
+        self.create_file('pages/featured/broken.png', b'not an image')
+        with mock.patch('cmsapp.pages.models.image_placeholder', return_value=None) as placeholder:
+            page = Page.objects.create(domain=self.domain, title='About', featured_image='pages/featured/broken.png')
+            page.save()
+            Page.objects.get(pk=page.pk).save()
+        self.assertEqual(placeholder.call_count, 1)
+        self.assertEqual(page.featured_image_color, '')
+
+    def test_import_computes_placeholders(self):
+        source = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, source, ignore_errors=True)
+        shutil.copy(os.path.join(self.media_root, self.png('media/chart.png')), os.path.join(source, 'chart.png'))
+        call_command('import_media', source, '--domain', self.domain.name, '--workers', '1',
+                     stdout=StringIO(), stderr=StringIO())
+
+        media_file = MediaFile.objects.get(file='media/example.com/import/chart.png')
+        self.assertRegex(media_file.placeholder_color, r'^#0000f[0-9a-f]$')
+
+    def test_backfill_placeholders(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        out = StringIO()
+        call_command('compute_placeholders', stdout=out)
+
+        media_file.refresh_from_db()
+        self.assertRegex(media_file.placeholder_color, r'^#0000f[0-9a-f]$')
+        self.assertEqual((media_file.width, media_file.height), (800, 600))
+        self.assertIn('Computed 1 placeholders', out.getvalue())
+
+    @override_settings(MEDIA_ASYNC_PROCESSING=False)
+    def test_inline_processing(self):
+        media_file = MediaFile.objects.create(domain=self.domain, title='Chart', file=self.png('media/chart.png'))
+        self.assertEqual(media_file.processing_status, 'ready')
+        self.assertEqual(media_file.width, 800)
+        self.assertFalse(MediaJob.objects.exists())
+
+
+def box(box_type, *children):
+    """Build an MP4 box from its type and body parts."""
+    body = b''.join(children)
+    return struct.pack('>I4s', len(body) + 8, box_type) + body
+
+
+def ebml(element_id, body):
+    """Build an EBML element with an 8-byte size."""
+    id_bytes = element_id.to_bytes((element_id.bit_length() + 7) // 8, 'big')
+    return id_bytes + (0x01 << 56 | len(body)).to_bytes(8, 'big') + body
+
+
+class AVProbeTestCase(MediaTestCase):
+    """Test cases for the pure-Python audio and video probe."""
+
+    def write(self, name, data):
+        return os.path.join(self.media_root, self.create_file(f'media/{name}', data))
+
+    def test_mp4_with_moov_at_end(self):
+        # Rotation matrix for 90 degrees: a=0, b=1, c=-1, d=0
+        matrix = struct.pack('>9i', 0, 0x10000, 0, -0x10000, 0, 0, 0, 0, 0x40000000)
+        tkhd = box(b'tkhd', bytes(24), bytes(16), matrix, struct.pack('>II', 1920 << 16, 1080 << 16))
+        hdlr = box(b'hdlr', bytes(8), b'vide', bytes(12))
+        stsd = box(b'stsd', bytes(4), struct.pack('>I', 1), box(b'avc1', bytes(78)))
+        mdia = box(b'mdia', hdlr, box(b'minf', box(b'stbl', stsd)))
+        mvhd = box(b'mvhd', bytes(12), struct.pack('>II', 1000, 5000), bytes(80))
+        data = box(b'ftyp', b'isom', bytes(4)) + box(b'mdat', bytes(20000)) + box(b'moov', mvhd, box(b'trak', tkhd, mdia))
+
+        info = probe_av(self.write('clip.mp4', data))
+        self.assertEqual(info['duration'], 5.0)
+        self.assertEqual((info['width'], info['height']), (1080, 1920))
+        self.assertEqual(info['codec'], 'avc1')
+        self.assertEqual(info['bitrate'], len(data) * 8 // 5)
+
+    def test_webm(self):
+        info_element = ebml(0x1549A966, ebml(0x2AD7B1, (1000000).to_bytes(3, 'big')) + ebml(0x4489, struct.pack('>d', 2500.0)))
+        video = ebml(0xE0, ebml(0xB0, (640).to_bytes(2, 'big')) + ebml(0xBA, (360).to_bytes(2, 'big')))
+        tracks = ebml(0x1654AE6B, ebml(0xAE, ebml(0x83, b'\x01') + ebml(0x86, b'V_VP9') + video))
+        segment = b'\x18\x53\x80\x67' + b'\x01\xff\xff\xff\xff\xff\xff\xff' + info_element + tracks
+        data = ebml(0x1A45DFA3, ebml(0x4282, b'webm')) + segment
+
+        info = probe_av(self.write('clip.webm', data))
+        self.assertEqual(info['duration'], 2.5)
+        self.assertEqual((info['width'], info['height']), (640, 360))
+        self.assertEqual(info['codec'], 'V_VP9')
+
+    def test_mp3_constant_bitrate(self):
+        # MPEG-1 Layer III, 128 kbit/s, 44.1 kHz, after an empty ID3v2 tag
+        frame = b'\xff\xfb\x90\x00' + bytes(413)
+        data = b'ID3\x04\x00\x00\x00\x00\x00\x00' + frame * 100
+
+        info = probe_av(self.write('song.mp3', data))
+        self.assertEqual(info['bitrate'], 128000)
+        self.assertAlmostEqual(info['duration'], len(frame) * 100 * 8 / 128000)
+
+    def test_mp3_xing_header(self):
+        xing = b'Xing' + struct.pack('>II', 1, 1000)
+        first = b'\xff\xfb\x90\x00' + bytes(32) + xing
+        data = first + bytes(417 - len(first)) + b'\xff\xfb\x90\x00' + bytes(413)
+
+        info = probe_av(self.write('song.mp3', data))
+        self.assertAlmostEqual(info['duration'], 1000 * 1152 / 44100)
+
+    def test_wav(self):
+        import wave
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(8000)
+            wav.writeframes(bytes(16000))
+
+        info = probe_av(self.write('clip.wav', buffer.getvalue()))
+        self.assertEqual(info['duration'], 1.0)
+        self.assertEqual(info['bitrate'], 128000)
+        self.assertEqual(info['codec'], 'pcm')
+
+    def test_flac(self):
+        packed = (44100 << 44) | (1 << 41) | (15 << 36) | 441000
+        streaminfo = bytes(10) + packed.to_bytes(8, 'big') + bytes(16)
+        data = b'fLaC' + bytes([0x80]) + len(streaminfo).to_bytes(3, 'big') + streaminfo + bytes(1000)
+
+        info = probe_av(self.write('clip.flac', data))
+        self.assertEqual(info['duration'], 10.0)
+        self.assertEqual(info['codec'], 'flac')
+
+    def test_unknown_and_truncated_files(self):
+        self.assertIsNone(probe_av(self.write('notes.mp4', b'plain text')))
+        self.assertIsNone(probe_av(self.write('cut.mp4', box(b'ftyp', b'isom')[:10])))
+
+    def test_worker_stores_av_metadata(self):
+        import wave
+        domain = Domain.objects.create(name='example.com', title='Example')
+        buffer = io.BytesIO()
+        with wave.open(buffer, 'wb') as wav:
+            wav.setnchannels(2)
+            wav.setsampwidth(2)
+            wav.setframerate(44100)
+            wav.writeframes(bytes(44100 * 4 * 90))
+        media_file = MediaFile.objects.create(
+            domain=domain, title='Interview', file=self.create_file('media/interview.wav', buffer.getvalue()),
+        )
+        call_command('media_worker', '--once', stdout=StringIO())
+        media_file.refresh_from_db()
+
+        self.assertEqual(media_file.media_type, 'audio')
+        self.assertEqual(media_file.get_duration_display(), '1:30')
+        self.assertEqual(media_file.get_bitrate_display(), '1.4 Mbit/s')
+
+
+class DocumentTextTestCase(MediaTestCase):
+    """Test cases for document text extraction and search."""
+
+    def write(self, name, data):
+        return os.path.join(self.media_root, self.create_file(f'media/{name}', data))
+
+    def ooxml(self, name, members):
+        buffer = io.BytesIO()
+        with zipfile.ZipFile(buffer, 'w') as archive:
+            for member, xml in members.items():
+                archive.writestr(member, xml)
+        return self.write(name, buffer.getvalue())
+
+    def test_docx(self):
+        ns = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+        xml = (
+            f'<w:document {ns}><w:body>'
+            '<w:p><w:r><w:t>Quarterly</w:t></w:r><w:r><w:t xml:space="preserve"> invoice</w:t></w:r></w:p>'
+            '<w:p><w:r><w:t>Second paragraph</w:t></w:r></w:p>'
+            '</w:body></w:document>'
+        )
+        path = self.ooxml('report.docx', {'word/document.xml': xml})
+        self.assertEqual(extract_text(path, 'docx'), 'Quarterly invoice\nSecond paragraph')
+
+    def test_xlsx_and_pptx(self):
+        ns = 'xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"'
+        path = self.ooxml('sheet.xlsx', {
+            'xl/sharedStrings.xml': f'<sst {ns}><si><t>Region</t></si><si><t>North</t></si></sst>',
+        })
+        self.assertEqual(extract_text(path, 'xlsx'), 'Region\nNorth')
+
+        ns = 'xmlns:a="http://schemas.openxmlformats.org/drawingml/2006/main"'
+        path = self.ooxml('deck.pptx', {
+            'ppt/slides/slide10.xml': f'<p {ns}><a:p><a:r><a:t>Last</a:t></a:r></a:p></p>',
+            'ppt/slides/slide2.xml': f'<p {ns}><a:p><a:r><a:t>First</a:t></a:r></a:p></p>',
+        })
+        self.assertEqual(extract_text(path, 'pptx'), 'First\nLast')
+
+    def test_csv_and_size_cap(self):
+        path = self.write('data.csv', b'name,city\nAda,London\n')
+        self.assertEqual(extract_text(path, 'csv'), 'name city\nAda London')
+
+        path = self.write('long.txt', b'word ' * 10000)
+        self.assertEqual(len(extract_text(path, 'txt', max_chars=100)), 99)
+        self.assertEqual(extract_text(path, 'txt', max_bytes=10), 'word word')
+
+    def test_pdf(self):
+        content = b'BT /F1 12 Tf 72 720 Td (Hello \\(PDF\\)) Tj T* [(Wor) -20 (ld) -500 (again)] TJ ET'
+        compressed = zlib.compress(content)
+        data = (
+            b'%%PDF-1.4\n1 0 obj\n<< /Length %d /Filter /FlateDecode >>\nstream\n' % len(compressed)
+            + compressed + b'\nendstream\nendobj\n'
+            + b'2 0 obj\n<< /Subtype /Image /Length 4 >>\nstream\nBT()\nendstream\nendobj\n%%EOF'
+        )
+        path = self.write('letter.pdf', data)
+        self.assertEqual(extract_text(path, 'pdf'), 'Hello (PDF)\nWorld again')
+
+    def test_broken_files_yield_no_text(self):
+        self.assertEqual(extract_text(self.write('broken.docx', b'not a zip'), 'docx'), '')
+        self.assertEqual(extract_text(self.write('photo.jpg', b'x'), 'jpg'), '')
+
+    def test_worker_indexes_documents_for_search(self):
+        client = Client(HTTP_HOST='example.com')
+        client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'password'))
+        domain = Domain.objects.create(name='example.com', title='Example')
+        notes = MediaFile.objects.create(
+            domain=domain, title='Notes', file=self.create_file('media/notes.txt', b'The supplier invoices are overdue.'),
+        )
+        MediaFile.objects.create(domain=domain, title='Other', file=self.create_file('media/other.txt', b'Nothing here'))
+        library = reverse('media:library')
+        # Only the extracted text mentions invoices
+        self.assertEqual(list(client.get(library, {'search': 'invoices'}).context['media_files']), [])
+        self.assertEqual(len(client.get(library).context['media_files']), 2)
+
+        call_command('media_worker', '--once', stdout=StringIO())
+        notes.refresh_from_db()
+        self.assertEqual(notes.content_text, 'The supplier invoices are overdue.')
+        response = client.get(library, {'search': 'invoices'})
+        self.assertEqual(list(response.context['media_files']), [notes])
+
+    def test_index_documents_command(self):
+        domain = Domain.objects.create(name='example.com', title='Example')
+        MediaFile.objects.create(domain=domain, title='Notes', file=self.create_file('media/notes.txt', b'text'))
+        MediaJob.objects.all().delete()
+
+        out = StringIO()
+        call_command('index_documents', stdout=out)
+        self.assertIn('Queued 1 documents', out.getvalue())
+        self.assertEqual(MediaJob.objects.count(), 1)
+
+    def test_documents_without_text_are_not_requeued(self):
+        domain = Domain.objects.create(name='example.com', title='Example')
+        empty = MediaFile.objects.create(domain=domain, title='Scan', file=self.create_file('media/scan.txt', b''))
+        call_command('media_worker', '--once', stdout=StringIO())
+        empty.refresh_from_db()
+        self.assertEqual(empty.content_text, '')
+        self.assertIsNotNone(empty.text_extracted_at)
+
+        out = StringIO()
+        call_command('index_documents', stdout=out)
+        self.assertIn('Queued 0 documents', out.getvalue())
+        self.assertFalse(MediaJob.objects.exists())
+
+
+class MediaGalleryManifestTestCase(MediaTestCase):
+    """Test cases for gallery items and cached manifests."""
+
+    def setUp(self):
+        super().setUp()
+        cache.clear()
+        self.domain = Domain.objects.create(name='example.com', title='Example')
+        self.first = MediaFile.objects.create(
+            domain=self.domain, title='First', alt_text='Beach',
+            file=self.create_file('media/example.com/first.bin'),
+        )
+        self.second = MediaFile.objects.create(
+            domain=self.domain, title='Second',
+            file=self.create_file('media/example.com/second.bin'),
+        )
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            self.gallery = MediaGallery.objects.create(domain=self.domain, name='Summer')
+            MediaGalleryItem.objects.create(gallery=self.gallery, media_file=self.second, position=1)
+            MediaGalleryItem.objects.create(gallery=self.gallery, media_file=self.first, position=2)
+        # The gallery and both item saves share one pending rebuild
+        self.assertEqual(len(callbacks), 1)
+
+    def test_slug_is_unique_per_domain(self):
+        other = Domain.objects.create(name='other.com', title='Other')
+        MediaGallery.objects.create(domain=other, name='Summer')
+        self.assertEqual(MediaGallery.objects.filter(slug='summer').count(), 2)
+
+    def test_manifest_follows_positions(self):
+        self.gallery.refresh_from_db()
+        self.assertEqual([item['id'] for item in self.gallery.manifest['items']], [self.second.pk, self.first.pk])
+        self.assertEqual(self.gallery.manifest['items'][1]['alt'], 'Beach')
+
+    def test_manifest_is_served_from_cache(self):
+        get_gallery_manifest(self.domain.pk, 'summer')
+        with self.assertNumQueries(0):
+            manifest = get_gallery_manifest(self.domain.pk, 'summer')
+        self.assertEqual(len(manifest['items']), 2)
+
+    def test_file_changes_rebuild_manifest(self):
+        self.first.alt_text = 'Sunset'
+        with self.captureOnCommitCallbacks(execute=True):
+            self.first.save()
+        self.assertEqual(get_gallery_manifest(self.domain.pk, 'summer')['items'][1]['alt'], 'Sunset')
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.gallery.files.remove(self.second)
+        self.assertEqual(len(get_gallery_manifest(self.domain.pk, 'summer')['items']), 1)
+
+    def test_template_tag_renders_manifest(self):
+        request = RequestFactory().get('/')
+        request.domain = self.domain
+        html = Template('{% load media_tags %}{% media_gallery "summer" %}').render(Context({'request': request}))
+        self.assertIn('First', html)
+        self.assertLess(html.index('Second'), html.index('First'))
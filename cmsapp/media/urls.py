@@ -6,4 +6,9 @@ app_name = 'media'
 urlpatterns = [
     path('library/', views.MediaLibraryView.as_view(), name='library'),
     path('library/<int:pk>/', views.MediaFileDetailView.as_view(), name='detail'),
+    path('library/folders/<int:pk>/download/', views.download_folder, name='download_folder'),
+    path('library/galleries/<int:pk>/download/', views.download_gallery, name='download_gallery'),
+    path('uploads/', views.upload_create, name='upload_create'),
+    path('uploads/<uuid:upload_id>/', views.upload_detail, name='upload_detail'),
+    path('<path:path>', views.serve_media, name='serve'),
 ]
@@ -1,8 +1,85 @@
-from django.shortcuts import render
+import base64
+import mimetypes
+import os
+import posixpath
+import re
+import stat
+from urllib.parse import quote
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import CharField, Count, F, Q, Value
+from django.db.models.functions import Cast
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.utils.text import slugify
 from django.views.generic import ListView, DetailView
+from django.views.decorators.http import require_http_methods
 from django.contrib.admin.views.decorators import staff_member_required
 from django.utils.decorators import method_decorator
-from .models import MediaFile, MediaFolder, MediaGallery
+from cmsapp.domains.utils import filter_queryset_by_domain, get_user_domains
+from .archives import folder_entries, gallery_entries, subtree_files, zip_response
+from .documents import document_search_filter
+from .models import MediaFile, MediaFolder, MediaGallery, MediaTag, UploadSession
+
+
+TUS_VERSION = '1.0.0'
+UPLOAD_READ_SIZE = 64 * 1024
+
+# Top-level directories under MEDIA_ROOT that are never served
+MEDIA_INTERNAL_DIRS = {'.uploads', '.quarantine'}
+RANGE_RE = re.compile(r'^bytes=(\d*)-(\d*)$')
+
+
+def media_facets(files):
+    """
+    Count files per media type, folder and tag.
+
+    The three GROUP BYs are combined with UNION ALL so the sidebar costs a
+    single database round trip. Returns ``{'type': {...}, 'folder': {...},
+    'tag': {...}}`` mapping each key to ``(label, count)``.
+    """
+    files = files.order_by()
+    text = CharField()
+    by_type = files.annotate(
+        facet=Value('type', output_field=text),
+        key=F('media_type'),
+        label=F('media_type'),
+    ).values('facet', 'key', 'label').annotate(total=Count('pk'))
+    by_folder = files.exclude(folder=None).annotate(
+        facet=Value('folder', output_field=text),
+        key=Cast('folder_id', text),
+        label=F('folder__name'),
+    ).values('facet', 'key', 'label').annotate(total=Count('pk'))
+    by_tag = files.exclude(tags=None).annotate(
+        facet=Value('tag', output_field=text),
+        key=F('tags__slug'),
+        label=F('tags__name'),
+    ).values('facet', 'key', 'label').annotate(total=Count('pk'))
+
+    facets = {'type': {}, 'folder': {}, 'tag': {}}
+    for row in by_type.union(by_folder, by_tag, all=True):
+        facets[row['facet']][row['key']] = (row['label'], row['total'])
+    return facets
+
+
+def _tree_order(folders):
+    """
+    List folders depth-first, each directly under its parent and siblings by name.
+
+    Sorting happens here on the ancestor names from ``tree_path`` rather
+    than in SQL: locale collations skip the ``/`` separators in
+    ``full_name`` and ``tree_path``, which can split a subtree apart.
+    """
+    folders = list(folders)
+    names = {str(folder.pk): folder.name.lower() for folder in folders}
+    return sorted(folders, key=lambda folder: [
+        (names.get(pk, ''), int(pk)) for pk in folder.tree_path.strip('/').split('/')
+    ])
 
 
 @method_decorator(staff_member_required, name='dispatch')
@@ -26,30 +103,62 @@ class MediaLibraryView(ListView):
         if media_type:
             qs = qs.filter(media_type=media_type)
         
-        # Filter by folder
+        # Filter by folder, including its subfolders
         folder_id = self.request.GET.get('folder')
-        if folder_id:
-            qs = qs.filter(folder_id=folder_id)
+        if folder_id and folder_id.isdigit():
+            tree_path = MediaFolder.objects.filter(pk=folder_id).values_list('tree_path', flat=True).first()
+            qs = qs.filter(folder__tree_path__startswith=tree_path) if tree_path else qs.none()
+        
+        # Filter by tag (exact match on the indexed slug)
+        tag = self.request.GET.get('tag')
+        if tag:
+            qs = qs.filter(tags__slug=tag)
         
         # Search
         search = self.request.GET.get('search')
         if search:
-            qs = qs.filter(title__icontains=search) | qs.filter(tags__icontains=search)
+            tagged = MediaTag.objects.filter(slug=slugify(search)).values('files')
+            qs = qs.filter(Q(title__icontains=search) | Q(pk__in=tagged) | document_search_filter(search))
         
-        return qs.order_by('-uploaded_at')
+        # The extracted text is only needed for searching
+        return qs.defer('content_text', 'search_vector').order_by('-uploaded_at')
     
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
         current_domain = getattr(self.request, 'domain', None)
         
-        # Filter folders by current domain
+        # Filter folders by current domain; the whole tree comes from one query
         if current_domain:
-            context['folders'] = MediaFolder.objects.filter(domain=current_domain)
+            folders = MediaFolder.objects.filter(domain=current_domain)
+            domain_files = MediaFile.objects.filter(domain=current_domain)
         else:
-            context['folders'] = MediaFolder.objects.all()
+            folders = MediaFolder.objects.all()
+            domain_files = MediaFile.objects.all()
+        
+        # Sidebar counts for the whole domain, from a single query
+        facets = media_facets(domain_files)
+        context['type_options'] = [
+            (value, label, facets['type'].get(value, (label, 0))[1])
+            for value, label in MediaFile.MEDIA_TYPES
+        ]
+        # Roll each folder's direct count up into its ancestors, since the
+        # folder filter includes subfolders.
+        subtree_counts = {}
+        context['folders'] = _tree_order(folders)
+        for folder in context['folders']:
+            direct = facets['folder'].get(str(folder.pk), (None, 0))[1]
+            for pk in folder.tree_path.strip('/').split('/'):
+                subtree_counts[pk] = subtree_counts.get(pk, 0) + direct
+        for folder in context['folders']:
+            folder.file_total = subtree_counts.get(str(folder.pk), 0)
+        context['tag_facets'] = sorted(
+            ((slug, label, total) for slug, (label, total) in facets['tag'].items()),
+            key=lambda item: (-item[2], item[1])
+        )
         
         context['current_folder'] = self.request.GET.get('folder')
         context['current_type'] = self.request.GET.get('type')
+        context['current_tag'] = self.request.GET.get('tag', '')
         context['search_query'] = self.request.GET.get('search', '')
         return context
 
@@ -65,7 +174,283 @@ class MediaFileDetailView(DetailView):
         context = super().get_context_data(**kwargs)
         # Get other files in the same folder
         if self.object.folder:
+            context['folder_breadcrumbs'] = self.object.folder.get_ancestors(include_self=True)
             context['related_files'] = MediaFile.objects.filter(
                 folder=self.object.folder
             ).exclude(id=self.object.id)[:6]
         return context
+
+
+@staff_member_required
+def download_folder(request, pk):
+    """Download a folder and everything beneath it as a streamed ZIP."""
+    folder = get_object_or_404(filter_queryset_by_domain(MediaFolder.objects.all(), request.user), pk=pk)
+    files = filter_queryset_by_domain(subtree_files([folder]), request.user)
+    return zip_response(folder_entries([folder], files), f"{folder.slug or folder.pk}.zip")
+
+
+@staff_member_required
+def download_gallery(request, pk):
+    """Download the files of a gallery as a streamed ZIP."""
+    gallery = get_object_or_404(filter_queryset_by_domain(MediaGallery.objects.all(), request.user), pk=pk)
+    return zip_response(gallery_entries([gallery], request.user), f"{gallery.slug or gallery.pk}.zip")
+
+
+def _tus_response(status=204, **headers):
+    """Build an empty response carrying the tus protocol headers."""
+    response = HttpResponse(status=status)
+    response['Tus-Resumable'] = TUS_VERSION
+    response['Cache-Control'] = 'no-store'
+    for name, value in headers.items():
+        response[name.replace('_', '-')] = str(value)
+    return response
+
+
+def _parse_upload_metadata(header):
+    """Decode a tus ``Upload-Metadata`` header into a dict of strings."""
+    metadata = {}
+    for pair in header.split(','):
+        pair = pair.strip()
+        if not pair:
+            continue
+        key, _, value = pair.partition(' ')
+        try:
+            metadata[key] = base64.b64decode(value).decode('utf-8') if value else ''
+        except (ValueError, UnicodeDecodeError):
+            continue
+    return metadata
+
+
+@staff_member_required
+@require_http_methods(["POST", "OPTIONS"])
+def upload_create(request):
+    """
+    Start a resumable upload.
+
+    Follows the tus 1.0 creation extension: the client announces the total
+    size in ``Upload-Length`` and receives the session URL in ``Location``.
+    """
+    if request.method == 'OPTIONS':
+        return _tus_response(
+            Tus_Version=TUS_VERSION,
+            Tus_Extension='creation,termination',
+            Tus_Max_Size=settings.MEDIA_UPLOAD_MAX_SIZE,
+        )
+
+    try:
+        upload_length = int(request.headers.get('Upload-Length', ''))
+    except ValueError:
+        return _tus_response(status=400)
+    if upload_length <= 0:
+        return _tus_response(status=400)
+    if upload_length > settings.MEDIA_UPLOAD_MAX_SIZE:
+        return _tus_response(status=413)
+
+    metadata = _parse_upload_metadata(request.headers.get('Upload-Metadata', ''))
+    filename = os.path.basename(metadata.get('filename', '')) or 'upload'
+
+    session = UploadSession.objects.create(
+        user=request.user,
+        filename=filename[:255],
+        upload_length=upload_length,
+    )
+    os.makedirs(settings.MEDIA_UPLOAD_TEMP_DIR, exist_ok=True)
+    open(session.temp_path, 'wb').close()
+
+    location = reverse('media:upload_detail', args=[session.pk])
+    return _tus_response(status=201, Location=location, Upload_Offset=0)
+
+
+@staff_member_required
+@require_http_methods(["HEAD", "PATCH", "DELETE"])
+def upload_detail(request, upload_id):
+    """Report, extend or cancel a resumable upload."""
+    if request.method == 'HEAD':
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        return _tus_response(
+            status=200,
+            Upload_Offset=session.offset,
+            Upload_Length=session.upload_length,
+        )
+
+    if request.method == 'DELETE':
+        session = get_object_or_404(UploadSession, pk=upload_id, user=request.user)
+        if session.status == 'attached':
+            return _tus_response(status=409)
+        session.discard()
+        return _tus_response()
+
+    if request.content_type != 'application/offset+octet-stream':
+        return _tus_response(status=415)
+    try:
+        client_offset = int(request.headers.get('Upload-Offset', ''))
+    except ValueError:
+        return _tus_response(status=400)
+
+    # The row lock serialises concurrent PATCHes for the same upload, so the
+    # offset check and the append below cannot interleave.
+    with transaction.atomic():
+        session = get_object_or_404(
+            UploadSession.objects.select_for_update(),
+            pk=upload_id,
+            user=request.user,
+        )
+        if session.status != 'uploading' or client_offset != session.offset:
+            return _tus_response(status=409, Upload_Offset=session.offset)
+
+        with open(session.temp_path, 'r+b') as fh:
+            # Drop any bytes a previously interrupted request wrote past the
+            # acknowledged offset before appending.
+            fh.truncate(session.offset)
+            fh.seek(session.offset)
+            received = 0
+            while True:
+                chunk = request.read(UPLOAD_READ_SIZE)
+                if not chunk:
+                    break
+                received += len(chunk)
+                if session.offset + received > session.upload_length:
+                    fh.truncate(session.offset)
+                    return _tus_response(status=413, Upload_Offset=session.offset)
+                fh.write(chunk)
+
+        session.offset += received
+        session.save(update_fields=['offset', 'updated_at'])
+
+        if session.is_complete:
+            session.finalize()
+
+    return _tus_response(Upload_Offset=session.offset)
+
+
+def _media_access(path):
+    """
+    Find the owner of a file under MEDIA_ROOT.
+
+    Returns ``(domain_id, restricted)``. Files that no domain-scoped row
+    points at (editor uploads, logos, stylesheets) are public.
+    """
+    if path.startswith('pages/'):
+        from cmsapp.pages.models import Page, PageImage
+
+        page = Page.objects.filter(featured_image=path).only('domain_id', 'status').first()
+        if page is None:
+            image = PageImage.objects.filter(image=path).select_related('page').only(
+                'page__domain_id', 'page__status'
+            ).first()
+            page = image.page if image else None
+        if page is not None:
+            return page.domain_id, page.status != 'published'
+        return None, False
+
+    # Thumbnails and kept originals share the access rules of their file
+    if path.startswith('thumbnails/'):
+        lookup = {'thumbnail': path}
+    elif path.startswith('originals/'):
+        lookup = {'original_file': path}
+    else:
+        lookup = {'file': path}
+    media_file = MediaFile.objects.filter(**lookup).only('domain_id', 'is_private').first()
+    if media_file is not None:
+        return media_file.domain_id, media_file.is_private
+    return None, False
+
+
+def _has_domain_access(user, domain_id):
+    """Check whether a staff user manages the given domain."""
+    if not (user.is_authenticated and user.is_staff):
+        return False
+    return user.is_superuser or get_user_domains(user).filter(pk=domain_id).exists()
+
+
+def _ranged_file_response(request, full_path, size, content_type):
+    """
+    Serve a file from Python with single byte-range support.
+
+    Only used when nginx is not in front of the app (e.g. runserver); in
+    production the transfer goes through X-Accel-Redirect instead.
+    """
+    match = RANGE_RE.match(request.headers.get('Range', ''))
+    if not match or not any(match.groups()):
+        return FileResponse(open(full_path, 'rb'), content_type=content_type)
+
+    first, last = match.groups()
+    if first:
+        start = int(first)
+        end = min(int(last), size - 1) if last else size - 1
+    else:
+        start = max(size - int(last), 0)
+        end = size - 1
+    if start >= size or start > end:
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f"bytes */{size}"
+        return response
+
+    def read_range(length):
+        with open(full_path, 'rb') as fh:
+            fh.seek(start)
+            while length > 0:
+                chunk = fh.read(min(UPLOAD_READ_SIZE, length))
+                if not chunk:
+                    break
+                length -= len(chunk)
+                yield chunk
+
+    response = StreamingHttpResponse(read_range(end - start + 1), status=206, content_type=content_type)
+    response['Content-Range'] = f"bytes {start}-{end}/{size}"
+    response['Content-Length'] = str(end - start + 1)
+    return response
+
+
+@require_http_methods(["GET", "HEAD"])
+def serve_media(request, path):
+    """
+    Authorise a media download and hand the transfer to nginx.
+
+    Files are scoped to the domain that owns them; private files and images
+    of unpublished pages additionally require a staff user with access to
+    that domain. Unauthorised requests get a 404 so file names don't leak.
+    """
+    path = posixpath.normpath(path).lstrip('/')
+    if path.startswith('..') or path.split('/', 1)[0] in MEDIA_INTERNAL_DIRS:
+        raise Http404
+    try:
+        full_path = safe_join(settings.MEDIA_ROOT, path)
+        st = os.stat(full_path)
+    except (OSError, ValueError):
+        raise Http404
+    if not stat.S_ISREG(st.st_mode):
+        raise Http404
+
+    domain_id, restricted = _media_access(path)
+    if restricted:
+        if not _has_domain_access(request.user, domain_id):
+            raise Http404
+    elif domain_id is not None:
+        current_domain = getattr(request, 'domain', None)
+        if current_domain and current_domain.pk != domain_id and not _has_domain_access(request.user, domain_id):
+            raise Http404
+
+    # Same format nginx uses, so validators agree whichever side answers.
+    etag = f'"{int(st.st_mtime):x}-{st.st_size:x}"'
+    # Media URLs keep their name when the file behind them is replaced, so
+    # caches hold them briefly and then revalidate with ETag/Last-Modified.
+    visibility = 'private' if restricted else 'public'
+    cache_control = f"{visibility}, max-age={settings.MEDIA_CACHE_MAX_AGE}"
+
+    response = get_conditional_response(request, etag=etag, last_modified=int(st.st_mtime))
+    if response is None:
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        if settings.MEDIA_ACCEL_REDIRECT:
+            response = HttpResponse(content_type=content_type)
+            response['X-Accel-Redirect'] = settings.MEDIA_ACCEL_PREFIX + quote(path)
+        else:
+            response = _ranged_file_response(request, full_path, st.st_size, content_type)
+        response['Accept-Ranges'] = 'bytes'
+
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(st.st_mtime)
+    response['Cache-Control'] = cache_control
+    if restricted:
+        patch_vary_headers(response, ['Cookie'])
+    return response
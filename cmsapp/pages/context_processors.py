@@ -17,12 +17,9 @@ def navbar_pages(request):
     show_pages_link = True
     show_background_watermark = True
     if domain:
-        try:
-            show_pages_link = domain.settings.show_pages_link
-            show_background_watermark = domain.settings.show_background_watermark
-        except DomainSetting.DoesNotExist:
-            show_pages_link = True
-            show_background_watermark = True
+        domain_settings = DomainSetting.for_domain(domain)
+        show_pages_link = domain_settings.show_pages_link
+        show_background_watermark = domain_settings.show_background_watermark
     
     return {
         'navbar_pages': navbar_qs,
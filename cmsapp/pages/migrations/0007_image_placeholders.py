@@ -0,0 +1,43 @@
+# Generated by Django 5.2.9 on 2026-10-19 18:08
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pages', '0006_alter_page_slug'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='page',
+            name='featured_image_color',
+            field=models.CharField(blank=True, editable=False, help_text='Dominant colour, shown in place of the image while it loads', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='featured_image_height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='page',
+            name='featured_image_width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pageimage',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pageimage',
+            name='placeholder_color',
+            field=models.CharField(blank=True, editable=False, help_text='Dominant colour, shown in place of the image while it loads', max_length=7),
+        ),
+        migrations.AddField(
+            model_name='pageimage',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -4,6 +4,7 @@ from django.utils import timezone
 from cmsapp.templates.models import PageTemplate, Stylesheet
 from django_ckeditor_5.fields import CKEditor5Field
 from cmsapp.domains.models import Domain
+from cmsapp.media.processing import image_placeholder, placeholder_css
 
 
 def get_default_domain():
@@ -53,6 +54,14 @@ class Page(models.Model):
     )
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default='draft')
     featured_image = models.ImageField(upload_to='pages/featured/', blank=True, null=True)
+    featured_image_width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    featured_image_color = models.CharField(
+        max_length=7,
+        blank=True,
+        editable=False,
+        help_text='Dominant colour, shown in place of the image while it loads'
+    )
     
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -76,13 +85,44 @@ class Page(models.Model):
     def __str__(self):
         return self.title
     
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Remember the stored name so save() can tell when a new image arrives
+        instance._loaded_image_name = instance.__dict__.get('featured_image')
+        return instance
+    
     def save(self, *args, **kwargs):
         if not self.slug:
             self.slug = slugify(self.title)
         if self.status == 'published' and not self.published_at:
             self.published_at = timezone.now()
+        self.update_featured_image_placeholder()
         super().save(*args, **kwargs)
     
+    def update_featured_image_placeholder(self):
+        """
+        Compute the featured image's colour and size when the image changes.
+
+        Other saves never decode the image, so one Pillow cannot read is
+        tried once; rows stored without a colour are left to
+        ``compute_placeholders``.
+        """
+        if not self.featured_image:
+            self.featured_image_color = ''
+            self.featured_image_width = self.featured_image_height = None
+        elif _image_changed(self.featured_image, getattr(self, '_loaded_image_name', None)):
+            placeholder = _read_placeholder(self.featured_image) or {'color': '', 'width': None, 'height': None}
+            self.featured_image_color = placeholder['color']
+            self.featured_image_width = placeholder['width']
+            self.featured_image_height = placeholder['height']
+        self._loaded_image_name = self.featured_image.name
+    
+    @property
+    def featured_image_style(self):
+        """Inline CSS for the featured image's box before it has loaded."""
+        return placeholder_css(self.featured_image_color, self.featured_image_width, self.featured_image_height)
+    
     def get_absolute_url(self):
         if self.is_homepage:
             return '/'
@@ -125,6 +165,14 @@ class PageImage(models.Model):
     image = models.ImageField(upload_to='pages/images/')
     alt_text = models.CharField(max_length=255)
     caption = models.TextField(blank=True)
+    width = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    height = models.PositiveIntegerField(null=True, blank=True, editable=False)
+    placeholder_color = models.CharField(
+        max_length=7,
+        blank=True,
+        editable=False,
+        help_text='Dominant colour, shown in place of the image while it loads'
+    )
     uploaded_at = models.DateTimeField(auto_now_add=True)
     
     class Meta:
@@ -132,3 +180,43 @@ class PageImage(models.Model):
     
     def __str__(self):
         return f"{self.page.title} - {self.alt_text}"
+    
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_image_name = instance.__dict__.get('image')
+        return instance
+    
+    def save(self, *args, **kwargs):
+        self.update_placeholder()
+        super().save(*args, **kwargs)
+    
+    def update_placeholder(self):
+        """Compute the image's colour and size when the image changes (see ``Page``)."""
+        if self.image and _image_changed(self.image, getattr(self, '_loaded_image_name', None)):
+            placeholder = _read_placeholder(self.image) or {'color': '', 'width': None, 'height': None}
+            self.placeholder_color = placeholder['color']
+            self.width = placeholder['width']
+            self.height = placeholder['height']
+        self._loaded_image_name = self.image.name if self.image else None
+    
+    @property
+    def placeholder_style(self):
+        """Inline CSS for the image's box before it has loaded."""
+        return placeholder_css(self.placeholder_color, self.width, self.height)
+
+
+def _image_changed(field_file, loaded_name):
+    """Whether an image field holds a new upload or a different stored file than was loaded."""
+    return not field_file._committed or field_file.name != loaded_name
+
+
+def _read_placeholder(field_file):
+    """Placeholder for an image field, whether freshly uploaded or already stored."""
+    try:
+        if not field_file._committed:
+            return image_placeholder(field_file.file)
+        with field_file.storage.open(field_file.name) as fh:
+            return image_placeholder(fh)
+    except (OSError, ValueError):
+        return None
@@ -80,6 +80,32 @@ DATABASES = {
     }
 }
 
+# Cache shared by all gunicorn workers and the background workers. Besides
+# gallery manifests it holds the contact rate-limit buckets and duplicate
+# hashes, so entries must not vanish early and cache.add must be atomic:
+# Redis (REDIS_URL) is used when configured. Without it a file-based cache
+# stands in, with limits high enough that culling (which drops a random
+# 1/CULL_FREQUENCY of the entries) does not reset rate limits in practice.
+REDIS_URL = config('REDIS_URL', default='')
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+else:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+            'LOCATION': config('CACHE_LOCATION', default='/tmp/cmsapp-cache'),
+            'OPTIONS': {
+                'MAX_ENTRIES': config('CACHE_MAX_ENTRIES', default=100000, cast=int),
+                'CULL_FREQUENCY': config('CACHE_CULL_FREQUENCY', default=10, cast=int),
+            },
+        }
+    }
+
 # Email Configuration (Protomail Bridge)
 EMAIL_BACKEND = 'django.core.mail.backends.smtp.EmailBackend'
 EMAIL_HOST = config('EMAIL_HOST', default='protomail')
@@ -126,6 +152,90 @@ STATICFILES_STORAGE = 'whitenoise.storage.CompressedManifestStaticFilesStorage'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = BASE_DIR / 'media'
 
+# Media downloads are authorised by Django and then handed to nginx through
+# X-Accel-Redirect. Without nginx (runserver), Django serves the bytes itself.
+MEDIA_ACCEL_REDIRECT = config('MEDIA_ACCEL_REDIRECT', default=not DEBUG, cast=bool)
+MEDIA_ACCEL_PREFIX = '/protected-media/'
+# Media URLs are not fingerprinted (a replaced file keeps its URL), so they are
+# only cached briefly and then revalidated; long-lived caching is left to the
+# content-hashed static files.
+MEDIA_CACHE_MAX_AGE = config('MEDIA_CACHE_MAX_AGE', default=5 * 60, cast=int)
+
+# MediaFile.increment_hits buffers counts in memory and flushes them in
+# batches, either every N seconds or once this many increments are pending.
+MEDIA_USAGE_FLUSH_INTERVAL = config('MEDIA_USAGE_FLUSH_INTERVAL', default=30, cast=int)
+MEDIA_USAGE_FLUSH_THRESHOLD = config('MEDIA_USAGE_FLUSH_THRESHOLD', default=1000, cast=int)
+
+# Resumable (chunked) media uploads
+MEDIA_UPLOAD_TEMP_DIR = MEDIA_ROOT / '.uploads'
+MEDIA_UPLOAD_MAX_SIZE = config('MEDIA_UPLOAD_MAX_SIZE', default=5 * 1024 ** 3, cast=int)
+MEDIA_UPLOAD_CHUNK_SIZE = config('MEDIA_UPLOAD_CHUNK_SIZE', default=8 * 1024 ** 2, cast=int)
+MEDIA_UPLOAD_SESSION_MAX_AGE = config('MEDIA_UPLOAD_SESSION_MAX_AGE', default=48, cast=int)  # hours
+
+# Longest edge, in pixels, of the JPEG previews stored in MediaFile.thumbnail
+MEDIA_THUMBNAIL_SIZE = config('MEDIA_THUMBNAIL_SIZE', default=400, cast=int)
+
+# Gallery manifests are rebuilt and re-cached on every change; the timeout
+# is only a safety net.
+MEDIA_GALLERY_CACHE_TIMEOUT = config('MEDIA_GALLERY_CACHE_TIMEOUT', default=24 * 60 * 60, cast=int)
+
+# Uploads are probed, hashed, optimized and thumbnailed by `manage.py
+# media_worker`. Turn this off to do the work inside the saving request.
+MEDIA_ASYNC_PROCESSING = config('MEDIA_ASYNC_PROCESSING', default=True, cast=bool)
+MEDIA_JOB_MAX_ATTEMPTS = config('MEDIA_JOB_MAX_ATTEMPTS', default=5, cast=int)
+MEDIA_JOB_TIMEOUT = config('MEDIA_JOB_TIMEOUT', default=15 * 60, cast=int)  # seconds before a running job is requeued
+MEDIA_WORKER_POLL_INTERVAL = config('MEDIA_WORKER_POLL_INTERVAL', default=2, cast=float)
+
+# Contact form notifications are written to an outbox with the inquiry and
+# sent by `manage.py contact_worker`, retrying with exponential backoff.
+CONTACT_OUTBOX_MAX_ATTEMPTS = config('CONTACT_OUTBOX_MAX_ATTEMPTS', default=8, cast=int)
+CONTACT_OUTBOX_TIMEOUT = config('CONTACT_OUTBOX_TIMEOUT', default=5 * 60, cast=int)  # seconds before a sending message is requeued
+CONTACT_WORKER_POLL_INTERVAL = config('CONTACT_WORKER_POLL_INTERVAL', default=2, cast=float)
+CONTACT_OUTBOX_BATCH_SIZE = config('CONTACT_OUTBOX_BATCH_SIZE', default=50, cast=int)
+# The worker's SMTP connection stays open between batches and is checked
+# with NOOP before use once it has been idle this many seconds.
+CONTACT_SMTP_HEALTHCHECK_INTERVAL = config('CONTACT_SMTP_HEALTHCHECK_INTERVAL', default=30, cast=float)
+
+# Anonymous views of the contact and thank-you pages are served from the
+# shared cache, and may be cached by browsers, for this many seconds.
+CONTACT_PAGE_CACHE_TIMEOUT = config('CONTACT_PAGE_CACHE_TIMEOUT', default=5 * 60, cast=int)
+
+# Contact form abuse checks, all applied before anything is saved.
+# X-Real-IP is set by nginx; use '' to trust REMOTE_ADDR instead.
+CONTACT_CLIENT_IP_HEADER = config('CONTACT_CLIENT_IP_HEADER', default='HTTP_X_REAL_IP')
+CONTACT_MIN_FILL_SECONDS = config('CONTACT_MIN_FILL_SECONDS', default=3, cast=float)
+CONTACT_FORM_MAX_AGE = config('CONTACT_FORM_MAX_AGE', default=24 * 60 * 60, cast=int)  # seconds a form stamp stays valid
+CONTACT_IP_BURST = config('CONTACT_IP_BURST', default=5, cast=int)
+CONTACT_IP_PER_HOUR = config('CONTACT_IP_PER_HOUR', default=10, cast=float)
+CONTACT_DOMAIN_BURST = config('CONTACT_DOMAIN_BURST', default=100, cast=int)
+CONTACT_DOMAIN_PER_HOUR = config('CONTACT_DOMAIN_PER_HOUR', default=600, cast=float)
+CONTACT_DUPLICATE_WINDOW = config('CONTACT_DUPLICATE_WINDOW', default=24 * 60 * 60, cast=int)
+# Naive Bayes filter trained from inquiries marked as spam in the admin,
+# rebuilt by `manage.py train_spam_filter` (run it from cron). It stays
+# inactive until both classes have CONTACT_SPAM_MIN_TRAINING examples.
+CONTACT_SPAM_CLASSIFIER = config('CONTACT_SPAM_CLASSIFIER', default=True, cast=bool)
+CONTACT_SPAM_THRESHOLD = config('CONTACT_SPAM_THRESHOLD', default=0.98, cast=float)
+CONTACT_SPAM_MIN_TRAINING = config('CONTACT_SPAM_MIN_TRAINING', default=20, cast=int)
+CONTACT_SPAM_TRAINING_LIMIT = config('CONTACT_SPAM_TRAINING_LIMIT', default=5000, cast=int)
+CONTACT_SPAM_MAX_VOCABULARY = config('CONTACT_SPAM_MAX_VOCABULARY', default=5000, cast=int)
+# Contact inquiries are partitioned by month on PostgreSQL. Run
+# `manage.py archive_inquiries` monthly: it creates partitions this many
+# months ahead and exports months older than CONTACT_RETENTION_MONTHS to
+# compressed JSON lines in CONTACT_ARCHIVE_DIR before dropping them.
+# The archive is the only copy left, so there is no default: point it at
+# an existing directory on persistent storage (the compose files mount
+# the contact_archive volume at /app/archive/contact). Nothing is dropped
+# while it is unset or on the container's root filesystem.
+CONTACT_PARTITIONS_AHEAD = config('CONTACT_PARTITIONS_AHEAD', default=3, cast=int)
+CONTACT_RETENTION_MONTHS = config('CONTACT_RETENTION_MONTHS', default=24, cast=int)
+CONTACT_ARCHIVE_DIR = config('CONTACT_ARCHIVE_DIR', default='')
+
+# Text extracted from documents for search. Extraction stops after this many
+# characters (Postgres caps a tsvector at 1MB) or bytes of input.
+MEDIA_TEXT_MAX_CHARS = config('MEDIA_TEXT_MAX_CHARS', default=200000, cast=int)
+MEDIA_TEXT_MAX_BYTES = config('MEDIA_TEXT_MAX_BYTES', default=50 * 1024 ** 2, cast=int)
+MEDIA_SEARCH_CONFIG = config('MEDIA_SEARCH_CONFIG', default='english')
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
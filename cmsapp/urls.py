@@ -19,6 +19,7 @@ urlpatterns = [
     path('media/', include('cmsapp.media.urls')),
 ]
 
+# Uploaded media is served by cmsapp.media.views.serve_media in every
+# environment so per-domain access checks also apply during development.
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
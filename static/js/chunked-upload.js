@@ -0,0 +1,139 @@
+/* Resumable chunked uploads for the media admin (tus 1.0 protocol subset) */
+
+(function() {
+    const TUS_VERSION = '1.0.0';
+
+    function getCookie(name) {
+        const match = document.cookie.match(new RegExp('(^|;\\s*)' + name + '=([^;]*)'));
+        return match ? decodeURIComponent(match[2]) : null;
+    }
+
+    function fingerprint(file) {
+        return ['chunked-upload', file.name, file.size, file.lastModified].join(':');
+    }
+
+    function encodeMetadata(data) {
+        return Object.keys(data).map(function(key) {
+            const bytes = new TextEncoder().encode(data[key]);
+            let binary = '';
+            bytes.forEach(function(b) { binary += String.fromCharCode(b); });
+            return key + ' ' + btoa(binary);
+        }).join(',');
+    }
+
+    function request(method, url, headers, body) {
+        const options = {
+            method: method,
+            credentials: 'same-origin',
+            headers: Object.assign({
+                'Tus-Resumable': TUS_VERSION,
+                'X-CSRFToken': getCookie('csrftoken'),
+            }, headers || {}),
+        };
+        if (body) {
+            options.body = body;
+        }
+        return fetch(url, options);
+    }
+
+    function createUpload(endpoint, file) {
+        return request('POST', endpoint, {
+            'Upload-Length': String(file.size),
+            'Upload-Metadata': encodeMetadata({ filename: file.name }),
+        }).then(function(response) {
+            if (response.status !== 201) {
+                throw new Error('Could not start upload (' + response.status + ')');
+            }
+            return response.headers.get('Location');
+        });
+    }
+
+    function currentOffset(location) {
+        return request('HEAD', location).then(function(response) {
+            if (!response.ok) {
+                return null;
+            }
+            return parseInt(response.headers.get('Upload-Offset'), 10);
+        });
+    }
+
+    function sendChunks(location, file, offset, chunkSize, onProgress) {
+        if (offset >= file.size) {
+            return Promise.resolve();
+        }
+        const chunk = file.slice(offset, Math.min(offset + chunkSize, file.size));
+        return request('PATCH', location, {
+            'Content-Type': 'application/offset+octet-stream',
+            'Upload-Offset': String(offset),
+        }, chunk).then(function(response) {
+            const serverOffset = parseInt(response.headers.get('Upload-Offset'), 10);
+            if (response.status === 409 && !isNaN(serverOffset)) {
+                // Another attempt got further than we thought; continue from there.
+                return sendChunks(location, file, serverOffset, chunkSize, onProgress);
+            }
+            if (!response.ok) {
+                throw new Error('Upload failed (' + response.status + ')');
+            }
+            onProgress(serverOffset, file.size);
+            return sendChunks(location, file, serverOffset, chunkSize, onProgress);
+        });
+    }
+
+    function uploadFile(input, file) {
+        const endpoint = input.dataset.chunkedUpload;
+        const chunkSize = parseInt(input.dataset.chunkSize, 10) || 8 * 1024 * 1024;
+        const form = input.form;
+        const sessionField = form.querySelector('input[name="' + input.dataset.sessionField + '"]');
+        const status = input.parentNode.querySelector('.chunked-upload-status') || document.createElement('div');
+        status.className = 'chunked-upload-status help';
+        input.parentNode.appendChild(status);
+
+        const key = fingerprint(file);
+        const saved = localStorage.getItem(key);
+
+        form.dataset.uploading = 'true';
+        status.textContent = 'Preparing upload...';
+
+        const start = saved
+            ? currentOffset(saved).then(function(offset) {
+                return offset === null
+                    ? createUpload(endpoint, file).then(function(loc) { return [loc, 0]; })
+                    : [saved, offset];
+            })
+            : createUpload(endpoint, file).then(function(loc) { return [loc, 0]; });
+
+        return start.then(function(result) {
+            const location = result[0];
+            localStorage.setItem(key, location);
+            return sendChunks(location, file, result[1], chunkSize, function(done, total) {
+                status.textContent = 'Uploading... ' + Math.floor(done * 100 / total) + '%';
+            }).then(function() {
+                localStorage.removeItem(key);
+                sessionField.value = location.replace(/\/$/, '').split('/').pop();
+                // The file now lives on the server; don't send it again with the form.
+                input.value = '';
+                status.textContent = 'Uploaded ' + file.name + '. Save to finish.';
+            });
+        }).catch(function(err) {
+            status.textContent = err.message + ' Re-select the file to resume.';
+        }).finally(function() {
+            delete form.dataset.uploading;
+        });
+    }
+
+    document.addEventListener('DOMContentLoaded', function() {
+        document.querySelectorAll('input[type="file"][data-chunked-upload]').forEach(function(input) {
+            input.addEventListener('change', function() {
+                if (input.files.length) {
+                    uploadFile(input, input.files[0]);
+                }
+            });
+            input.form.addEventListener('submit', function(e) {
+                if (input.form.dataset.uploading) {
+                    e.preventDefault();
+                    alert('Please wait for the upload to finish.');
+                }
+            });
+        });
+    });
+})();
@@ -0,0 +1,54 @@
+// Contact form CSRF handling
+//
+// The contact page is served from a shared cache, so it cannot carry a
+// per-visitor CSRF token. The token is fetched from a small uncached
+// endpoint when the visitor first starts on the form, together with the
+// signed start time the server uses to turn away forms sent too quickly,
+// and written into the hidden fields. A submit before that fetch has
+// finished waits for it.
+
+document.addEventListener('DOMContentLoaded', function() {
+    document.querySelectorAll('form[data-csrf-url]').forEach(form => {
+        const tokenField = form.querySelector('input[name="csrfmiddlewaretoken"]');
+        const startedField = form.querySelector('input[name="started"]');
+        let pending = null;
+
+        function fetchToken() {
+            if (!pending) {
+                pending = fetch(form.dataset.csrfUrl, {credentials: 'same-origin', cache: 'no-store'})
+                    .then(response => response.json())
+                    .then(data => {
+                        if (tokenField) {
+                            tokenField.value = data.token;
+                        }
+                        if (startedField) {
+                            startedField.value = data.started;
+                        }
+                    })
+                    .catch(() => {
+                        // Submit anyway; the server answers with its usual error
+                    });
+            }
+            return pending;
+        }
+
+        form.addEventListener('focusin', fetchToken, {once: true});
+
+        form.addEventListener('submit', function(event) {
+            if (!tokenField || tokenField.value) {
+                return;
+            }
+            event.preventDefault();
+
+            const button = form.querySelector('[type="submit"]');
+            if (button) {
+                button.disabled = true;
+            }
+
+            fetchToken().finally(() => {
+                // form.submit() does not fire this handler again
+                form.submit();
+            });
+        });
+    });
+});